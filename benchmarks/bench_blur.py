@@ -0,0 +1,83 @@
+"""Compara el desenfoque anterior (seis reescalados a ventana completa) con blur_engine.
+
+La última columna desenfoca solo las zonas de 8 superficies de vidrio (pizarra dispersa).
+
+Uso:  python benchmarks/bench_blur.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PySide6.QtCore import Qt, QRect, QRectF
+from PySide6.QtGui import QColor, QImage, QPainter, QPen, QPixmap
+from PySide6.QtWidgets import QApplication
+
+import blur_engine
+import config
+import utils
+
+RESOLUTIONS = [("1080p", 1920, 1080), ("1440p", 2560, 1440), ("4K", 3840, 2160)]
+
+def legacy_blur(pixmap, radius):
+    """Implementación anterior de utils.apply_gaussian_blur (ignora el radio)."""
+    if pixmap.isNull(): return pixmap
+    w, h = pixmap.width(), pixmap.height()
+    img = pixmap.toImage()
+    s1 = img.scaled(w // 2, h // 2, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    s1 = s1.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    s2 = s1.scaled(w // 4, h // 4, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    s2 = s2.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    s3 = s2.scaled(w // 8, h // 8, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    final_img = s3.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return QPixmap.fromImage(final_img)
+
+def make_scene(w, h):
+    """Fondo con cuadrícula y algunas formas, parecido a la capa del mundo."""
+    pixmap = QPixmap(w, h)
+    pixmap.fill(config.BG_COLOR)
+    p = QPainter(pixmap)
+    p.setRenderHint(QPainter.Antialiasing)
+    p.setPen(QPen(config.GRID_COLOR, 2))
+    for x in range(0, w, 100): p.drawLine(x, 0, x, h)
+    for y in range(0, h, 100): p.drawLine(0, y, w, y)
+    for i in range(40):
+        p.setBrush(QColor.fromHsvF((i * 0.07) % 1.0, 0.7, 0.9))
+        p.drawRoundedRect(QRectF((i * 197) % w, (i * 131) % h, 180, 120), 15, 15)
+    p.end()
+    return pixmap
+
+def glass_regions(w, h, count=8):
+    """Rects de muestreo de unas cuantas superficies de vidrio repartidas por la pantalla."""
+    return [utils.glass_sample_rect(QRect((i * 457) % (w - 300), (i * 263) % (h - 200), 220, 160)) for i in range(count)]
+
+def time_it(fn, pixmap, repeat):
+    fn(pixmap, config.GLASS_BLUR_RADIUS) # Calentamiento
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(pixmap, config.GLASS_BLUR_RADIUS)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+    
+    print(f"Radio: {config.GLASS_BLUR_RADIUS}px  (mejor de {args.repeat})")
+    print(f"{'Resolución':<12}{'Anterior (ms)':>16}{'blur_engine (ms)':>18}{'Mejora':>10}{'Regiones (ms)':>16}")
+    for name, w, h in RESOLUTIONS:
+        pixmap = make_scene(w, h)
+        old = time_it(legacy_blur, pixmap, args.repeat)
+        new = time_it(blur_engine.blur_pixmap, pixmap, args.repeat)
+        regions, target = glass_regions(w, h), QPixmap(w, h)
+        roi = time_it(lambda pm, radius: blur_engine.blur_regions(pm, regions, radius, target), pixmap, args.repeat)
+        print(f"{name:<12}{old:>16.1f}{new:>18.1f}{old / new:>9.1f}x{roi:>16.1f}")
+
+if __name__ == "__main__":
+    main()
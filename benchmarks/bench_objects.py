@@ -0,0 +1,82 @@
+"""Mide el coste por objeto del modelo del lienzo (board_objects) en pizarras grandes.
+
+Crea N objetos con los campos que deja el parser al abrir un .tree y mide:
+- la memoria Python por objeto (tracemalloc, sin contar los textos compartidos);
+- el tiempo por objeto de leer su caja (x, y, w, h) para compararla con la vista y
+  de leer su tipo, que es lo que hacen las pasadas que recorren toda la lista;
+- esas mismas pasadas a través del lienzo: cajas del índice espacial
+  (Canvas._obj_bounds) y visibilidad (Canvas.is_obj_visible, la del repintado).
+
+Uso:  python benchmarks/bench_objects.py [--objects 50000] [--repeat 15]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PySide6.QtWidgets import QApplication
+
+from board_objects import BoardObject
+
+KINDS = (("cuadrado", 40), ("triangulo", 20), ("ventana", 15), ("texto", 15), ("dibujo", 5), ("imagen", 5))
+
+def build_objects(n, seed):
+    rng = random.Random(seed)
+    kinds = [k for k, weight in KINDS for _ in range(weight)]
+    objects = []
+    for i in range(n):
+        kind = rng.choice(kinds)
+        fields = {"title": "Object", "w": rng.uniform(80, 400), "h": rng.uniform(60, 300)}
+        if kind == "ventana": fields["content"] = "Notas"
+        elif kind == "texto": fields["content"] = "Etiqueta"
+        elif kind in ("dibujo", "imagen"): fields["path"] = "drawings/x.json"
+        objects.append(BoardObject(kind, rng.uniform(-1e5, 1e5), rng.uniform(-1e5, 1e5), **fields))
+    return objects
+
+def best_ns(fn, n, repeat):
+    """Mejor tiempo de `repeat` pasadas, en ns por objeto (sin el recolector, como timeit)"""
+    best = float("inf")
+    gc.disable()
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    gc.enable()
+    return round(best / n * 1e9, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from canvas_widget import Canvas
+    canvas = Canvas(); canvas.resize(1600, 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build_objects(args.objects, args.seed)
+    bytes_per_object = (tracemalloc.get_traced_memory()[0] - before) / args.objects
+    tracemalloc.stop()
+
+    view = x0, y0, x1, y1 = canvas._cull_view()
+    n = args.objects
+    report = {
+        "objects": n,
+        "bytes_per_object": round(bytes_per_object, 1),
+        "cull_ns": best_ns(lambda: sum(1 for o in objects if o.x + o.w / 2 >= x0 and o.x - o.w / 2 <= x1 and o.y + o.h / 2 >= y0 and o.y - o.h / 2 <= y1), n, args.repeat),
+        "type_filter_ns": best_ns(lambda: sum(1 for o in objects if o.type == "imagen"), n, args.repeat),
+        "bounds_ns": best_ns(lambda: [canvas._obj_bounds(o) for o in objects], n, args.repeat),
+        "visible_ns": best_ns(lambda: [canvas.is_obj_visible(o, view) for o in objects], n, args.repeat),
+    }
+    print(json.dumps(report, indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Mide el repintado del lienzo con pizarras sintéticas, en la plataforma offscreen de Qt.
+
+Genera una pizarra con N objetos de cada tipo y ejecuta secuencias de pan, zoom,
+arrastre, dibujo y borrado con eventos de ratón reales. Cada evento se procesa y se
+pinta (Canvas.paintEvent, repintados parciales incluidos). Escribe un JSON con:
+- los tiempos por paso y por etapa del repintado (ver frame_stats);
+- los objetos pintados por tipo;
+- la memoria pico del proceso tras cada escenario.
+
+Uso:  python benchmarks/bench_render.py [--squares N] [--windows N] [--markdown N] [--code N]
+          [--images N] [--drawings N] [--stroke-points M] [--steps S] [--only pan,zoom] [--out resultado.json]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PySide6.QtCore import Qt, QEvent, QPoint, QPointF, qVersion
+from PySide6.QtGui import QColor, QLinearGradient, QMouseEvent, QPainter, QPixmap, QWheelEvent
+from PySide6.QtWidgets import QApplication
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+import config
+from board_objects import BoardObject
+from frame_stats import FrameStats, percentile
+
+CELL = 600 # Separación de la rejilla de objetos (mundo); deja huecos libres entre ellos
+
+MARKDOWN = "# Documento {i}\n\n" + "\n\n".join(f"Párrafo {k} con **negrita**, `código` y texto suficiente para ocupar varias líneas al maquetar." for k in range(30))
+CODE = "\n".join(f"def funcion_{k}(x, y):\n    # Comentario {k}\n    return x * {k} + y  # \"cadena\"\n" for k in range(80))
+
+def peak_rss_mb():
+    """Memoria residente pico del proceso en MB (None si la plataforma no la da)"""
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # Bytes en macOS, KB en Linux
+
+def make_image(i):
+    pixmap = QPixmap(1024, 768)
+    gradient = QLinearGradient(0, 0, 1024, 768)
+    gradient.setColorAt(0, QColor.fromHsvF((i * 0.13) % 1.0, 0.7, 0.9)); gradient.setColorAt(1, QColor(20, 20, 40))
+    p = QPainter(pixmap); p.fillRect(pixmap.rect(), gradient); p.end()
+    return pixmap
+
+STROKE_POINTS = 40 # Puntos por trazo: los `--stroke-points` de cada dibujo se reparten en trazos así
+
+def make_strokes(rng, points):
+    """Trazos con `points` puntos en total, en paseo aleatorio dentro de un dibujo de 200x200"""
+    strokes = []
+    for start in range(0, points, STROKE_POINTS):
+        x, y, pts = rng.uniform(-80, 80), rng.uniform(-80, 80), []
+        for _ in range(min(STROKE_POINTS, points - start)):
+            x = max(-90, min(90, x + rng.uniform(-6, 6))); y = max(-90, min(90, y + rng.uniform(-6, 6)))
+            pts.append((x, y))
+        strokes.append({"style": "lapicero", "width": 2, "color": QColor.fromHsvF(rng.random(), 0.5, 1.0), "points": pts})
+    return strokes
+
+def build_board(canvas, args):
+    """Reparte los objetos en una rejilla cuadrada centrada en el origen. Devuelve la
+    posición en el mundo del objeto de cada tipo más cercano al origen."""
+    from image_pyramid import ImagePyramid
+    rng = random.Random(args.seed)
+    kinds = [("cuadrado", args.squares), ("ventana", args.windows), ("texto", args.texts), ("markdown", args.markdown),
+             ("codigo", args.code), ("imagen", args.images), ("dibujo", args.drawings)]
+    order = [kind for kind, n in kinds for _ in range(n)]
+    rng.shuffle(order)
+    side = max(1, math.ceil(math.sqrt(len(order))))
+    nearest = {}
+    for i, kind in enumerate(order):
+        x, y = (i % side - side // 2) * CELL, (i // side - side // 2) * CELL
+        fields = {}
+        if kind == "ventana": fields = dict(title=f"Ventana {i}", content=f"Notas de la ventana {i}\nsegunda línea")
+        elif kind == "texto": fields = dict(content=f"Etiqueta {i}")
+        elif kind == "markdown": fields = dict(title=f"doc_{i}.md", content=MARKDOWN.format(i=i))
+        elif kind == "codigo": fields = dict(title=f"modulo_{i}.py", content=CODE, ext=".py")
+        elif kind == "imagen": fields = dict(image=ImagePyramid(make_image(i)), w=320, h=240)
+        elif kind == "dibujo": fields = dict(strokes=make_strokes(rng, args.stroke_points))
+        canvas.add_object(BoardObject(kind, x, y, **fields))
+        if kind not in nearest or math.hypot(x, y) < math.hypot(*nearest[kind]): nearest[kind] = (x, y)
+    canvas.invalidate_scene()
+    return nearest
+
+class Driver:
+    """Envía eventos al lienzo y mide cada paso (evento + repintado)"""
+
+    def __init__(self, app, canvas):
+        self.app, self.canvas = app, canvas
+        self.steps = []
+
+    def _send(self, event):
+        t0 = time.perf_counter()
+        self.app.sendEvent(self.canvas, event)
+        self.app.processEvents() # Entrega el repintado (parcial o completo) que haya pedido el evento
+        self.steps.append((time.perf_counter() - t0) * 1000)
+
+    def mouse(self, kind, pos, buttons=Qt.LeftButton, modifiers=Qt.NoModifier):
+        button = Qt.NoButton if kind == QEvent.MouseMove else Qt.LeftButton
+        held = Qt.NoButton if kind == QEvent.MouseButtonRelease else buttons
+        self._send(QMouseEvent(kind, QPointF(pos), QPointF(self.canvas.mapToGlobal(pos)), button, held, modifiers))
+
+    def wheel(self, pos, delta):
+        self._send(QWheelEvent(QPointF(pos), QPointF(self.canvas.mapToGlobal(pos)), QPoint(0, 0), QPoint(0, delta),
+                               Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False))
+
+    def gesture(self, start, points, modifiers=Qt.NoModifier):
+        """Pulsar en `start`, arrastrar por `points` y soltar en el último"""
+        self.mouse(QEvent.MouseButtonPress, start, modifiers=modifiers)
+        for p in points: self.mouse(QEvent.MouseMove, p, modifiers=modifiers)
+        self.mouse(QEvent.MouseButtonRelease, points[-1] if points else start, modifiers=modifiers)
+
+def screen_point(canvas, wx, wy):
+    x, y = canvas.world_to_screen(wx, wy)
+    return QPoint(round(x), round(y))
+
+def reset_view(canvas, zoom, target):
+    """Cámara al zoom dado con el punto `target` del mundo en el centro, sin selección"""
+    canvas.zoom, canvas.offset_x, canvas.offset_y = zoom, -target[0] * zoom, -target[1] * zoom
+    canvas.selected_object, canvas.selected_objects, canvas.selected_vertical_tool = None, [], None
+    canvas.invalidate_scene()
+
+def scenarios(canvas, nearest, steps):
+    """(nombre, zoom, punto del mundo centrado, gesto) de cada secuencia; los gestos
+    reciben un Driver y se ejecutan con la cámara ya colocada"""
+    w, h = canvas.width(), canvas.height()
+    center = QPoint(w // 2, h // 2)
+    gap = lambda: screen_point(canvas, CELL / 2, CELL / 2) # Hueco entre cuatro objetos
+    tools = [t["name"].lower() for t in config.VERTICAL_TOOLS]
+
+    def pan(d):
+        d.gesture(center, [center + QPoint(round(300 * math.cos(k / steps * 2 * math.pi)) - 300, round(200 * math.sin(k / steps * 2 * math.pi))) for k in range(1, steps + 1)], Qt.ShiftModifier)
+    def zoom(d):
+        for k in range(steps): d.wheel(gap(), -120 if (k // 8) % 2 == 0 else 120) # Alejar y acercar en tandas de 8
+    def drag(d):
+        start = screen_point(canvas, *nearest["cuadrado"])
+        d.gesture(start, [start + QPoint(3 * k, 2 * k) for k in range(1, steps + 1)])
+    def draw(d):
+        canvas.selected_vertical_tool = tools.index("lapicero")
+        start = gap()
+        d.gesture(start, [start + QPoint(round(60 * math.sin(k / 10)), round(4 * k % 120 - 60)) for k in range(1, steps + 1)])
+    def erase(d):
+        canvas.selected_vertical_tool = tools.index("borrador")
+        cx, cy = nearest["dibujo"]
+        d.gesture(screen_point(canvas, cx - 100, cy), [screen_point(canvas, cx - 100 + 200 * k / steps, cy + 80 * math.sin(k / 3)) for k in range(1, steps + 1)])
+
+    origin = (0, 0)
+    result = [("pan", 1.0, origin, pan), ("zoom", 1.0, origin, zoom), ("pan_alejado", 0.25, origin, pan)]
+    if "cuadrado" in nearest: result.append(("drag", 1.0, nearest["cuadrado"], drag))
+    result.append(("draw", 1.0, origin, draw))
+    if "dibujo" in nearest: result.append(("erase", 1.0, nearest["dibujo"], erase))
+    return result
+
+def run(args):
+    app = QApplication.instance() or QApplication(sys.argv)
+    from canvas_widget import Canvas # Después de crear la QApplication
+    canvas = Canvas()
+    canvas.resize(args.width, args.height); canvas.show(); app.processEvents()
+
+    t0 = time.perf_counter()
+    nearest = build_board(canvas, args)
+    build_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    canvas.repaint()
+    first_frame_ms = (time.perf_counter() - t0) * 1000
+
+    report = {
+        "config": {"objects": len(canvas.canvas_objects), "squares": args.squares, "windows": args.windows, "texts": args.texts,
+                   "markdown": args.markdown, "code": args.code, "images": args.images, "drawings": args.drawings,
+                   "stroke_points": args.stroke_points, "steps": args.steps, "size": [args.width, args.height], "seed": args.seed,
+                   "python": platform.python_version(), "qt": qVersion(), "platform": QApplication.platformName()},
+        "build_ms": round(build_ms, 1), "first_frame_ms": round(first_frame_ms, 1), "scenarios": {},
+    }
+    for name, zoom, target, gesture in scenarios(canvas, nearest, args.steps):
+        if args.only and name not in args.only.split(","): continue
+        reset_view(canvas, zoom, target); canvas.repaint()
+        canvas.frame_stats = FrameStats(args.steps * 4)
+        driver = Driver(app, canvas)
+        gesture(driver)
+        steps = sorted(driver.steps)
+        summary = canvas.frame_stats.summary()
+        report["scenarios"][name] = {
+            "steps": len(steps),
+            "step_ms": {"p50": round(percentile(steps, 50), 3), "p90": round(percentile(steps, 90), 3), "p99": round(percentile(steps, 99), 3),
+                        "max": round(steps[-1], 3) if steps else 0.0, "mean": round(sum(steps) / len(steps), 3) if steps else 0.0},
+            "frames": summary["frames"], "frame_ms": summary["total"], "stages": summary["stages"], "draws": summary["draws"],
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--squares", type=int, default=60)
+    parser.add_argument("--windows", type=int, default=30)
+    parser.add_argument("--texts", type=int, default=30)
+    parser.add_argument("--markdown", type=int, default=15)
+    parser.add_argument("--code", type=int, default=15)
+    parser.add_argument("--images", type=int, default=30)
+    parser.add_argument("--drawings", type=int, default=20)
+    parser.add_argument("--stroke-points", type=int, default=400, help="puntos del trazo de cada dibujo")
+    parser.add_argument("--steps", type=int, default=60, help="eventos por escenario")
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=900)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help="escenarios separados por comas (pan, zoom, pan_alejado, drag, draw, erase)")
+    parser.add_argument("--out", help="archivo JSON de salida (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=1)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal
+from PySide6.QtGui import QImageReader
+
+def read_image_size(path):
+    """Tamaño de la imagen leyendo solo la cabecera (QSize inválido si no se puede leer)"""
+    return QImageReader(path).size()
+
+def read_image(path):
+    # QImage (y no QPixmap) porque se crea fuera del hilo de la GUI
+    return QImageReader(path).read()
+
+class _LoadTask(QRunnable):
+    def __init__(self, loader, ticket, path, reader):
+        super().__init__()
+        self.loader = loader
+        self.ticket = ticket
+        self.path = path
+        self.reader = reader
+
+    def run(self):
+        try: result = self.reader(self.path)
+        except Exception as e:
+            print(f"Error loading asset {self.path}: {e}")
+            result = None
+        self.loader.loaded.emit(self.ticket, result)
+
+class AssetLoader(QObject):
+    """Carga recursos (imágenes, archivos de trazos...) en un pool de hilos.
+
+    `reader(path)` se ejecuta en un hilo del pool y no debe crear QPixmap ni tocar
+    widgets. Su resultado llega al callback en el hilo de la GUI (la señal se
+    encola), en el orden en que terminan las tareas, no en el que se pidieron.
+    """
+
+    loaded = Signal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, QThread.idealThreadCount() - 1)) # Dejar un núcleo a la GUI
+        self._pending = {} # ticket -> callback
+        self._next_ticket = 0
+        self.loaded.connect(self._on_loaded)
+
+    def request(self, path, callback, reader=read_image):
+        self._next_ticket += 1
+        ticket = self._next_ticket
+        self._pending[ticket] = callback
+        self.pool.start(_LoadTask(self, ticket, path, reader))
+        return ticket
+
+    def cancel(self, ticket):
+        """El callback ya no se llamará (la carga en curso no se interrumpe)"""
+        self._pending.pop(ticket, None)
+
+    def pending(self):
+        return len(self._pending)
+
+    def _on_loaded(self, ticket, result):
+        callback = self._pending.pop(ticket, None)
+        if callback is not None: callback(result)
@@ -0,0 +1,155 @@
+import math
+from PySide6.QtCore import Qt, QPoint, QRect
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+# Sigma (en píxeles) con la que se trabaja tras reducir la imagen.
+# Cuanto menor, más se reduce la imagen y menos trabajo hacen las pasadas de caja.
+WORK_SIGMA = 2.5
+BOX_PASSES = 3 # Tres cajas sucesivas ya son indistinguibles de una gaussiana
+# Si las regiones a desenfocar cubren más de esta fracción del total, sale más barato hacerlo entero
+FULL_FRAME_RATIO = 0.6
+
+def box_sizes_for_gauss(sigma, n=BOX_PASSES):
+    """Anchos (impares) de n filtros de caja cuya composición aproxima una gaussiana de sigma dado."""
+    w_ideal = math.sqrt(12 * sigma * sigma / n + 1)
+    wl = int(w_ideal)
+    if wl % 2 == 0: wl -= 1
+    wl = max(1, wl)
+    wu = wl + 2
+    m = round((12 * sigma * sigma - n * wl * wl - 4 * n * wl - 3 * n) / (-4 * wl - 4))
+    return [wl if i < m else wu for i in range(n)]
+
+def _pad_clamped(img, pad):
+    """Añade un borde de `pad` píxeles repitiendo los píxeles del contorno."""
+    w, h = img.width(), img.height()
+    out = QImage(w + pad * 2, h + pad * 2, QImage.Format_ARGB32_Premultiplied)
+    p = QPainter(out)
+    p.setCompositionMode(QPainter.CompositionMode_Source)
+    p.drawImage(pad, pad, img)
+    # Laterales (una fila/columna estirada) y esquinas (un píxel estirado)
+    p.drawImage(QRect(0, pad, pad, h), img, QRect(0, 0, 1, h))
+    p.drawImage(QRect(pad + w, pad, pad, h), img, QRect(w - 1, 0, 1, h))
+    p.drawImage(QRect(pad, 0, w, pad), img, QRect(0, 0, w, 1))
+    p.drawImage(QRect(pad, pad + h, w, pad), img, QRect(0, h - 1, w, 1))
+    p.drawImage(QRect(0, 0, pad, pad), img, QRect(0, 0, 1, 1))
+    p.drawImage(QRect(pad + w, 0, pad, pad), img, QRect(w - 1, 0, 1, 1))
+    p.drawImage(QRect(0, pad + h, pad, pad), img, QRect(0, h - 1, 1, 1))
+    p.drawImage(QRect(pad + w, pad + h, pad, pad), img, QRect(w - 1, h - 1, 1, 1))
+    p.end()
+    return out
+
+def _box_pass(img, radius, horizontal):
+    """Media móvil de 2*radius+1 muestras en una dirección.
+
+    Cada copia desplazada se mezcla con opacidad 1/k en modo Source, que en Qt
+    interpola linealmente con el destino: el resultado es la media exacta de las
+    k copias, también con alfa premultiplicado."""
+    out = QImage(img.size(), img.format())
+    p = QPainter(out)
+    p.setCompositionMode(QPainter.CompositionMode_Source)
+    p.drawImage(0, 0, img)
+    k = 1
+    for d in range(1, radius + 1):
+        for s in (d, -d):
+            k += 1
+            p.setOpacity(1.0 / k)
+            p.drawImage(QPoint(s, 0) if horizontal else QPoint(0, s), img)
+    p.end()
+    return out
+
+def blur_reduced(image, radius):
+    """Desenfoque gaussiano aproximado, devuelto a resolución reducida.
+
+    `radius` se interpreta como el alcance del desenfoque (~3 sigmas). La imagen
+    se reduce una sola vez hasta que la sigma restante es WORK_SIGMA y se aplican
+    BOX_PASSES cajas separables (horizontal + vertical). El resultado queda
+    pequeño: quien lo use lo amplía una sola vez al dibujarlo (ver blur_pixmap)."""
+    w, h = image.width(), image.height()
+    sigma = radius / 3.0
+    factor = max(1.0, sigma / WORK_SIGMA)
+    sw, sh = max(1, int(round(w / factor))), max(1, int(round(h / factor)))
+
+    small = image
+    if (sw, sh) != (w, h):
+        small = image.scaled(sw, sh, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    small = small.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+    # Radio de cada caja en la imagen reducida (en x e y la escala es casi la misma)
+    radii = [size // 2 for size in box_sizes_for_gauss(sigma / factor)]
+    pad = sum(radii)
+    work = _pad_clamped(small, pad) if pad > 0 else small
+    for r in radii:
+        if r <= 0: continue
+        work = _box_pass(work, r, True)
+        work = _box_pass(work, r, False)
+    return work.copy(pad, pad, sw, sh) if pad > 0 else work
+
+def blur_image(image, radius):
+    """Como blur_reduced pero devuelve un QImage del mismo tamaño que el original."""
+    if image.isNull() or radius <= 0: return image
+    small = blur_reduced(image, radius)
+    out = QImage(image.size(), QImage.Format_ARGB32_Premultiplied)
+    _upsample_into(out, small)
+    return out
+
+def blur_pixmap(pixmap, radius):
+    if pixmap.isNull() or radius <= 0: return pixmap
+    small = blur_reduced(pixmap.toImage(), radius)
+    out = QPixmap(pixmap.size())
+    _upsample_into(out, small)
+    return out
+
+def _upsample_into(device, small):
+    """Amplía el resultado reducido a todo el dispositivo con filtrado bilineal (un único paso)."""
+    p = QPainter(device)
+    p.setCompositionMode(QPainter.CompositionMode_Source)
+    p.setRenderHint(QPainter.SmoothPixmapTransform)
+    p.drawImage(QRect(0, 0, device.width(), device.height()), small)
+    p.end()
+
+def merge_rects(rects):
+    """Une los QRect que se solapan hasta que no quede ninguna intersección."""
+    rects = [r for r in rects if not r.isEmpty()]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for r in rects:
+            for i, o in enumerate(out):
+                if o.intersects(r):
+                    out[i] = o.united(r); merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
+    return rects
+
+def blur_regions(pixmap, rects, radius, target=None):
+    """Desenfoca solo las zonas indicadas.
+
+    Cada rect se amplía con el alcance del desenfoque para que sus bordes salgan
+    igual que en un desenfoque completo. Las zonas que se tocan se procesan juntas.
+    Si se pasa `target` (el resultado del frame anterior, mismo tamaño) se pinta
+    encima en lugar de reservar otro buffer: fuera de las zonas nadie lo muestrea."""
+    if pixmap.isNull() or radius <= 0: return pixmap
+    bounds = pixmap.rect()
+    margin = int(math.ceil(radius))
+    crops = merge_rects(r.adjusted(-margin, -margin, margin, margin).intersected(bounds) for r in rects)
+    
+    if sum(r.width() * r.height() for r in crops) >= FULL_FRAME_RATIO * bounds.width() * bounds.height():
+        return blur_pixmap(pixmap, radius)
+    
+    out = target
+    if out is None or out.isNull() or out.size() != pixmap.size():
+        out = QPixmap(pixmap.size())
+        out.fill(Qt.transparent)
+    if not crops: return out
+    
+    source = pixmap.toImage()
+    p = QPainter(out)
+    p.setCompositionMode(QPainter.CompositionMode_Source)
+    p.setRenderHint(QPainter.SmoothPixmapTransform)
+    for crop in crops:
+        p.drawImage(crop, blur_reduced(source.copy(crop), radius))
+    p.end()
+    return out
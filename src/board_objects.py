@@ -0,0 +1,102 @@
+# Objetos del lienzo. BoardObject es igual para todos los tipos (tipo, geometría y aspecto):
+# las pasadas que recorren toda la pizarra (índice espacial, visibilidad, teselas) leen
+# siempre la misma disposición de __slots__ y el intérprete cachea ese acceso, cosa que no
+# ocurre si cada tipo es una subclase. Lo propio de cada tipo va en `state`, una clase con
+# __slots__ por tipo que separa lo que se guarda en el .tree (PERSISTED) del estado
+# derivado (vistas maquetadas, buffers, cargas en curso), que nunca se escribe.
+
+DEFAULT_SIZES = {"cuadrado": (100, 100), "triangulo": (100, 100), "ventana": (200, 150), "texto": (200, 50),
+                 "markdown": (300, 400), "codigo": (500, 400), "imagen": (300, 300), "dibujo": (200, 200)}
+DEFAULT_TITLES = {"ventana": "Ventana", "markdown": "README.md", "codigo": "code"}
+
+class BoardObject:
+    """Elemento del lienzo: centro y tamaño en el mundo, color y título.
+
+    `w`/`h` y `personal_color` valen None hasta que se fijan: se usa entonces el tamaño
+    por defecto del tipo (size) o el color por defecto de quien lo pinta (color_or)."""
+    __slots__ = ("type", "x", "y", "w", "h", "personal_color", "title", "state")
+
+    def __init__(self, obj_type, x=0.0, y=0.0, w=None, h=None, personal_color=None, title=None, **state):
+        self.type = obj_type
+        self.x = x; self.y = y; self.w = w; self.h = h
+        self.personal_color = personal_color
+        self.title = title
+        state_class = STATE_CLASSES.get(obj_type)
+        self.state = state_class(**state) if state_class is not None else None
+
+    def __repr__(self):
+        return f"<{self.type} ({self.x:g}, {self.y:g})>"
+
+    def size(self):
+        """(w, h) en el mundo; lo que no esté fijado, del tamaño por defecto del tipo"""
+        dw, dh = DEFAULT_SIZES.get(self.type, (100, 100))
+        return (self.w if self.w is not None else dw), (self.h if self.h is not None else dh)
+
+    def color_or(self, default):
+        return self.personal_color if self.personal_color is not None else default
+
+    def display_title(self):
+        return self.title if self.title is not None else DEFAULT_TITLES.get(self.type)
+
+    def accepts(self, field):
+        """Si el .tree puede fijar `field` en el estado de este tipo"""
+        return self.state is not None and field in self.state.PERSISTED
+
+    def content_key(self):
+        """Clave del texto en el .tree (None si el tipo no tiene texto)"""
+        return self.state.CONTENT_KEY if self.state is not None else None
+
+class ObjectState:
+    """Base de los estados por tipo: los campos que no se pasan empiezan en INITIAL o None"""
+    __slots__ = ()
+    PERSISTED = ()
+    INITIAL = {}
+    CONTENT_KEY = None # Clave del texto en el .tree, en los tipos que tienen texto
+
+    def __init__(self, **fields):
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                setattr(self, name, fields.pop(name, self.INITIAL.get(name)))
+        if fields: raise TypeError(f"{type(self).__name__}: campos desconocidos {sorted(fields)}")
+
+class EditableState(ObjectState):
+    """Ventanas y textos: el texto guardado pasa a `buffer` (text_buffer.buffer_for) al
+    empezar a editarse, y desde entonces se lee con text_buffer.object_text"""
+    __slots__ = ("content", "buffer")
+    PERSISTED = ("content",)
+    INITIAL = {"content": ""}
+    CONTENT_KEY = "content"
+
+class WindowState(EditableState):
+    __slots__ = ("paragraphs",) # Párrafos maquetados (canvas_objects._window_paragraphs)
+
+class TextState(EditableState):
+    """Sin tamaño fijado, la píldora se ajusta al texto medido"""
+    __slots__ = ("metrics",) # Medidas por línea y fuente (canvas_objects._text_metrics)
+    CONTENT_KEY = "text"
+
+class DocumentState(ObjectState):
+    """Markdown y código: documento de solo lectura con vista virtualizada, scroll y selección"""
+    __slots__ = ("content", "ext", "view", "doc_scale", "scroll_y", "max_scroll_y", "sel_start", "sel_end")
+    PERSISTED = ("content", "ext")
+    INITIAL = {"content": "", "ext": "", "doc_scale": 1.0, "scroll_y": 0, "max_scroll_y": 1000}
+    CONTENT_KEY = "content"
+
+class AssetState(ObjectState):
+    """Archivo asociado que se carga en diferido (Canvas.request_asset)"""
+    __slots__ = ("path", "asset_pending", "loading")
+    PERSISTED = ("path",)
+    INITIAL = {"asset_pending": False, "loading": False}
+
+class ImageState(AssetState):
+    __slots__ = ("image", "missing_asset") # image: ImagePyramid ya decodificada
+    INITIAL = dict(AssetState.INITIAL, missing_asset=False)
+
+class DrawingState(AssetState):
+    """Trazos en coordenadas locales al centro; `strokes_rev` invalida su ráster cacheado"""
+    __slots__ = ("strokes", "strokes_rev", "load_ticket")
+    INITIAL = dict(AssetState.INITIAL, strokes=(), strokes_rev=0)
+
+# Tipos sin estado propio (cuadrado, triángulo y los desconocidos): state es None
+STATE_CLASSES = {"ventana": WindowState, "texto": TextState, "markdown": DocumentState, "codigo": DocumentState,
+                 "imagen": ImageState, "dibujo": DrawingState}
@@ -1,10 +1,51 @@
 import os
-import time
+import math
 from PySide6.QtCore import Qt, QRectF, QPointF, QRect, QSize
-from PySide6.QtGui import QBrush, QPen, QColor, QPolygonF, QPainterPath, QLinearGradient, QPixmap, QPainter, QTextDocument, QAbstractTextDocumentLayout, QTextCursor, QPalette, QImage
+from PySide6.QtGui import QBrush, QPen, QColor, QPolygonF, QPainterPath, QLinearGradient, QPixmap, QPainter, QTextDocument, QAbstractTextDocumentLayout, QTextCursor, QPalette, QImage, QFont, QFontMetrics, QFontMetricsF, QTextLayout, QTextOption, QStaticText, QTransform
 from utils import get_contrast_color
+from raster_cache import RasterCache
+from stroke_utils import stroke_lod
+import text_view
+import text_buffer
+import glass
 import config
 
+# Rásters de los trazos de cada dibujo, por tramo de zoom (ver draw_drawing_object)
+DRAWING_CACHE = RasterCache(config.DRAWING_CACHE_MB * 1024 * 1024)
+
+# Niveles de detalle (ver lod_level)
+LOD_FULL, LOD_NO_TEXT, LOD_PROXY = 0, 1, 2
+LOD_TEXT_SIZES = {"ventana": 13, "markdown": 12, "codigo": 13, "texto": 16} # Cuerpo del texto a zoom 1
+
+def lod_level(obj, zoom):
+    """Nivel de detalle con el que se pinta el objeto según su tamaño en pantalla.
+
+    LOD_PROXY si su lado mayor no llega a LOD_PROXY_PX (silueta teñida, sin vidrio),
+    LOD_NO_TEXT si su texto quedaría por debajo de LOD_TEXT_MIN_PX (marco y barra de
+    título, sin maquetar nada) y LOD_FULL en otro caso."""
+    t = obj.type
+    side = max(obj.size())
+    if t == "texto": side += 90 # Padding de la píldora
+    if side * zoom < config.LOD_PROXY_PX: return LOD_PROXY
+    if t in LOD_TEXT_SIZES and LOD_TEXT_SIZES[t] * zoom < config.LOD_TEXT_MIN_PX: return LOD_NO_TEXT
+    return LOD_FULL
+
+def draw_lod_proxy(painter, rect, color, selected, triangle=False):
+    """Sustituto de un objeto diminuto en pantalla: su silueta rellena con el color del
+    objeto, más opaco porque ya no lleva vidrio debajo. A este tamaño las esquinas
+    redondeadas y el antialiasing no se aprecian y son lo más caro de pintar."""
+    fill = QColor(color); fill.setAlpha(max(fill.alpha(), 200))
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing, False)
+    painter.setBrush(QBrush(fill))
+    painter.setPen(QPen(QColor(0, 120, 215, 255), 2) if selected else QPen(QColor(255, 255, 255, 60), 1))
+    if triangle:
+        painter.drawPolygon(QPolygonF([QPointF(rect.center().x(), rect.top()), rect.bottomLeft(), rect.bottomRight()]))
+    else:
+        painter.drawRect(rect)
+    painter.restore()
+    if selected: draw_resize_handle(painter, rect)
+
 def draw_resize_handle(painter, rect, draw_delete=True):
     painter.save()
     painter.setBrush(QColor(255, 255, 255, 200))
@@ -28,39 +69,18 @@ def draw_resize_handle(painter, rect, draw_delete=True):
         painter.drawLine(p1, p2); painter.drawLine(p3, p4)
 
     painter.restore()
-    painter.restore()
 
 def draw_rounded_rect(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
     
-    size_w = obj.get("w", 100) * zoom
-    size_h = obj.get("h", 100) * zoom
+    w_world, h_world = obj.size()
+    size_w, size_h = w_world * zoom, h_world * zoom
     rect = QRectF(screen_x - size_w/2, screen_y - size_h/2, size_w, size_h)
-    s_rect = rect.toRect()
+    bg_color = obj.color_or(QColor(60, 60, 80, 100))
+    if lod_level(obj, zoom) == LOD_PROXY: return draw_lod_proxy(painter, rect, bg_color, selected_index != -1)
     
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath()
-        path.addRoundedRect(rect, 15, 15)
-        painter.setClipPath(path)
-        
-        refr_zoom = config.GLASS_REFRACTION
-        src_w = s_rect.width() / refr_zoom
-        src_h = s_rect.height() / refr_zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0)
-        painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, rect, radius=15)
     
-    bg_color = obj.get("personal_color", QColor(60, 60, 80, 100))
     border_color = get_contrast_color(bg_color)
     width = 3 if selected_index != -1 else 1.5
     if selected_index != -1: 
@@ -76,38 +96,21 @@ def draw_rounded_rect(painter, obj, index, selected_index, zoom, world_to_screen
         draw_resize_handle(painter, rect)
 
 def draw_triangle(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
-    size_w = obj.get("w", 100) * zoom
-    size_h = obj.get("h", 100) * zoom
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
+    w_world, h_world = obj.size()
+    size_w, size_h = w_world * zoom, h_world * zoom
     
     points = QPolygonF([
         QPointF(screen_x, screen_y - size_h/2),
         QPointF(screen_x - size_w/2, screen_y + size_h/2),
         QPointF(screen_x + size_w/2, screen_y + size_h/2)
     ])
+    rect = QRectF(screen_x - size_w/2, screen_y - size_h/2, size_w, size_h)
+    bg_color = obj.color_or(QColor(60, 60, 80, 100))
+    if lod_level(obj, zoom) == LOD_PROXY: return draw_lod_proxy(painter, rect, bg_color, selected_index != -1, triangle=True)
     
-    s_rect = QRect(int(screen_x - size_w/2), int(screen_y - size_h/2), int(size_w), int(size_h))
-    
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addPolygon(points); painter.setClipPath(path)
-        
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 1), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, -1), blurred_map, src_rect)
-        painter.setOpacity(1.0)
-        painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, rect, shape="triangle")
 
-    bg_color = obj.get("personal_color", QColor(60, 60, 80, 100))
     border_color = get_contrast_color(bg_color)
     width = 3 if selected_index != -1 else 1.5
     if selected_index != -1: border_color = QColor(0, 120, 215, 255)
@@ -115,38 +118,24 @@ def draw_triangle(painter, obj, index, selected_index, zoom, world_to_screen, bl
     painter.drawPolygon(points)
     
     if selected_index != -1:
-        rect = QRectF(screen_x - size_w/2, screen_y - size_h/2, size_w, size_h)
         draw_resize_handle(painter, rect)
 
 def draw_window(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
     
-    width = obj.get("w", 200) * zoom
-    height = obj.get("h", 150) * zoom
+    w_world, h_world = obj.size()
+    width, height = w_world * zoom, h_world * zoom
     title_height = 30 * zoom
     main_rect = QRectF(screen_x - width/2, screen_y - height/2, width, height)
     title_rect = QRectF(screen_x - width/2, screen_y - height/2, width, title_height)
+    title_color = obj.color_or(QColor(70, 70, 90, 230))
+    lod = lod_level(obj, zoom)
+    if lod == LOD_PROXY: return draw_lod_proxy(painter, main_rect, title_color, selected_index != -1)
     
-    s_rect = main_rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(main_rect, 10, 10); painter.setClipPath(path)
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, main_rect, radius=10)
     
     painter.setBrush(Qt.NoBrush); painter.setPen(Qt.NoPen); painter.drawRoundedRect(main_rect, 10, 10)
     
-    title_color = obj.get("personal_color", QColor(70, 70, 90, 230))
     painter.setBrush(QBrush(QColor(title_color.red(), title_color.green(), title_color.blue(), 180)))
     painter.drawRoundedRect(title_rect, 10, 10)
     painter.drawRect(QRectF(title_rect.x(), title_rect.y() + title_height/2, title_rect.width(), title_height/2))
@@ -157,91 +146,330 @@ def draw_window(painter, obj, index, selected_index, zoom, world_to_screen, blur
         border_color = QColor(0, 120, 215, 255); width_border = 3
     painter.setBrush(Qt.NoBrush); painter.setPen(QPen(border_color, width_border))
     painter.drawRoundedRect(main_rect, 10, 10)
+    if lod == LOD_NO_TEXT: # Letra ilegible a este zoom: solo marco y barra de título
+        if selected_index != -1: draw_resize_handle(painter, main_rect)
+        return
     
     painter.setPen(QPen(config.TEXT_COLOR))
-    painter.drawText(title_rect, Qt.AlignCenter, obj.get("title", "Ventana"))
+    painter.drawText(title_rect, Qt.AlignCenter, obj.display_title())
     
-    content_rect = QRectF(main_rect.x() + 15, main_rect.y() + title_height + 15, main_rect.width() - 30, main_rect.height() - title_height - 30)
-    content_text = obj.get("content", "")
+    content_rect = _window_content_rect(main_rect, title_height)
+    buffer = text_buffer.buffer_for(obj)
     painter.setPen(QPen(QColor(255, 255, 255, 220)))
     font = painter.font(); font.setPointSize(int(13 * zoom)); painter.setFont(font)
     
+    # El cursor parpadeante se dibuja aparte (draw_text_caret) para que esta capa sea cacheable
     is_selected = (selected_index == index)
-    cursor = "|" if (int(time.time() * 2) % 2 == 0) and is_selected else ""
-    if not is_selected and not content_text:
+    if not is_selected and len(buffer) == 0:
         painter.setOpacity(0.4); painter.drawText(content_rect, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, "Empieza a escribir..."); painter.setOpacity(1.0)
     else:
-        display_text = content_text + cursor if is_selected else content_text
-        painter.drawText(content_rect, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, display_text)
+        paragraphs, scale, layout_font = _window_paragraphs(obj, zoom, content_rect)
+        painter.save(); painter.setClipRect(content_rect, Qt.IntersectClip)
+        painter.translate(content_rect.topLeft()); painter.scale(scale, scale); painter.setFont(layout_font)
+        for layout, y in paragraphs.values():
+            layout.draw(painter, QPointF(0, y))
+        painter.restore()
 
     if selected_index != -1:
         draw_resize_handle(painter, main_rect)
 
-def draw_text_object(painter, obj, index, selected_index, zoom, world_to_screen, default_text_color, blurred_map=None):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
-    text = obj.get("text", "")
-    is_selected = (selected_index == index)
-    cursor = "|" if (int(time.time() * 2) % 2 == 0) and is_selected else ""
-    display_text = text if text or is_selected else "Empieza a escribir..."
-    font = painter.font(); font.setPointSize(int(16 * min(zoom, 1.5))); painter.setFont(font)
-    
-    metrics = painter.fontMetrics()
-    text_rect_base = metrics.boundingRect(QRect(0, 0, 1000, 1000), Qt.AlignCenter, display_text + "|")
-    
-    w_world = obj.get("w", text_rect_base.width() / zoom)
-    h_world = obj.get("h", text_rect_base.height() / zoom)
+def _window_content_rect(main_rect, title_height):
+    return QRectF(main_rect.x() + 15, main_rect.y() + title_height + 15, main_rect.width() - 30, main_rect.height() - title_height - 30)
+
+def _window_paragraphs(obj, zoom, content_rect):
+    """({línea: (QTextLayout, y)}, escala, fuente) de los párrafos de la ventana que caben
+    en `content_rect`.
+    
+    Se maqueta al tramo de zoom (zoom_bucket) y se pinta escalado, así al hacer zoom
+    dentro de un tramo no se rehace nada. Cada párrafo se maqueta por separado y se
+    guarda junto a su texto en obj.state.paragraphs; solo se rehacen los que cambian o
+    los que acaban de entrar. El ancho se redondea hacia abajo a LAYOUT_WIDTH_STEP."""
+    buffer = text_buffer.buffer_for(obj)
+    bucket = zoom_bucket(zoom)
+    scale = zoom / bucket
+    font = QFont(); font.setPointSize(max(1, int(13 * bucket)))
+    step = config.LAYOUT_WIDTH_STEP
+    width = max(step, math.floor(content_rect.width() / scale / step) * step)
+    key = (font.pointSize(), width)
+    cached_key, cached = obj.state.paragraphs or (None, {})
+    if cached_key != key: cached = {}
+    
+    paragraphs = {}
+    option = QTextOption(); option.setWrapMode(QTextOption.WordWrap)
+    y, i, count = 0.0, 0, buffer.line_count()
+    while i < count and y < content_rect.height() / scale:
+        text = buffer.line(i)
+        entry = cached.get(i)
+        if entry is None or entry[0] != text:
+            layout = QTextLayout(text, font); layout.setTextOption(option)
+            layout.beginLayout()
+            height = 0.0
+            while True:
+                line = layout.createLine()
+                if not line.isValid(): break
+                line.setLineWidth(width); line.setPosition(QPointF(0, height)); height += line.height()
+            layout.endLayout()
+            entry = (text, layout, height)
+        paragraphs[i] = entry
+        y += entry[2]; i += 1
+    obj.state.paragraphs = (key, paragraphs)
+    
+    result, y = {}, 0.0
+    for i, (_, layout, height) in paragraphs.items():
+        result[i] = (layout, y); y += height
+    return result, scale, font
+
+PLACEHOLDER_TEXT = "Empieza a escribir..."
+_PLACEHOLDER = text_buffer.TextBuffer(PLACEHOLDER_TEXT)
+_placeholder_metrics = {} # Tamaño de fuente -> medidas del placeholder
+
+def _text_metrics(obj, font, placeholder=False):
+    """Medidas por línea del texto de un objeto "texto" (o del placeholder): {"size":
+    (ancho, alto) en píxeles, "line_height", "count", "buffer", ...}; la forma de cada
+    línea (_shaped_line) se prepara aparte, solo para las que se pintan.
+    
+    Se guardan en obj.state.metrics por tamaño de fuente (que ya va por tramos: se
+    limita a 1.5x) y se ponen al día con el registro de ediciones del buffer: tras
+    teclear solo se miden las líneas tocadas, sin reconstruir ni partir el texto."""
+    if placeholder:
+        key = font.pointSize()
+        entry = _placeholder_metrics[key] = _line_metrics(_placeholder_metrics.get(key), _PLACEHOLDER, font)
+    else:
+        entry = obj.state.metrics = _line_metrics(obj.state.metrics, text_buffer.buffer_for(obj), font)
+    return entry
+
+def _line_metrics(entry, buffer, font):
+    metrics = QFontMetrics(font)
+    bound = lambda text: metrics.boundingRect(QRect(0, 0, 1000, 1000), Qt.AlignCenter, text).width()
+    edits = None
+    if entry is not None and entry["buffer"] is buffer and entry["font"] == font.pointSize():
+        edits = buffer.edits_since(entry["revision"])
+    if edits is None:
+        count = buffer.line_count()
+        box = QFontMetricsF(font).boundingRect(QRectF(0, 0, 1000, 1000), Qt.AlignCenter, "|").height()
+        spacing = QFontMetricsF(font).boundingRect(QRectF(0, 0, 1000, 1000), Qt.AlignCenter, "\n|").height() - box
+        entry = {"font": font.pointSize(), "buffer": buffer, "line_height": metrics.height(), "widths": [0] * count,
+                 "widest": None, "last": None, "shaped": {}, "first_height": box, "spacing": spacing}
+        dirty = [(0, count)]
+    else:
+        # Cada edición cambia `removed` líneas desde `first` por `added`: se apunta si se
+        # va la línea más ancha y se desplazan los tramos que quedan por medir
+        widths, widest, dirty = entry["widths"], entry["widest"], []
+        for first, removed, added in edits:
+            if widest is not None and max(widths[first:first + removed], default=0) >= widest: widest = None
+            widths[first:first + removed] = [0] * added
+            dirty = _shift_spans(dirty, first, removed, added)
+        entry["widest"] = widest
+    entry["revision"] = buffer.revision
+    widths = entry["widths"]
+    measured = 0
+    for start, end in dirty:
+        for i in range(start, end):
+            widths[i] = bound(buffer.line(i)); measured = max(measured, widths[i])
+    entry["widest"] = max(widths) if entry["widest"] is None else max(entry["widest"], measured)
+    
+    # La última línea se mide con el hueco del cursor al final
+    count = entry["count"] = len(widths)
+    last = buffer.line(count - 1)
+    if entry["last"] is None or entry["last"][0] != last: entry["last"] = (last, bound(last + "|"))
+    # Alto del bloque como lo daría boundingRect (centrado en la caja de 1000 y redondeado hacia fuera)
+    block = entry["first_height"] + (count - 1) * entry["spacing"]
+    entry["size"] = (max(entry["widest"], entry["last"][1]), math.ceil(500 + block / 2) - math.floor(500 - block / 2))
+    return entry
+
+def _shift_spans(spans, first, removed, added):
+    """Tramos [inicio, fin) de líneas tras cambiar `removed` líneas desde `first` por
+    `added`, más el tramo de las nuevas"""
+    shift, result = added - removed, []
+    for start, end in spans:
+        if end <= first: result.append((start, end))
+        elif start >= first + removed: result.append((start + shift, end + shift))
+        else: # Solo sobrevive lo que queda fuera de las líneas cambiadas
+            if start < first: result.append((start, first))
+            if end > first + removed: result.append((first + added, end + shift))
+    result.append((first, first + added))
+    return result
+
+def _shaped_line(text_metrics, font, text, static):
+    """[avance, QStaticText] de una línea; el QStaticText solo se prepara si `static`.
+    Se guardan en text_metrics["shaped"] por texto mientras se sigan pintando."""
+    shaped = text_metrics["shaped"].get(text)
+    if shaped is None: shaped = [QFontMetrics(font).horizontalAdvance(text), None]
+    if static and shaped[1] is None:
+        shaped[1] = QStaticText(text); shaped[1].setTextFormat(Qt.PlainText); shaped[1].prepare(QTransform(), font)
+    return shaped
+
+def _text_font(zoom):
+    font = QFont(); font.setPointSize(int(16 * min(zoom, 1.5)))
+    return font
+
+def _text_object_rect(obj, zoom, world_to_screen, text_metrics):
+    """Rectángulo en pantalla de la píldora de un objeto texto"""
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
+    w_world, h_world = obj.w, obj.h
+    if w_world is None or h_world is None:
+        text_w, text_h = text_metrics["size"]
+        if w_world is None: w_world = text_w / zoom
+        if h_world is None: h_world = text_h / zoom
     
     padding_x = 45 * zoom; padding_y = 25 * zoom
-    rect = QRectF(screen_x - (w_world*zoom)/2 - padding_x, screen_y - (h_world*zoom)/2 - padding_y, w_world*zoom + padding_x*2, h_world*zoom + padding_y*2)
-    s_rect = rect.toRect()
+    return QRectF(screen_x - (w_world*zoom)/2 - padding_x, screen_y - (h_world*zoom)/2 - padding_y, w_world*zoom + padding_x*2, h_world*zoom + padding_y*2)
 
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(rect, 15, 15); painter.setClipPath(path)
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x, src_y = s_rect.x() + (s_rect.width() - src_w) / 2, s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+GLASS_TYPES = {"cuadrado", "triangulo", "ventana", "markdown", "codigo", "dibujo"}
+
+def get_glass_rect(obj, zoom, world_to_screen):
+    """Rectángulo en pantalla de la superficie de vidrio del objeto (None si no muestrea el desenfoque)"""
+    t = obj.type
+    if t == "texto":
+        # Con el placeholder la píldora es igual o más ancha que seleccionada y vacía
+        placeholder = len(text_buffer.buffer_for(obj)) == 0
+        return _text_object_rect(obj, zoom, world_to_screen, _text_metrics(obj, _text_font(zoom), placeholder))
+    if t not in GLASS_TYPES: return None
+
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
+    w_world, h_world = obj.size()
+    width, height = w_world * zoom, h_world * zoom
+    return QRectF(screen_x - width/2, screen_y - height/2, width, height)
+
+def draw_text_object(painter, obj, index, selected_index, zoom, world_to_screen, default_text_color, blurred_map=None):
+    is_selected = (selected_index == index)
+    empty = len(text_buffer.buffer_for(obj)) == 0
+    font = _text_font(zoom); painter.setFont(font)
+    text_metrics = _text_metrics(obj, font, placeholder=empty and not is_selected)
+    
+    rect = _text_object_rect(obj, zoom, world_to_screen, text_metrics)
+    text_color = obj.color_or(default_text_color)
+    lod = lod_level(obj, zoom)
+    if lod == LOD_PROXY: return draw_lod_proxy(painter, rect, text_color, is_selected)
+
+    glass.draw_glass(painter, blurred_map, rect, radius=15)
 
     painter.setBrush(QBrush(QColor(20, 20, 35, 140))); painter.setPen(Qt.NoPen); painter.drawRoundedRect(rect, 15, 15)
-    text_color = obj.get("personal_color", default_text_color)
     if is_selected: text_color = get_contrast_color(text_color)
-    painter.setOpacity(0.4 if (not text and not is_selected) else 1.0)
-    painter.setPen(QPen(text_color)); painter.drawText(rect, Qt.AlignCenter, display_text + cursor); painter.setOpacity(1.0)
+    painter.setOpacity(0.4 if (empty and not is_selected) else 1.0)
+    line_h = text_metrics["line_height"]
+    top = rect.center().y() - text_metrics["count"] * line_h / 2
+    # Solo las líneas que caen dentro de lo que se repinta
+    visible = (painter.clipBoundingRect() if painter.hasClipping() else QRectF(painter.viewport())).intersected(rect)
+    first = max(0, math.floor((visible.top() - top) / line_h))
+    last = min(text_metrics["count"], math.ceil((visible.bottom() - top) / line_h))
+    buffer, shaped = text_metrics["buffer"], {}
+    if lod == LOD_NO_TEXT:
+        # Letra ilegible: cada línea es una barra de su ancho, sin dar forma al texto
+        painter.setBrush(QBrush(text_color))
+        for i in range(first, last):
+            text = buffer.line(i)
+            shaped[text] = _shaped_line(text_metrics, font, text, False)
+            line_w = shaped[text][0]
+            painter.drawRect(QRectF(rect.center().x() - line_w / 2, top + (i + 0.25) * line_h, line_w, line_h / 2))
+    else:
+        painter.setPen(QPen(text_color))
+        for i in range(first, last): # Centrado línea a línea, como drawText
+            text = buffer.line(i)
+            line_w, static = shaped[text] = _shaped_line(text_metrics, font, text, True)
+            painter.drawStaticText(QPointF(rect.center().x() - line_w / 2, top + i * line_h), static)
+    text_metrics["shaped"] = shaped # Se olvidan las líneas que ya no se pintan
+    painter.setOpacity(1.0)
     
     if is_selected: draw_resize_handle(painter, rect)
 
-def draw_image_object(painter, obj, index, selected_index, zoom, world_to_screen):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
-    
-    w_orig, h_orig = obj.get("w_orig", obj.get("w", 300)), obj.get("h_orig", obj.get("h", 300))
-    if "w_orig" not in obj: obj["w_orig"], obj["h_orig"] = w_orig, h_orig
+def _caret_geometry(obj, zoom, world_to_screen, default_text_color):
+    """(línea base, fuente, color) del cursor del objeto en edición, o None si no tiene"""
+    if lod_level(obj, zoom) != LOD_FULL: return None
+    font = QFont()
+    if obj.type == "ventana":
+        screen_x, screen_y = world_to_screen(obj.x, obj.y)
+        w_world, h_world = obj.size()
+        width, height = w_world * zoom, h_world * zoom
+        main_rect = QRectF(screen_x - width/2, screen_y - height/2, width, height)
+        content_rect = _window_content_rect(main_rect, 30 * zoom)
+        font.setPointSize(int(13 * zoom))
+        
+        # Mismos párrafos maquetados que draw_window; si el cursor queda fuera no se pinta
+        line, col = text_buffer.buffer_for(obj).caret_line_col()
+        paragraphs, scale, _ = _window_paragraphs(obj, zoom, content_rect)
+        if line not in paragraphs: return None
+        layout, y = paragraphs[line]
+        text_line = layout.lineForTextPosition(col)
+        if not text_line.isValid(): return None
+        x = text_line.cursorToX(col)[0]
+        baseline = QPointF(content_rect.x() + x * scale, content_rect.y() + (y + text_line.y() + text_line.ascent()) * scale)
+        color = QColor(255, 255, 255, 220)
+    elif obj.type == "texto":
+        font = _text_font(zoom)
+        metrics = QFontMetrics(font)
+        buffer = text_buffer.buffer_for(obj)
+        text_metrics = _text_metrics(obj, font)
+        rect = _text_object_rect(obj, zoom, world_to_screen, text_metrics)
+        
+        # El texto va centrado línea a línea: el cursor se sitúa dentro de su línea
+        line, col = buffer.caret_line_col()
+        text = buffer.line(line)
+        block_h = text_metrics["count"] * metrics.height()
+        line_top = rect.center().y() - block_h / 2 + line * metrics.height()
+        line_left = rect.center().x() - metrics.horizontalAdvance(text) / 2
+        baseline = QPointF(line_left + metrics.horizontalAdvance(text[:col]), line_top + metrics.ascent())
+        color = get_contrast_color(obj.color_or(default_text_color))
+    else:
+        return None
+    return baseline, font, color
+
+def text_caret_rect(obj, zoom, world_to_screen, default_text_color):
+    """Rect en pantalla que ocupa el cursor (para repintar solo esa zona), o None"""
+    geometry = _caret_geometry(obj, zoom, world_to_screen, default_text_color)
+    if geometry is None: return None
+    baseline, font, _ = geometry
+    metrics = QFontMetrics(font)
+    return QRectF(baseline.x(), baseline.y() - metrics.ascent(), metrics.horizontalAdvance("|"), metrics.height()).adjusted(-2, -2, 2, 2)
+
+def draw_text_caret(painter, obj, zoom, world_to_screen, default_text_color):
+    """Dibuja el cursor del objeto en edición (el parpadeo lo decide el lienzo).
     
-    w_world = obj.get("w", w_orig)
-    h_world = obj.get("h", h_orig)
+    Va en la capa de presentación, fuera de la escena cacheada, para que el
+    parpadeo no obligue a redibujar ningún objeto."""
+    geometry = _caret_geometry(obj, zoom, world_to_screen, default_text_color)
+    if geometry is None: return
+    baseline, font, color = geometry
     
-    # Limitar tamaño inicial si no tiene dimensiones guardadas
-    if "w" not in obj:
-        scale = min(300 / w_orig, 300 / h_orig)
-        w_world = w_orig * scale; h_world = h_orig * scale
-        obj["w"], obj["h"] = w_world, h_world
+    painter.save()
+    painter.setFont(font); painter.setPen(QPen(color))
+    painter.drawText(baseline, "|")
+    painter.restore()
 
+def draw_image_object(painter, obj, index, selected_index, zoom, world_to_screen):
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
+    w_world, h_world = obj.size()
     rect = QRectF(screen_x - (w_world*zoom)/2, screen_y - (h_world*zoom)/2, w_world*zoom, h_world*zoom)
     
+    image = obj.state.image
+    usable = image and not image.isNull() and not obj.state.missing_asset
+    # Nivel de la pirámide más parecido al tamaño en pantalla (nunca menor); None si
+    # hace falta el nivel base y se está recargando sin ningún otro nivel que mostrar
+    pixmap = image.pixmap_for(rect.width(), rect.height()) if usable else None
+    if lod_level(obj, zoom) == LOD_PROXY:
+        # Sin recorte redondeado ni borde: el nivel más pequeño de la pirámide basta
+        if pixmap is not None:
+            painter.drawPixmap(rect.toRect(), pixmap)
+        else:
+            draw_lod_proxy(painter, rect, QColor(40, 40, 50), False)
+        if selected_index != -1:
+            painter.setBrush(Qt.NoBrush); painter.setPen(QPen(QColor(0, 120, 215, 255), 2)); painter.drawRect(rect)
+            draw_resize_handle(painter, rect)
+        return
+    
     painter.save()
     path = QPainterPath(); path.addRoundedRect(rect, 20, 20); painter.setClipPath(path)
     
-    px = obj.get("pixmap")
-    if px and not px.isNull() and not obj.get("missing_asset", False):
-        painter.drawPixmap(rect.toRect(), px)
+    if pixmap is not None:
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(rect.toRect(), pixmap)
+    elif obj.state.loading or usable:
+        # Aún decodificándose en segundo plano
+        painter.setBrush(QBrush(QColor(40, 40, 50))); painter.setPen(Qt.NoPen)
+        painter.drawRect(rect)
+        painter.setPen(QPen(QColor(200, 200, 200, 150)))
+        font = painter.font(); font.setPointSize(max(1, int(10 * zoom))); painter.setFont(font)
+        painter.drawText(rect, Qt.AlignCenter, "Cargando...")
     else:
         # Placeholder para Asset faltante
         painter.setBrush(QBrush(QColor(40, 40, 50)))
@@ -249,7 +477,7 @@ def draw_image_object(painter, obj, index, selected_index, zoom, world_to_screen
         painter.drawRect(rect)
         painter.setPen(QPen(QColor(255, 60, 60)))
         font = painter.font(); font.setPointSize(int(10 * zoom)); painter.setFont(font)
-        painter.drawText(rect, Qt.AlignCenter, "Missing Asset\n" + os.path.basename(obj.get("path", "Unknown")))
+        painter.drawText(rect, Qt.AlignCenter, "Missing Asset\n" + os.path.basename(obj.state.path or "Unknown"))
         # Dibujar una X roja
         painter.setPen(QPen(QColor(255, 60, 60, 80), 3))
         painter.drawLine(rect.topLeft(), rect.bottomRight())
@@ -265,34 +493,50 @@ def draw_image_object(painter, obj, index, selected_index, zoom, world_to_screen
 
     if selected_index != -1: draw_resize_handle(painter, rect)
 
+_relayout_deferred = False # True mientras se redimensiona: se reutiliza la maquetación anterior escalada
+
+def set_relayout_deferred(deferred):
+    global _relayout_deferred
+    _relayout_deferred = deferred
+
+def layout_view(obj, text_width):
+    """Ajusta el ancho de la vista de markdown y devuelve la escala con la que pintarla.
+    
+    Se maqueta al tramo de LAYOUT_WIDTH_STEP más cercano y la diferencia se absorbe
+    pintando con esa escala; con la maquetación aplazada se reutiliza el ancho actual."""
+    step = config.LAYOUT_WIDTH_STEP
+    bucket = max(step, round(text_width / step) * step)
+    view = obj.state.view
+    if view.width != bucket:
+        if _relayout_deferred and view.width > 0:
+            obj.state.doc_scale = text_width / view.width
+            return obj.state.doc_scale
+        view.set_width(bucket)
+    obj.state.doc_scale = text_width / bucket
+    return obj.state.doc_scale
+
+def _clipped_span(painter, top, bottom):
+    """Tramo vertical [top, bottom] del contenido (coordenadas ya transformadas) que queda
+    dentro del recorte: en un repintado parcial solo se maquetan y pintan esas líneas"""
+    clip = painter.clipBoundingRect()
+    if clip.isEmpty(): return top, bottom
+    return max(top, clip.top()), max(max(top, clip.top()), min(bottom, clip.bottom()))
+
 def draw_markdown_object(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
     
-    width_world = obj.get("w", 300)
-    height_world = obj.get("h", 400)
+    width_world, height_world = obj.size()
     width, height = width_world * zoom, height_world * zoom
     title_height = 30 * zoom
     
     rect = QRectF(screen_x - width/2, screen_y - height/2, width, height)
     title_rect = QRectF(screen_x - width/2, screen_y - height/2, width, title_height)
+    bg_color = obj.color_or(QColor(30, 30, 45, 180))
+    lod = lod_level(obj, zoom)
+    if lod == LOD_PROXY: return draw_lod_proxy(painter, rect, bg_color, selected_index != -1)
     
-    s_rect = rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(rect, 15, 15); painter.setClipPath(path)
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x, src_y = s_rect.x() + (s_rect.width() - src_w) / 2, s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, rect, radius=15)
 
-    bg_color = obj.get("personal_color", QColor(30, 30, 45, 180))
     painter.setBrush(QBrush(bg_color))
     border_color = QColor(255, 255, 255, 100); border_width = 1.5
     if selected_index != -1: # Cambiado de index a check de seleccion
@@ -302,70 +546,59 @@ def draw_markdown_object(painter, obj, index, selected_index, zoom, world_to_scr
     title_bg = QColor(bg_color.red(), bg_color.green(), bg_color.blue(), 230)
     painter.setBrush(QBrush(title_bg)); painter.setPen(Qt.NoPen); painter.drawRoundedRect(title_rect, 15, 15)
     painter.drawRect(QRectF(title_rect.x(), title_rect.y() + title_height/2, title_rect.width(), title_height/2))
+    if lod == LOD_NO_TEXT: # Sin maquetar el documento: solo marco y barra de título
+        if selected_index != -1: draw_resize_handle(painter, rect)
+        return
     
     painter.setPen(QPen(config.TEXT_COLOR))
     title_font = painter.font(); title_font.setBold(True); title_font.setPointSize(int(11 * zoom)); painter.setFont(title_font)
-    painter.drawText(title_rect.adjusted(10, 0, -10, 0), Qt.AlignLeft | Qt.AlignVCenter, obj.get("title", "README.md"))
+    painter.drawText(title_rect.adjusted(10, 0, -10, 0), Qt.AlignLeft | Qt.AlignVCenter, obj.display_title())
     
     padding = 15 * zoom
     content_rect = rect.adjusted(padding, title_height + padding, -padding, -padding)
     world_visible_width = content_rect.width() / zoom
     world_visible_height = content_rect.height() / zoom
     
-    if "doc" not in obj:
-        obj["doc"] = QTextDocument()
-        obj["doc"].setDefaultStyleSheet("* { color: #ffffff; } h1 { font-size: 18px; font-weight: bold; } p { font-size: 12px; }")
-        obj["doc"].setMarkdown(obj.get("content", ""))
+    if obj.state.view is None or obj.state.view.text is not obj.state.content:
+        obj.state.view = text_view.MarkdownView(obj.state.content)
 
-    if obj["doc"].textWidth() != world_visible_width: obj["doc"].setTextWidth(world_visible_width)
-    obj["max_scroll_y"] = max(0, obj["doc"].size().height() - world_visible_height)
-    scroll_y = obj.get("scroll_y", 0)
+    view = obj.state.view
+    doc_scale = layout_view(obj, width_world - 2 * 15)
+    obj.state.max_scroll_y = max(0, view.content_height() * doc_scale - world_visible_height)
+    scroll_y = obj.state.scroll_y
     
     painter.save()
     painter.translate(content_rect.topLeft())
-    clip_path = QPainterPath(); clip_path.addRoundedRect(QRectF(0, 0, content_rect.width(), content_rect.height()), 5, 5); painter.setClipPath(clip_path)
-    painter.scale(zoom, zoom); painter.translate(0, -scroll_y)
+    clip_path = QPainterPath(); clip_path.addRoundedRect(QRectF(0, 0, content_rect.width(), content_rect.height()), 5, 5); painter.setClipPath(clip_path, Qt.IntersectClip)
+    painter.scale(zoom * doc_scale, zoom * doc_scale); painter.translate(0, -scroll_y / doc_scale)
     
-    ctx = QAbstractTextDocumentLayout.PaintContext(); sel_pal = QPalette(); sel_pal.setColor(QPalette.Text, Qt.white); sel_pal.setColor(QPalette.Highlight, QColor(0, 122, 255, 180)); sel_pal.setColor(QPalette.HighlightedText, Qt.white); ctx.palette = sel_pal
-    if obj.get("sel_start") is not None and obj.get("sel_end") is not None:
-        selection = QAbstractTextDocumentLayout.Selection(); cursor = QTextCursor(obj["doc"]); cursor.setPosition(obj["sel_start"]); cursor.setPosition(obj["sel_end"], QTextCursor.KeepAnchor); selection.cursor = cursor; ctx.selections = [selection]
-    painter.setPen(Qt.white); obj["doc"].documentLayout().draw(painter, ctx); painter.restore()
+    sel_pal = QPalette(); sel_pal.setColor(QPalette.Text, Qt.white); sel_pal.setColor(QPalette.Highlight, QColor(0, 122, 255, 180)); sel_pal.setColor(QPalette.HighlightedText, Qt.white)
+    painter.setPen(Qt.white)
+    top, bottom = _clipped_span(painter, scroll_y / doc_scale, (scroll_y + world_visible_height) / doc_scale)
+    view.paint(painter, top, bottom, sel_pal, obj.state.sel_start, obj.state.sel_end)
+    painter.restore()
     
     if selected_index != -1: draw_resize_handle(painter, rect)
 
 def draw_code_object(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
     """Renderiza un editor de contenido de código estilo IDE"""
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
     
-    width_world = obj.get("w", 500)
-    height_world = obj.get("h", 400)
+    width_world, height_world = obj.size()
     width, height = width_world * zoom, height_world * zoom
     title_height = 30 * zoom
     
     rect = QRectF(screen_x - width/2, screen_y - height/2, width, height)
     title_rect = QRectF(screen_x - width/2, screen_y - height/2, width, title_height)
     
-    # 1. Fondo Glassmorphism Oscuro
-    s_rect = rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(rect, 10, 10); painter.setClipPath(path)
-        
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x, src_y = s_rect.x() + (s_rect.width() - src_w) / 2, s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        painter.setOpacity(0.4)
-        ab = config.GLASS_ABERRATION
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
-
     # Fondo estilo editor oscuro translúcido para el efecto glass
     bg_color = QColor(30, 30, 30, 120) 
+    lod = lod_level(obj, zoom)
+    if lod == LOD_PROXY: return draw_lod_proxy(painter, rect, QColor(45, 45, 50), selected_index != -1)
+    
+    # 1. Fondo Glassmorphism Oscuro
+    glass.draw_glass(painter, blurred_map, rect, radius=10)
+
     painter.setBrush(QBrush(bg_color))
     
     border_color = QColor(60, 60, 80, 150)
@@ -384,12 +617,15 @@ def draw_code_object(painter, obj, index, selected_index, zoom, world_to_screen,
     painter.drawPath(path_title)
     # Rellenar la curva inferior para que conecte con el cuerpo
     painter.drawRect(QRectF(title_rect.x(), title_rect.y() + title_height/2, title_rect.width(), title_height/2))
+    if lod == LOD_NO_TEXT: # Sin maquetar ni resaltar el código: solo marco y barra de título
+        if selected_index != -1: draw_resize_handle(painter, rect)
+        return
     
     # Título (solo texto)
     painter.setPen(QPen(QColor(200, 200, 200)))
     title_font = painter.font(); title_font.setFamily("Consolas"); title_font.setPointSize(int(10 * zoom)); painter.setFont(title_font)
     
-    painter.drawText(title_rect.adjusted(15*zoom, 0, -10, 0), Qt.AlignLeft | Qt.AlignVCenter, obj.get("title", "code"))
+    painter.drawText(title_rect.adjusted(15*zoom, 0, -10, 0), Qt.AlignLeft | Qt.AlignVCenter, obj.display_title())
     
     # Contenido
     padding = 10 * zoom
@@ -397,124 +633,127 @@ def draw_code_object(painter, obj, index, selected_index, zoom, world_to_screen,
     world_visible_width = content_rect.width() / zoom
     world_visible_height = content_rect.height() / zoom
     
-    if "doc" not in obj:
-        obj["doc"] = QTextDocument()
-        obj["doc"].setDefaultStyleSheet("""
-            * { color: #d4d4d4; font-family: 'Consolas', 'Monaco', monospace; font-size: 13px; }
-            .keyword { color: #569cd6; font-weight: bold; }
-            .string { color: #ce9178; }
-            .comment { color: #6a9955; font-style: italic; }
-            .function { color: #dcdcaa; }
-        """)
-        
-        raw_code = obj.get("content", "")
-        # Escapado básico
-        safe_code = raw_code.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        obj["doc"].setHtml(f"<pre>{safe_code}</pre>")
-
-    if obj["doc"].textWidth() != world_visible_width: obj["doc"].setTextWidth(world_visible_width)
-    obj["max_scroll_y"] = max(0, obj["doc"].size().height() - world_visible_height)
+    if obj.state.view is None:
+        obj.state.view = text_view.CodeView(obj.state.content, obj.state.ext)
+    elif obj.state.view.text is not obj.state.content:
+        obj.state.view.set_text(obj.state.content) # Conserva el resaltado de las líneas iguales
+    view = obj.state.view
+    obj.state.max_scroll_y = max(0, view.content_height() - world_visible_height)
     
-    scroll_y = obj.get("scroll_y", 0)
+    scroll_y = obj.state.scroll_y
     
     painter.save()
     painter.translate(content_rect.topLeft())
-    clip_path = QPainterPath(); clip_path.addRect(QRectF(0, 0, content_rect.width(), content_rect.height())); painter.setClipPath(clip_path)
+    clip_path = QPainterPath(); clip_path.addRect(QRectF(0, 0, content_rect.width(), content_rect.height())); painter.setClipPath(clip_path, Qt.IntersectClip)
     painter.scale(zoom, zoom); painter.translate(0, -scroll_y)
     
-    ctx = QAbstractTextDocumentLayout.PaintContext()
     # Selección estilo IDE
     sel_pal = QPalette()
     sel_pal.setColor(QPalette.Highlight, QColor(38, 79, 120, 150))
     sel_pal.setColor(QPalette.HighlightedText, Qt.white)
-    ctx.palette = sel_pal
-    
-    if obj.get("sel_start") is not None and obj.get("sel_end") is not None:
-        selection = QAbstractTextDocumentLayout.Selection()
-        cursor = QTextCursor(obj["doc"])
-        cursor.setPosition(obj["sel_start"])
-        cursor.setPosition(obj["sel_end"], QTextCursor.KeepAnchor)
-        selection.cursor = cursor
-        ctx.selections = [selection]
-        
-    painter.setPen(Qt.white); obj["doc"].documentLayout().draw(painter, ctx)
+    top, bottom = _clipped_span(painter, scroll_y, scroll_y + world_visible_height)
+    view.paint(painter, top, bottom, sel_pal, obj.state.sel_start, obj.state.sel_end)
     painter.restore()
 
     if selected_index != -1: draw_resize_handle(painter, rect)
 
+def zoom_bucket(zoom):
+    """Redondea el zoom hacia arriba a un tramo fijo (ZOOM_BUCKETS_PER_OCTAVE por cada x2)"""
+    steps = config.ZOOM_BUCKETS_PER_OCTAVE
+    return 2 ** (math.ceil(math.log2(zoom) * steps - 1e-9) / steps)
+
+def mark_strokes_changed(obj):
+    """Llamar cada vez que cambian los trazos de un dibujo: invalida su ráster cacheado"""
+    obj.state.strokes_rev += 1
+
+def _paint_strokes(painter, strokes, bg_color, zoom):
+    """Pinta los trazos (en coordenadas locales al centro del dibujo) a la escala dada"""
+    for stroke in strokes:
+        points = stroke_lod(stroke, zoom) # Menos vértices cuanto más alejado
+        if len(points) < 2: continue
+        
+        style = stroke.get("style", "lapicero")
+        width = stroke.get("width", 2) * zoom
+        color = QColor(stroke.get("color", Qt.white))
+        
+        painter.save()
+        if style == "rotulador":
+            color.setAlpha(150); width *= 2
+        elif style == "borrador":
+            # Simular borrado pintando del color del vidrio con modo fuente
+            # para que 'pise' lo que hay debajo en este mismo objeto
+            color = QColor(bg_color.red(), bg_color.green(), bg_color.blue(), 255)
+            width *= 3
+        
+        painter.setPen(QPen(color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        poly = QPolygonF()
+        for wx, wy in points:
+            # MULTIPLICAR por zoom para pasar de unidades mundo a píxeles de capa
+            poly.append(QPointF(wx * zoom, wy * zoom))
+        painter.drawPolyline(poly)
+        painter.restore()
+
+def _drawing_raster(obj, strokes, bg_color, bucket):
+    """Ráster de los trazos a la escala `bucket`, desde DRAWING_CACHE si sigue vigente.
+    
+    Devuelve None si el ráster sería demasiado grande para cachearlo."""
+    w_world, h_world = obj.size()
+    layer_w = int(math.ceil(w_world * bucket))
+    layer_h = int(math.ceil(h_world * bucket))
+    if layer_w <= 0 or layer_h <= 0 or max(layer_w, layer_h) > config.DRAWING_CACHE_MAX_SIDE:
+        return None
+    
+    key = (id(obj), bucket)
+    tag = (obj.state.strokes_rev, id(strokes), len(strokes), layer_w, layer_h, bg_color.rgba())
+    layer = DRAWING_CACHE.get(key, tag)
+    if layer is not None: return layer
+    
+    layer = QImage(layer_w, layer_h, QImage.Format_ARGB32_Premultiplied)
+    layer.fill(Qt.transparent)
+    lp = QPainter(layer)
+    lp.setRenderHint(QPainter.Antialiasing)
+    # Ajustar sistema de coordenadas al centro de la capa (px)
+    lp.translate(layer_w/2, layer_h/2)
+    _paint_strokes(lp, strokes, bg_color, bucket)
+    lp.end()
+    DRAWING_CACHE.put(key, layer, tag, owner=obj)
+    return layer
+
 def draw_drawing_object(painter, obj, index, selected_index, zoom, world_to_screen, blurred_map=None):
     """Dibuja un objeto que contiene trazos hechos a mano"""
-    world_x, world_y = obj["x"], obj["y"]
-    screen_x, screen_y = world_to_screen(world_x, world_y)
+    screen_x, screen_y = world_to_screen(obj.x, obj.y)
     
-    width_world = obj.get("w", 200)
-    height_world = obj.get("h", 200)
+    width_world, height_world = obj.size()
     width, height = width_world * zoom, height_world * zoom
     
     rect = QRectF(screen_x - width/2, screen_y - height/2, width, height)
+    bg_color = obj.color_or(QColor(30, 30, 45, 120))
+    if lod_level(obj, zoom) == LOD_PROXY: return draw_lod_proxy(painter, rect, bg_color, selected_index != -1)
     
-    s_rect = rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(rect, 15, 15); painter.setClipPath(path)
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x, src_y = s_rect.x() + (s_rect.width() - src_w) / 2, s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, rect, radius=15)
 
-    bg_color = obj.get("personal_color", QColor(30, 30, 45, 120))
     painter.setBrush(QBrush(bg_color))
     border_color = QColor(255, 255, 255, 100); border_width = 1.5
     if selected_index != -1:
         border_color = QColor(0, 120, 215, 255); border_width = 3
     painter.setPen(QPen(border_color, border_width)); painter.drawRoundedRect(rect, 15, 15)
 
-    # Dibujar los trazos sobre una capa temporal
-    strokes = obj.get("strokes", [])
+    # Trazos: ráster cacheado al tramo de zoom superior y escalado al zoom real
+    strokes = obj.state.strokes
     if strokes:
-        layer_size = rect.size().toSize()
-        if layer_size.width() > 0 and layer_size.height() > 0:
-            layer = QImage(layer_size, QImage.Format_ARGB32_Premultiplied)
-            layer.fill(Qt.transparent)
-            
-            lp = QPainter(layer)
-            lp.setRenderHint(QPainter.Antialiasing)
-            
-            # Ajustar sistema de coordenadas al centro de la capa (px)
-            lp.translate(layer_size.width()/2, layer_size.height()/2)
-            
-            for stroke in strokes:
-                points = stroke.get("points", [])
-                if len(points) < 2: continue
-                
-                style = stroke.get("style", "lapicero")
-                width = stroke.get("width", 2) * zoom
-                color = QColor(stroke.get("color", Qt.white))
-                
-                lp.save()
-                if style == "rotulador":
-                    color.setAlpha(150); width *= 2
-                elif style == "borrador":
-                    # Simular borrado pintando del color del vidrio con modo fuente
-                    # para que 'pise' lo que hay debajo en este mismo objeto
-                    color = QColor(bg_color.red(), bg_color.green(), bg_color.blue(), 255)
-                    width *= 3
-                
-                lp.setPen(QPen(color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-                poly = QPolygonF()
-                for wx, wy in points:
-                    # MULTIPLICAR por zoom para pasar de unidades mundo a píxeles de capa
-                    poly.append(QPointF(wx * zoom, wy * zoom))
-                lp.drawPolyline(poly)
-                lp.restore()
-            
-            lp.end()
-            painter.drawImage(rect.topLeft(), layer)
+        bucket = zoom_bucket(zoom)
+        layer = _drawing_raster(obj, strokes, bg_color, bucket)
+        if layer is not None:
+            painter.save()
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(rect, layer)
+            painter.restore()
+        else:
+            # Demasiado grande para cachear: se pintan los trazos recortados al objeto
+            painter.save()
+            painter.setClipRect(rect, Qt.IntersectClip)
+            painter.translate(rect.center())
+            _paint_strokes(painter, strokes, bg_color, zoom)
+            painter.restore()
     
     if selected_index != -1: draw_resize_handle(painter, rect)
@@ -1,16 +1,29 @@
+import os
 import sys
+import math
+import time
 from PySide6.QtWidgets import QWidget
-from PySide6.QtCore import Qt, QPointF, QTimer, QRectF, QSize
+from PySide6.QtCore import Qt, QPointF, QTimer, QRectF, QSize, QRect
 # Alias para evitar conflicto con la función min/max de python si fuera necesario, o simple uso directo
 def max_(a, b): return a if a > b else b
 
-from PySide6.QtGui import QPainter, QPen, QColor, QWheelEvent, QMouseEvent, QBrush, QPixmap, QPolygonF
+from PySide6.QtGui import QPainter, QPen, QColor, QWheelEvent, QMouseEvent, QBrush, QPixmap, QPolygonF, QRegion, QFont
 
 import config
 import utils
 import canvas_objects
+import syntax_highlight
+import text_buffer
 import toolbar
-from project_manager import ProjectManager
+from render_cache import RenderLayer
+from tile_cache import TileCache
+from frame_stats import FrameStats, STAGES, STAGE_LABELS
+from spatial_index import SpatialIndex
+from stroke_utils import simplify_points, stroke_hit
+from image_pyramid import ImagePyramid
+from asset_loader import AssetLoader, read_image_size
+from project_manager import ProjectManager, load_strokes_file
+from board_objects import BoardObject, AssetState, EditableState
 from PySide6.QtWidgets import QFileDialog
 
 class Canvas(QWidget):
@@ -39,6 +52,10 @@ class Canvas(QWidget):
         
         # Objects
         self.canvas_objects = []
+        self.spatial_index = SpatialIndex() # Cajas de los objetos para hit-test, selección y borrador
+        self.asset_loader = AssetLoader(self) # Imágenes y trazos se leen fuera del hilo de la GUI
+        self._pending_assets = 0 # Objetos con recursos aún sin pedir (proyectos abiertos en diferido)
+        self._last_asset_camera = None # Para saber hacia dónde se mueve la cámara al precargar
         self.selected_objects = [] # Lista de índices seleccionados
         self.selected_object = None # Mantener para compatibilidad
         self.dragging_object = False
@@ -56,12 +73,21 @@ class Canvas(QWidget):
         self.is_animating = False
         
         # Buffers de Renderizado (Cacheados para rendimiento fluido)
-        self.world_pixmap = QPixmap()
-        self.blurred_pixmap = QPixmap()
-        self.full_scene_pixmap = QPixmap()
-        self.final_blur_pixmap = QPixmap()
-        self.last_blur_size = QSize(0,0)
-        self.needs_blur_update = True
+        # Cada capa guarda la clave (cámara, tamaño, generación...) con la que se generó
+        self.world_layer = RenderLayer()      # CAPA 1: fondo, cuadrícula e imágenes
+        self.world_blur_layer = RenderLayer() # CAPA 2: desenfoque estructural
+        self.scene_layer = RenderLayer()      # CAPA 3: escenario completo
+        self.ui_blur_layer = RenderLayer()    # CAPA 4: desenfoque para la UI
+        self.ink_layer = RenderLayer()        # Tinta del trazo en curso (se pinta segmento a segmento)
+        self.world_tiles = TileCache(config.TILE_CACHE_MB * 1024 * 1024, config.TILE_SIZE) # Teselas de la CAPA 1
+        self._scroll_scratch = None # Desenfoque auxiliar del atajo de desplazamiento (ver _scroll_layers)
+        self._ink_drawn = 0 # Puntos del trazo en curso ya pintados en ink_layer
+        self.scene_generation = 0 # Se incrementa con cada cambio en los objetos
+        self.cull_stats = {"drawn": 0, "culled": 0} # Objetos pintados / descartados en el último render de la escena
+        self._image_cull = (0, 0) # Lo mismo para la pasada de imágenes de la CAPA 1
+        self.frame_stats = FrameStats(config.FRAME_STATS_HISTORY) # Tiempos por etapa de los últimos frames
+        self.show_perf_hud = False # F3 muestra u oculta el HUD de rendimiento
+        self.frame_stats_path = None # Último volcado de Shift+F3, se enseña en el HUD
         
         self.animation_timer = QTimer()
         self.animation_timer.timeout.connect(self.update_animation)
@@ -71,10 +97,21 @@ class Canvas(QWidget):
         self.setAcceptDrops(True) # Habilitar Drag & Drop
         self.setFocusPolicy(Qt.StrongFocus) # Permitir foco de teclado
         
-        # Timer para parpadeo de cursor
+        # Maquetación exacta de markdown/código cuando termina el redimensionado
+        self.relayout_timer = QTimer()
+        self.relayout_timer.setSingleShot(True)
+        self.relayout_timer.setInterval(config.RELAYOUT_DEBOUNCE_MS)
+        self.relayout_timer.timeout.connect(self._settle_relayout)
+        # El resaltado de código avanza por trozos; al llegar a las líneas visibles se repinta
+        syntax_highlight.scheduler().progress.connect(self.invalidate_scene)
+        
+        # Timer para parpadeo de cursor: solo corre mientras hay una ventana o un texto
+        # seleccionado (ver _sync_caret_timer) y solo repinta el rect del cursor
         self.cursor_timer = QTimer()
-        self.cursor_timer.timeout.connect(self.update)
-        self.cursor_timer.start(500)
+        self.cursor_timer.setInterval(500)
+        self.cursor_timer.timeout.connect(self._blink_caret)
+        self.caret_visible = True
+        self._caret_rect = None # Rect de pantalla del cursor en el último repintado
         
         self._init_colors()
 
@@ -96,25 +133,209 @@ class Canvas(QWidget):
 
     def get_obj_dims(self, obj):
         """Devuelve (w, h) en unidades del mundo para cualquier objeto."""
-        if "w" in obj and "h" in obj:
-            return obj["w"], obj["h"]
-        
-        t = obj["type"]
-        if t in ["cuadrado", "triangulo"]: return 100, 100
-        if t == "ventana": return 200, 150
-        if t == "markdown": return 300, 400
-        if t == "codigo": return 500, 400
-        if t == "texto": return 200, 50
-        if t == "imagen":
-            w_orig = obj.get("w_orig", obj.get("w", 100))
-            h_orig = obj.get("h_orig", obj.get("h", 100))
-            scale = min(300 / w_orig, 300 / h_orig)
-            return w_orig * scale, h_orig * scale
-        if t == "dibujo":
-            return obj.get("w", 200), obj.get("h", 200)
-        return 100, 100
+        w, h = obj.w, obj.h
+        if w is None or h is None: return obj.size() # Tamaño por defecto del tipo
+        return w, h
+
+    def get_obj_extent(self, obj):
+        """(w, h) en el mundo de todo lo que se pinta del objeto.
+        
+        Coincide con get_obj_dims salvo en los textos, cuya píldora lleva padding
+        y, sin tamaño guardado, se ajusta al texto medido."""
+        if obj.type == "texto":
+            pill = canvas_objects.get_glass_rect(obj, self.zoom, lambda wx, wy: (0.0, 0.0))
+            return pill.width() / self.zoom, pill.height() / self.zoom
+        return self.get_obj_dims(obj)
+
+    def _obj_screen_rect(self, obj):
+        """QRect en pantalla de todo lo que se pinta del objeto, con el margen de _cull_view"""
+        ow, oh = self.get_obj_extent(obj)
+        sx, sy = self.world_to_screen(obj.x, obj.y)
+        margin = 8 + 2 + 1
+        w, h = ow * self.zoom / 2 + margin, oh * self.zoom / 2 + margin
+        return QRectF(sx - w, sy - h, 2 * w, 2 * h).toAlignedRect()
+
+    def _cull_view(self):
+        """Viewport en coordenadas del mundo (x0, y0, x1, y1), ampliado con el margen
+        de los tiradores, el grosor del borde y el píxel suavizado del contorno."""
+        margin = (8 + 2 + 1) / self.zoom
+        x0, y0 = self.screen_to_world(0, 0)
+        x1, y1 = self.screen_to_world(self.width(), self.height())
+        return x0 - margin, y0 - margin, x1 + margin, y1 + margin
+
+    def is_obj_visible(self, obj, view):
+        ow, oh = self.get_obj_extent(obj)
+        ox, oy = obj.x, obj.y
+        return ox + ow/2 >= view[0] and ox - ow/2 <= view[2] and oy + oh/2 >= view[1] and oy - oh/2 <= view[3]
+
+    def invalidate_scene(self):
+        """Marca los objetos como modificados: las capas cacheadas se regeneran en el próximo repintado."""
+        self.scene_generation += 1
+        self.update()
+
+    # --- ÍNDICE ESPACIAL ---
+    # Toda alta, baja o cambio de caja de un objeto pasa por aquí para que el índice
+    # refleje canvas_objects (mismo orden) sin recorrer la lista en cada evento de ratón.
+    def _obj_bounds(self, obj):
+        ow, oh = self.get_obj_dims(obj)
+        ox, oy = obj.x, obj.y
+        return ox - ow/2, oy - oh/2, ox + ow/2, oy + oh/2
+
+    def add_object(self, obj):
+        self.canvas_objects.append(obj)
+        self.spatial_index.insert(obj, self._obj_bounds(obj))
+
+    def remove_object(self, index):
+        obj = self.canvas_objects.pop(index)
+        self.spatial_index.remove(obj)
+        return obj
+
+    def remove_objects(self, indices):
+        """Quita varios objetos en una sola pasada (borrador, Suprimir con varios seleccionados)"""
+        indices = set(indices)
+        if not indices: return
+        removed = [self.canvas_objects[i] for i in indices]
+        self.canvas_objects[:] = [obj for i, obj in enumerate(self.canvas_objects) if i not in indices]
+        self.spatial_index.remove_many(removed)
+
+    def object_geometry_changed(self, obj):
+        """Llamar tras mover o redimensionar un objeto"""
+        self.spatial_index.update(obj, self._obj_bounds(obj))
+
+    def reindex_objects(self):
+        """Reconstruye el índice tras sustituir la lista entera (p. ej. al cargar un proyecto)"""
+        self.spatial_index.rebuild(self.canvas_objects, self._obj_bounds)
+        self._pending_assets = sum(1 for obj in self.canvas_objects if isinstance(obj.state, AssetState) and obj.state.asset_pending)
+        self._last_asset_camera = None
+        self.invalidate_scene()
+
+    def _spatial(self):
+        # Red de seguridad: si alguien tocó la lista directamente, se reconstruye
+        if len(self.spatial_index) != len(self.canvas_objects):
+            self.spatial_index.rebuild(self.canvas_objects, self._obj_bounds)
+        return self.spatial_index
+
+    # --- CARGA DE RECURSOS ---
+    def load_image_async(self, obj, path):
+        """Decodifica la imagen del objeto en segundo plano; mientras tanto se pinta como 'cargando'"""
+        obj.state.loading = True
+        def done(image):
+            obj.state.loading = False
+            if image is None or image.isNull(): obj.state.missing_asset = True
+            else: obj.state.image = ImagePyramid(QPixmap.fromImage(image), path, self.reload_image_base)
+            self.invalidate_scene()
+        return self.asset_loader.request(path, done)
+
+    def reload_image_base(self, pyramid):
+        """Vuelve a leer en segundo plano el nivel base que una imagen descartó del presupuesto"""
+        def done(image):
+            pyramid.set_base(image)
+            self.invalidate_scene()
+        self.asset_loader.request(pyramid.path, done)
+
+    def load_strokes_async(self, obj, path):
+        """Lee en segundo plano el archivo de trazos de un dibujo"""
+        obj.state.loading = True
+        def done(strokes):
+            if obj.state.load_ticket is None: return # Ya se cargó de forma síncrona
+            obj.state.load_ticket = None
+            obj.state.loading = False
+            if strokes is not None:
+                obj.state.strokes = strokes
+                canvas_objects.mark_strokes_changed(obj)
+            self.invalidate_scene()
+        obj.state.load_ticket = self.asset_loader.request(path, done, load_strokes_file)
+
+    def request_asset(self, obj):
+        """Pide la carga del recurso pendiente de un objeto (si lo tiene)"""
+        if not isinstance(obj.state, AssetState) or not obj.state.asset_pending: return
+        obj.state.asset_pending = False
+        self._pending_assets -= 1
+        if obj.type == "imagen": self.load_image_async(obj, obj.state.path)
+        elif obj.type == "dibujo": self.load_strokes_async(obj, obj.state.path)
+
+    def ensure_asset_loaded(self, obj):
+        """Lee ya (bloqueando) los trazos de un dibujo que aún no los tiene.
+        Necesario antes de modificarlos o de guardar el proyecto."""
+        if obj.type != "dibujo": return
+        if obj.state.asset_pending: obj.state.asset_pending = False; self._pending_assets -= 1
+        elif obj.state.load_ticket is None: return
+        ticket, obj.state.load_ticket = obj.state.load_ticket, None
+        if ticket is not None: self.asset_loader.cancel(ticket)
+        obj.state.loading = False
+        strokes = load_strokes_file(obj.state.path)
+        if strokes is not None:
+            obj.state.strokes = strokes
+            canvas_objects.mark_strokes_changed(obj)
+
+    def _request_visible_assets(self):
+        """Pide los recursos pendientes de lo visible y luego los de alrededor,
+        mirando más lejos hacia donde se está moviendo la cámara."""
+        if self._pending_assets <= 0: return
+        x0, y0, x1, y1 = self._cull_view()
+        w, h = x1 - x0, y1 - y0
+        index = self._spatial()
+        for _, obj in index.query_rect(x0, y0, x1, y1): self.request_asset(obj)
+        
+        m = config.ASSET_PREFETCH_MARGIN
+        px0, py0, px1, py1 = x0 - w*m, y0 - h*m, x1 + w*m, y1 + h*m
+        last = self._last_asset_camera
+        if last is not None and last[2] == self.zoom:
+            # La vista se mueve en sentido contrario al offset
+            vx, vy = last[0] - self.offset_x, last[1] - self.offset_y
+            ahead = config.ASSET_PREFETCH_AHEAD
+            if vx > 0: px1 += w * ahead
+            elif vx < 0: px0 -= w * ahead
+            if vy > 0: py1 += h * ahead
+            elif vy < 0: py0 -= h * ahead
+        self._last_asset_camera = (self.offset_x, self.offset_y, self.zoom)
+        for _, obj in index.query_rect(px0, py0, px1, py1): self.request_asset(obj)
+
+    def object_at(self, wx, wy):
+        """Índice del objeto más alto bajo el punto del mundo, o None"""
+        hits = self._spatial().query_point(wx, wy)
+        return hits[-1][0] if hits else None
+
+    def _layer_keys(self):
+        camera = (self.offset_x, self.offset_y, self.zoom, self.width(), self.height())
+        world_key = camera + (self.scene_generation, self.selected_object)
+        scene_key = world_key + (tuple(self.selected_objects),)
+        return world_key, scene_key
+
+    def _defer_relayout(self):
+        """Mientras dure la interacción, markdown y código reutilizan su maquetación escalada"""
+        canvas_objects.set_relayout_deferred(True)
+        self.relayout_timer.start()
+
+    def _settle_relayout(self):
+        self.relayout_timer.stop()
+        canvas_objects.set_relayout_deferred(False)
+        self.invalidate_scene()
+
+    def _ui_dirty_rect(self, before):
+        """QRect que cubre las islas de UI antes (`before`) y después del paso de animación"""
+        after = self._ui_rects(self.toolbar_animation_progress, self.circle_animation_progress, self.vertical_menu_animation_progress)
+        area = QRectF()
+        for rect in before + after: area = area.united(rect)
+        margin = 4 # Bordes antialiasados
+        return area.adjusted(-margin, -margin, margin, margin).toAlignedRect()
+
+    def _blink_caret(self):
+        self.caret_visible = not self.caret_visible
+        if self._caret_rect is not None: self.update(self._caret_rect)
+
+    def _sync_caret_timer(self):
+        """Arranca o para el parpadeo según haya un objeto con cursor seleccionado"""
+        obj = self.canvas_objects[self.selected_object] if self.selected_object is not None and self.selected_object < len(self.canvas_objects) else None
+        rect = canvas_objects.text_caret_rect(obj, self.zoom, self.world_to_screen, config.TEXT_COLOR) if obj is not None else None
+        self._caret_rect = rect.toAlignedRect() if rect is not None else None
+        if self._caret_rect is None:
+            self.cursor_timer.stop(); self.caret_visible = True
+        elif not self.cursor_timer.isActive():
+            self.cursor_timer.start()
 
     def update_animation(self):
+        before = self._ui_rects(self.toolbar_animation_progress, self.circle_animation_progress, self.vertical_menu_animation_progress)
         speed = 0.15
         t_target = 1.0 if self.toolbar_expanded else 0.0
         c_target = 1.0 if self.circle_expanded else 0.0
@@ -135,119 +356,80 @@ class Canvas(QWidget):
             self.vertical_menu_animation_progress = v_target
             self.animation_timer.stop()
             self.is_animating = False
-        self.update()
+        self.update(self._ui_dirty_rect(before))
 
     def paintEvent(self, event):
         if self.width() <= 0 or self.height() <= 0: return
         
-        # 1. Preparar Buffers al tamaño de la ventana
+        # Las capas solo se regeneran si cambia su clave; un parpadeo del cursor
+        # o un hover del toolbar solo recompone lo que ya está cacheado.
+        self.frame_stats.begin_frame()
         size = self.size()
-        if self.world_pixmap.size() != size:
-            self.world_pixmap = QPixmap(size)
-            self.full_scene_pixmap = QPixmap(size)
-            self.needs_blur_update = True
+        world_key, scene_key = self._layer_keys()
+        if not self.scene_layer.is_valid(scene_key): self._scroll_layers(world_key, scene_key)
+        if not self.world_layer.is_valid(world_key):
+            with self.frame_stats.stage("assets"): self._request_visible_assets()
+            self._render_world_layer(size)
+            self.world_layer.key = world_key
+            self.world_blur_layer.key = world_key
         
-        # CAPA 1: FONDO Y CUADRÍCULA
-        self.world_pixmap.fill(config.BG_COLOR)
-        wp = QPainter()
-        if wp.begin(self.world_pixmap):
-            wp.setRenderHint(QPainter.Antialiasing)
-            spacing = 100 * self.zoom
-            wp.setPen(QPen(config.GRID_COLOR, 2))
-            ox = (self.offset_x + self.width()/2) % spacing
-            oy = (self.offset_y + self.height()/2) % spacing
-            x = ox
-            while x < self.width(): wp.drawLine(int(x), 0, int(x), self.height()); x += spacing
-            y = oy
-            while y < self.height(): wp.drawLine(0, int(y), self.width(), int(y)); y += spacing
-            
-            for i, obj in enumerate(self.canvas_objects):
-                if obj["type"] == "imagen":
-                    canvas_objects.draw_image_object(wp, obj, i, self.selected_object, self.zoom, self.world_to_screen)
-            wp.end()
+        if not self.scene_layer.is_valid(scene_key):
+            with self.frame_stats.stage("scene"): self._render_scene_layer(size)
+            self.scene_layer.key = scene_key
         
-        # CAPA 2: DESENFOQUE ESTRUCTURAL
-        # Desactivamos la optimización condicional para garantizar estabilidad visual
-        self.blurred_pixmap = utils.apply_gaussian_blur(self.world_pixmap, config.GLASS_BLUR_RADIUS)
-        self.needs_blur_update = False
-        
-        # CAPA 3: ESCENARIO COMPLETO
-        self.full_scene_pixmap.fill(Qt.transparent)
-        sp = QPainter()
-        if sp.begin(self.full_scene_pixmap):
-            sp.setRenderHint(QPainter.Antialiasing)
-            sp.drawPixmap(0, 0, self.world_pixmap)
-            
-            for i, obj in enumerate(self.canvas_objects):
-                t = obj["type"]
-                is_selected = (i in self.selected_objects)
-                sel_idx = i if is_selected else -1
-                
-                if t == "cuadrado": canvas_objects.draw_rounded_rect(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-                elif t == "triangulo": canvas_objects.draw_triangle(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-                elif t == "ventana": canvas_objects.draw_window(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-                elif t == "texto": canvas_objects.draw_text_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, config.TEXT_COLOR, self.blurred_pixmap)
-                elif t == "markdown": canvas_objects.draw_markdown_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-                elif t == "codigo": canvas_objects.draw_code_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-                elif t == "dibujo": canvas_objects.draw_drawing_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, self.blurred_pixmap)
-
-            if self.is_drawing and self.current_stroke:
-                sp.save()
-                points = self.current_stroke["points"]
-                style = self.current_stroke["style"]
-                width = self.current_stroke["width"] * self.zoom
-                # Usar el color guardado en el trazo o el activo por defecto
-                color = QColor(self.current_stroke.get("color", self.active_color))
-                
-                if style == "rotulador": color.setAlpha(150); width *= 2
-                
-                sp.setPen(QPen(color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-                poly = QPolygonF()
-                for wx, wy in points:
-                    sx, sy = self.world_to_screen(wx, wy)
-                    poly.append(QPointF(sx, sy))
-                sp.drawPolyline(poly)
-                sp.restore()
-            sp.end()
-        
-        # CAPA 4: DESENFOQUE FINAL PARA UI
-        if not self.is_drawing and not self.is_animating:
-            self.final_blur_pixmap = utils.apply_gaussian_blur(self.full_scene_pixmap, config.GLASS_BLUR_RADIUS)
+        # CAPA 4: DESENFOQUE FINAL PARA UI (solo bajo las islas de la barra de herramientas)
+        # Mientras se dibuja o anima se reutiliza el anterior si cubre las mismas zonas
+        roi_key, ui_regions = self._ui_glass_regions()
+        ui_key = (scene_key, roi_key)
+        if not self.ui_blur_layer.is_valid(ui_key):
+            reuse_stale = (self.is_drawing or self.is_animating) and self.ui_blur_layer.key is not None and self.ui_blur_layer.key[1] == roi_key
+            if not reuse_stale:
+                with self.frame_stats.stage("ui_blur"):
+                    self.ui_blur_layer.store(utils.apply_gaussian_blur(self.scene_layer.pixmap, config.GLASS_BLUR_RADIUS, ui_regions, self.ui_blur_layer.pixmap), ui_key)
         
         # CAPA 5: PRESENTACIÓN A PANTALLA
+        with self.frame_stats.stage("present"): self._present(event)
+        self.frame_stats.end_frame(partial=event.rect() != self.rect())
+        self._sync_caret_timer()
+
+
+
+    def _present(self, event):
+        """Compone la escena cacheada, el cursor, la tinta en curso y la UI en la pantalla"""
         final_painter = QPainter()
         if final_painter.begin(self):
             final_painter.setRenderHint(QPainter.Antialiasing)
-            final_painter.drawPixmap(0, 0, self.full_scene_pixmap)
+            final_painter.drawPixmap(0, 0, self.scene_layer.pixmap)
             
-            tw = config.TOOLBAR_WIDTH_COLLAPSED + (config.TOOLBAR_WIDTH_EXPANDED - config.TOOLBAR_WIDTH_COLLAPSED) * self.toolbar_animation_progress
-            th = config.TOOLBAR_HEIGHT_COLLAPSED + (config.TOOLBAR_HEIGHT_EXPANDED - config.TOOLBAR_HEIGHT_COLLAPSED) * self.toolbar_animation_progress
-            toolbar_rect = QRectF((self.width() - tw)/2, config.TOOLBAR_MARGIN, tw, th)
+            if self.caret_visible and self.selected_object is not None and self.selected_object < len(self.canvas_objects):
+                canvas_objects.draw_text_caret(final_painter, self.canvas_objects[self.selected_object], self.zoom, self.world_to_screen, config.TEXT_COLOR)
             
-            cw = config.TOOLBAR_HEIGHT_COLLAPSED + (config.CIRCLE_EXPANDED_WIDTH - config.TOOLBAR_HEIGHT_COLLAPSED) * self.circle_animation_progress
-            ch = config.TOOLBAR_HEIGHT_COLLAPSED + (config.CIRCLE_EXPANDED_HEIGHT - config.TOOLBAR_HEIGHT_COLLAPSED) * self.circle_animation_progress
-            circle_rect = QRectF(toolbar_rect.right() + 10, config.TOOLBAR_MARGIN, cw, ch)
-            self.current_circle_rect = circle_rect
+            if self.is_drawing and self.current_stroke:
+                self._update_live_ink()
+                final_painter.setOpacity(self._live_ink_style()[1])
+                final_painter.drawPixmap(0, 0, self.ink_layer.pixmap)
+                final_painter.setOpacity(1.0)
             
-            vw = config.TOOLBAR_HEIGHT_COLLAPSED + (config.VERTICAL_MENU_EXPANDED_WIDTH - config.TOOLBAR_HEIGHT_COLLAPSED) * self.vertical_menu_animation_progress
-            vh = config.TOOLBAR_HEIGHT_COLLAPSED + (config.VERTICAL_MENU_EXPANDED_HEIGHT - config.TOOLBAR_HEIGHT_COLLAPSED) * self.vertical_menu_animation_progress
-            vertical_rect = QRectF(circle_rect.right() + 10, config.TOOLBAR_MARGIN, vw, vh)
+            toolbar_rect, circle_rect, vertical_rect, system_rect = self._ui_rects(self.toolbar_animation_progress, self.circle_animation_progress, self.vertical_menu_animation_progress)
+            self.current_circle_rect = circle_rect
             self.current_vertical_rect = vertical_rect
-            
-            toolbar.draw_vertical_menu(final_painter, self, vertical_rect, self.vertical_menu_animation_progress, self.final_blur_pixmap)
-            
-            # System Menu (Save/Open) - A la derecha del menú vertical
-            # Siempre visible, pequeño
-            sys_w, sys_h = 100, 40
-            system_rect = QRectF(vertical_rect.right() + 10, config.TOOLBAR_MARGIN, sys_w, sys_h)
             self.current_system_rect = system_rect
-            toolbar.draw_system_menu(final_painter, self, system_rect, self.final_blur_pixmap)
-
-            toolbar.draw_color_palette(final_painter, self, circle_rect, self.circle_animation_progress, self.final_blur_pixmap)
-            toolbar.draw_toolbar_island(final_painter, self, toolbar_rect, self.final_blur_pixmap)
             
-            if self.toolbar_animation_progress > 0.3:
-                toolbar.draw_tool_buttons(final_painter, self, toolbar_rect, (self.toolbar_animation_progress - 0.3) / 0.7)
+            # En repintados parciales (cursor, animación) se salta la UI que no toca la zona sucia
+            dirty = QRectF(event.rect())
+            margin = 4
+            ui_area = toolbar_rect.united(circle_rect).united(vertical_rect).united(system_rect).adjusted(-margin, -margin, margin, margin)
+            if dirty.intersects(ui_area):
+                toolbar.draw_vertical_menu(final_painter, self, vertical_rect, self.vertical_menu_animation_progress, self.ui_blur_layer.pixmap)
+                
+                # System Menu (Save/Open) - A la derecha del menú vertical
+                toolbar.draw_system_menu(final_painter, self, system_rect, self.ui_blur_layer.pixmap)
+
+                toolbar.draw_color_palette(final_painter, self, circle_rect, self.circle_animation_progress, self.ui_blur_layer.pixmap)
+                toolbar.draw_toolbar_island(final_painter, self, toolbar_rect, self.ui_blur_layer.pixmap)
+                
+                if self.toolbar_animation_progress > 0.3:
+                    toolbar.draw_tool_buttons(final_painter, self, toolbar_rect, (self.toolbar_animation_progress - 0.3) / 0.7)
             
             if self.selection_rect:
                 final_painter.setPen(QPen(QColor(0, 120, 215, 255), 1))
@@ -255,34 +437,318 @@ class Canvas(QWidget):
                 final_painter.drawRect(self.selection_rect)
             
             self.draw_ui_info(final_painter)
+            if self.show_perf_hud: self.draw_perf_hud(final_painter)
             final_painter.end()
 
+    def _ui_rects(self, toolbar_progress, circle_progress, vertical_progress):
+        """Rects de las islas de UI (toolbar, paleta, menú vertical y menú de sistema) para un estado de animación"""
+        tw = config.TOOLBAR_WIDTH_COLLAPSED + (config.TOOLBAR_WIDTH_EXPANDED - config.TOOLBAR_WIDTH_COLLAPSED) * toolbar_progress
+        th = config.TOOLBAR_HEIGHT_COLLAPSED + (config.TOOLBAR_HEIGHT_EXPANDED - config.TOOLBAR_HEIGHT_COLLAPSED) * toolbar_progress
+        toolbar_rect = QRectF((self.width() - tw)/2, config.TOOLBAR_MARGIN, tw, th)
+        
+        cw = config.TOOLBAR_HEIGHT_COLLAPSED + (config.CIRCLE_EXPANDED_WIDTH - config.TOOLBAR_HEIGHT_COLLAPSED) * circle_progress
+        ch = config.TOOLBAR_HEIGHT_COLLAPSED + (config.CIRCLE_EXPANDED_HEIGHT - config.TOOLBAR_HEIGHT_COLLAPSED) * circle_progress
+        circle_rect = QRectF(toolbar_rect.right() + 10, config.TOOLBAR_MARGIN, cw, ch)
+        
+        vw = config.TOOLBAR_HEIGHT_COLLAPSED + (config.VERTICAL_MENU_EXPANDED_WIDTH - config.TOOLBAR_HEIGHT_COLLAPSED) * vertical_progress
+        vh = config.TOOLBAR_HEIGHT_COLLAPSED + (config.VERTICAL_MENU_EXPANDED_HEIGHT - config.TOOLBAR_HEIGHT_COLLAPSED) * vertical_progress
+        vertical_rect = QRectF(circle_rect.right() + 10, config.TOOLBAR_MARGIN, vw, vh)
+        
+        # Menú de sistema: siempre visible, pequeño
+        sys_w, sys_h = 100, 40
+        system_rect = QRectF(vertical_rect.right() + 10, config.TOOLBAR_MARGIN, sys_w, sys_h)
+        return toolbar_rect, circle_rect, vertical_rect, system_rect
+
+    def _ui_glass_regions(self):
+        """Zonas a desenfocar para la UI y su clave.
+        
+        Una isla que está abierta o animándose reserva todo su recorrido (de plegada a
+        desplegada), así la animación no cambia la clave en cada frame."""
+        active = (self.toolbar_expanded or self.toolbar_animation_progress > 0,
+                  self.circle_expanded or self.circle_animation_progress > 0,
+                  self.vertical_menu_expanded or self.vertical_menu_animation_progress > 0)
+        collapsed = self._ui_rects(0.0, 0.0, 0.0)
+        expanded = self._ui_rects(*[1.0 if a else 0.0 for a in active])
+        regions = [utils.glass_sample_rect(a.united(b)) for a, b in zip(collapsed, expanded)]
+        return active + (self.width(),), regions
+
+    def _glass_rects(self):
+        """(objeto, rect en pantalla) de los objetos de vidrio visibles"""
+        view = self._cull_view()
+        rects = []
+        for obj in self.canvas_objects:
+            if not self.is_obj_visible(obj, view): continue
+            if canvas_objects.lod_level(obj, self.zoom) == canvas_objects.LOD_PROXY: continue # Se pinta sin vidrio
+            rect = canvas_objects.get_glass_rect(obj, self.zoom, self.world_to_screen)
+            if rect is not None: rects.append((obj, rect))
+        return rects
+
+    def _scroll_layers(self, world_key, scene_key):
+        """Atajo para el desplazamiento de cámara.
+        
+        Si desde el último render la cámara solo se ha movido un número entero de píxeles,
+        se desplazan los buffers de las capas 1-3 y solo se repintan las franjas que
+        aparecen más la banda de cada vidrio que muestrea un desenfoque cambiado junto a
+        la costura (alcance del desenfoque + desplazamiento de la refracción). Devuelve True si las capas quedan al día."""
+        old = self.scene_layer.key
+        if old is None or old[2:] != scene_key[2:] or self.world_layer.key != old[:len(world_key)] or self.world_blur_layer.key != self.world_layer.key: return False
+        dx, dy = scene_key[0] - old[0], scene_key[1] - old[1]
+        if abs(dx - round(dx)) > 1e-6 or abs(dy - round(dy)) > 1e-6: return False
+        dx, dy = int(round(dx)), int(round(dy))
+        w, h = self.width(), self.height()
+        if abs(dx) > w * config.SCROLL_BLIT_MAX or abs(dy) > h * config.SCROLL_BLIT_MAX: return False
+        
+        # Franjas nuevas
+        strips = []
+        if dx > 0: strips.append(QRect(0, 0, dx, h))
+        elif dx < 0: strips.append(QRect(w + dx, 0, -dx, h))
+        if dy > 0: strips.append(QRect(0, 0, w, dy))
+        elif dy < 0: strips.append(QRect(0, h + dy, w, -dy))
+        dirty = QRegion()
+        for strip in strips: dirty = dirty.united(strip)
+        
+        # Bandas de vidrio afectadas y zonas del desenfoque que hay que rehacer
+        margin = int(math.ceil(config.GLASS_BLUR_RADIUS))
+        reblur = []
+        for _, rect in self._glass_rects():
+            shift = int(max(rect.width(), rect.height()) * (1 - 1 / config.GLASS_REFRACTION) / 2) + 2
+            area = rect.adjusted(-4, -4, 4, 4).toAlignedRect()
+            sample = utils.glass_sample_rect(rect)
+            for strip in strips:
+                band = area.intersected(strip.adjusted(-margin - shift, -margin - shift, margin + shift, margin + shift))
+                if band.isEmpty(): continue
+                dirty = dirty.united(band)
+                reblur.append(sample.intersected(strip.adjusted(-margin - 2 * shift, -margin - 2 * shift, margin + 2 * shift, margin + 2 * shift)))
+        
+        world = self.world_layer.pixmap
+        with self.frame_stats.stage("assets"): self._request_visible_assets()
+        with self.frame_stats.stage("world"):
+            world.scroll(dx, dy, world.rect())
+            wp = QPainter()
+            if wp.begin(world):
+                origin = (math.floor(w/2 + self.offset_x + 0.5), math.floor(h/2 + self.offset_y + 0.5))
+                self.world_tiles.compose(wp, self.zoom, canvas_objects.zoom_bucket(self.zoom), origin, world.size(), self._tile_signature, self._render_tile, strips)
+                wp.end()
+        
+        with self.frame_stats.stage("world_blur"):
+            blur = self.world_blur_layer.pixmap
+            blur.scroll(dx, dy, blur.rect())
+            reblur = [r for r in reblur if not r.isEmpty()]
+            if reblur:
+                # Se desenfoca aparte y solo se copian las zonas pedidas: los márgenes de cada
+                # recorte salen con el borde repetido y no deben pisar el desenfoque conservado
+                self._scroll_scratch = utils.apply_gaussian_blur(world, config.GLASS_BLUR_RADIUS, reblur, self._scroll_scratch)
+                bp = QPainter()
+                if bp.begin(blur):
+                    bp.setCompositionMode(QPainter.CompositionMode_Source)
+                    for r in reblur: bp.drawPixmap(r, self._scroll_scratch, r)
+                    bp.end()
+        
+        with self.frame_stats.stage("scene"):
+            scene = self.scene_layer.pixmap
+            scene.scroll(dx, dy, scene.rect())
+            self._render_scene_layer(self.size(), dirty)
+        self.world_layer.key = self.world_blur_layer.key = world_key
+        self.scene_layer.key = scene_key
+        return True
+
+    def _tile_images(self, tx, ty, level):
+        """Imágenes (índice, objeto) que tocan la tesela, con margen para su borde y tirador"""
+        x0, y0, x1, y1 = self.world_tiles.tile_rect(tx, ty)
+        m, z = 8 + 4, level
+        return [(i, obj) for i, obj in self._spatial().query_rect((x0 - m) / z, (y0 - m) / z, (x1 + m) / z, (y1 + m) / z) if obj.type == "imagen"]
+
+    def _tile_signature(self, tx, ty, level):
+        """Todo lo que cambia el aspecto de una tesela; las vacías solo dependen del nivel"""
+        images = self._tile_images(tx, ty, level)
+        if not images: return ()
+        return (self.selected_object,) + tuple(
+            (i, id(obj), obj.x, obj.y, obj.w, obj.h, id(obj.state.image), obj.state.image and obj.state.image.revision,
+             obj.state.loading, obj.state.missing_asset, obj.state.path)
+            for i, obj in images)
+
+    def _render_tile(self, tile, tx, ty, level):
+        """Fondo, cuadrícula e imágenes de una tesela al nivel de zoom `level`"""
+        x0, y0, x1, y1 = self.world_tiles.tile_rect(tx, ty)
+        tile.fill(config.BG_COLOR)
+        tp = QPainter()
+        if not tp.begin(tile): return
+        tp.setRenderHint(QPainter.Antialiasing)
+        spacing = 100 * level
+        size = x1 - x0
+        tp.setPen(QPen(config.GRID_COLOR, 2))
+        # Las líneas que caen justo en el borde se pintan en las dos teselas vecinas
+        for k in range(math.ceil((x0 - 2) / spacing), math.floor((x1 + 2) / spacing) + 1):
+            x = math.floor(k * spacing - x0); tp.drawLine(x, 0, x, size)
+        for k in range(math.ceil((y0 - 2) / spacing), math.floor((y1 + 2) / spacing) + 1):
+            y = math.floor(k * spacing - y0); tp.drawLine(0, y, size, y)
+        
+        to_tile = lambda wx, wy: (wx * level - x0, wy * level - y0)
+        for i, obj in self._tile_images(tx, ty, level):
+            canvas_objects.draw_image_object(tp, obj, i, self.selected_object, level, to_tile)
+            self.frame_stats.count("imagen")
+        tp.end()
+
+    def _compose_world_tiles(self, size):
+        """CAPA 1 (fondo, cuadrícula e imágenes) compuesta con las teselas cacheadas"""
+        world_pixmap = self.world_layer.ensure_size(size)
+        wp = QPainter()
+        if wp.begin(world_pixmap):
+            # El origen se redondea a píxel para que las teselas encajen sin costuras
+            origin = (math.floor(self.width()/2 + self.offset_x + 0.5), math.floor(self.height()/2 + self.offset_y + 0.5))
+            self.world_tiles.compose(wp, self.zoom, canvas_objects.zoom_bucket(self.zoom), origin, size, self._tile_signature, self._render_tile)
+            wp.end()
+        images = sum(1 for obj in self.canvas_objects if obj.type == "imagen")
+        drawn = sum(1 for _, obj in self._spatial().query_rect(*self._cull_view()) if obj.type == "imagen")
+        self._image_cull = (drawn, images - drawn)
+        return world_pixmap
+
+    def _render_world_layer(self, size):
+        """CAPA 1 y CAPA 2 (su desenfoque)"""
+        with self.frame_stats.stage("world"): world_pixmap = self._compose_world_tiles(size)
+        
+        # CAPA 2: DESENFOQUE ESTRUCTURAL (solo donde hay superficies de vidrio)
+        with self.frame_stats.stage("world_blur"):
+            regions = [utils.glass_sample_rect(rect) for _, rect in self._glass_rects()]
+            self.world_blur_layer.pixmap = utils.apply_gaussian_blur(world_pixmap, config.GLASS_BLUR_RADIUS, regions, self.world_blur_layer.pixmap)
+
+    def _render_scene_layer(self, size, region=None):
+        """CAPA 3: escenario completo (mundo + objetos). El trazo en curso va aparte, en ink_layer.
+        Con `region` (QRegion) solo se repinta esa zona y se conserva el resto del buffer."""
+        scene_pixmap = self.scene_layer.ensure_size(size)
+        blurred_pixmap = self.world_blur_layer.pixmap
+        if region is None: scene_pixmap.fill(Qt.transparent)
+        drawn, culled = self._image_cull
+        sp = QPainter()
+        if sp.begin(scene_pixmap):
+            sp.setRenderHint(QPainter.Antialiasing)
+            if region is not None: sp.setClipRegion(region)
+            sp.drawPixmap(0, 0, self.world_layer.pixmap)
+            
+            view = self._cull_view()
+            for i, obj in enumerate(self.canvas_objects):
+                t = obj.type
+                if t == "imagen": continue # Ya pintadas en la CAPA 1
+                if not self.is_obj_visible(obj, view) or (region is not None and not region.intersects(self._obj_screen_rect(obj))):
+                    culled += 1; continue
+                drawn += 1
+                self.frame_stats.count(t)
+                
+                is_selected = (i in self.selected_objects)
+                sel_idx = i if is_selected else -1
+                
+                # Cada objeto empieza con el estado por defecto (fuente, pincel...): el resultado
+                # no depende de qué objetos se pintaron antes, así que se puede repintar una zona
+                sp.save()
+                if t == "cuadrado": canvas_objects.draw_rounded_rect(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                elif t == "triangulo": canvas_objects.draw_triangle(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                elif t == "ventana": canvas_objects.draw_window(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                elif t == "texto": canvas_objects.draw_text_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, config.TEXT_COLOR, blurred_pixmap)
+                elif t == "markdown": canvas_objects.draw_markdown_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                elif t == "codigo": canvas_objects.draw_code_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                elif t == "dibujo": canvas_objects.draw_drawing_object(sp, obj, i, sel_idx, self.zoom, self.world_to_screen, blurred_pixmap)
+                sp.restore()
+
+            sp.end()
+        self.cull_stats = {"drawn": drawn, "culled": culled}
 
+    def _live_ink_style(self):
+        """Pluma opaca y opacidad con la que se compone el trazo en curso.
+        
+        La transparencia se aplica a la capa entera y no a cada segmento, así las
+        uniones entre segmentos no se oscurecen al solaparse."""
+        stroke = self.current_stroke
+        width = stroke["width"] * self.zoom
+        # Usar el color guardado en el trazo o el activo por defecto
+        color = QColor(stroke.get("color", self.active_color))
+        opacity = color.alphaF()
+        if stroke["style"] == "rotulador": opacity = 150 / 255; width *= 2
+        color.setAlpha(255)
+        return QPen(color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin), opacity
+
+    def _update_live_ink(self):
+        """Pinta en ink_layer los puntos nuevos del trazo en curso y devuelve el QRect a repintar.
+        
+        Si cambió la cámara o el tamaño (o es un trazo nuevo) se repinta el trazo entero."""
+        points = self.current_stroke["points"]
+        key = (self.offset_x, self.offset_y, self.zoom, self.width(), self.height())
+        pen, _ = self._live_ink_style()
+        full = not self.ink_layer.is_valid(key)
+        if full:
+            self.ink_layer.ensure_size(self.size()).fill(Qt.transparent)
+            self.ink_layer.key = key
+            self._ink_drawn = 0
+        
+        start = max(0, self._ink_drawn - 1) # Se repite el último punto para unir con el segmento anterior
+        if len(points) - start < 2: return QRect()
+        poly = QPolygonF()
+        for wx, wy in points[start:]:
+            sx, sy = self.world_to_screen(wx, wy)
+            poly.append(QPointF(sx, sy))
+        ip = QPainter(self.ink_layer.pixmap)
+        ip.setRenderHint(QPainter.Antialiasing)
+        ip.setPen(pen)
+        ip.drawPolyline(poly)
+        ip.end()
+        self._ink_drawn = len(points)
+        
+        if full: return self.rect()
+        margin = pen.widthF() / 2 + 2
+        return poly.boundingRect().adjusted(-margin, -margin, margin, margin).toAlignedRect()
 
     def draw_ui_info(self, painter):
         painter.setPen(QPen(config.TEXT_COLOR))
         painter.drawText(10, 30, f"Zoom: {self.zoom:.2f}x")
-        y = self.height() - 80
-        for line in ["Rueda: Zoom", "Shift + Click: Pan", "ESC: Salir", "DEL: Eliminar"]:
+        y = self.height() - 105
+        for line in ["Rueda: Zoom", "Shift + Click: Pan", "ESC: Salir", "DEL: Eliminar", "F3: Rendimiento"]:
             painter.drawText(10, y, line); y += 25
 
+    def draw_perf_hud(self, painter):
+        """Percentiles del tiempo de frame y de cada etapa, y objetos pintados por frame"""
+        summary = self.frame_stats.summary()
+        row = lambda label, st: f"{label:<20} {st['p50']:6.1f} {st['p90']:6.1f} {st['p99']:6.1f} {st['max']:6.1f}"
+        lines = [f"{'ms (' + str(summary['frames']) + ' frames)':<20} {'p50':>6} {'p90':>6} {'p99':>6} {'máx':>6}",
+                 row("Frame", summary["total"])]
+        lines += [row(STAGE_LABELS[stage], summary["stages"][stage]) for stage in STAGES]
+        lines.append("Pintados/frame: " + ", ".join(f"{t} {n:g}" for t, n in summary["draws"].items()))
+        lines.append(f"Volcado: {self.frame_stats_path}" if self.frame_stats_path else "Shift+F3: volcar JSON")
+        
+        painter.save()
+        font = painter.font(); font.setFamilies(["Consolas", "Monaco", "monospace"]); font.setStyleHint(QFont.Monospace); font.setPixelSize(12)
+        painter.setFont(font)
+        line_h = painter.fontMetrics().height()
+        width = max(painter.fontMetrics().horizontalAdvance(line) for line in lines)
+        box = QRectF(10, 45, width + 16, len(lines) * line_h + 12)
+        painter.setPen(Qt.NoPen); painter.setBrush(QColor(0, 0, 0, 170)); painter.drawRoundedRect(box, 8, 8)
+        painter.setPen(QPen(config.TEXT_COLOR))
+        for i, line in enumerate(lines):
+            painter.drawText(QPointF(box.x() + 8, box.y() + 6 + painter.fontMetrics().ascent() + i * line_h), line)
+        painter.restore()
+
+    def dump_frame_stats(self):
+        """Vuelca las estadísticas de frames a un JSON en el directorio actual y devuelve su ruta"""
+        path = os.path.abspath(time.strftime("frame_stats_%Y%m%d_%H%M%S.json"))
+        self.frame_stats.dump(path, size=[self.width(), self.height()], zoom=self.zoom, objects=len(self.canvas_objects),
+                              types={t: sum(1 for o in self.canvas_objects if o.type == t) for t in {o.type for o in self.canvas_objects}})
+        return path
+
     # --- EVENTOS ---
     def wheelEvent(self, event):
         pos = event.position()
         wx, wy = self.screen_to_world(pos.x(), pos.y())
         
         # 1. Comprobar si estamos sobre un objeto markdown/codigo para hacer scroll
-        for obj in reversed(self.canvas_objects):
-            if obj["type"] in ["markdown", "codigo"]:
-                ox, oy = obj["x"], obj["y"]
+        for _, obj in reversed(self._spatial().query_rect(wx - 150, wy - 200, wx + 150, wy + 200)):
+            if obj.type in ["markdown", "codigo"]:
+                ox, oy = obj.x, obj.y
                 # Detección precisa del área de contenido del markdown (300x400)
                 if abs(wx - ox) < 150 and abs(wy - oy) < 200:
                     delta = event.angleDelta().y()
-                    current_scroll = obj.get("scroll_y", 0)
+                    current_scroll = obj.state.scroll_y
                     # El scroll se aplica en sentido contrario al delta
                     new_scroll = current_scroll - delta / 2
-                    obj["scroll_y"] = max(0, min(obj.get("max_scroll_y", 1000), new_scroll))
-                    self.update()
+                    obj.state.scroll_y = max(0, min(obj.state.max_scroll_y, new_scroll))
+                    self.invalidate_scene()
                     return # Bloqueamos el zoom si estamos haciendo scroll
 
         # 2. Si no es markdown, hacer el zoom normal del canvas
@@ -310,8 +776,8 @@ class Canvas(QWidget):
             for i, btn in enumerate(self.circle_buttons):
                 if btn.get("current_rect") and btn["current_rect"].contains(pos):
                     self.active_color = btn["color"]
-                    if self.selected_object is not None: self.canvas_objects[self.selected_object]["personal_color"] = btn["color"]
-                    self.update(); return
+                    if self.selected_object is not None: self.canvas_objects[self.selected_object].personal_color = btn["color"]
+                    self.invalidate_scene(); return
             if not self.current_circle_rect.contains(pos): self.circle_expanded = False; self._start_anim()
 
         # Vertical Menu
@@ -359,34 +825,27 @@ class Canvas(QWidget):
                         ow, oh = self.get_obj_dims(obj)
                         
                         # Resize Handle
-                        hx, hy = obj["x"] + ow/2, obj["y"] + oh/2
+                        hx, hy = obj.x + ow/2, obj.y + oh/2
                         if abs(wx - hx) < (25/self.zoom) and abs(wy - hy) < (25/self.zoom):
                             self.resizing_object = True
                             self.drag_start_pos = pos
                             return
                             
                         # Delete Handle
-                        dx, dy = obj["x"] - ow/2, obj["y"] - oh/2
+                        dx, dy = obj.x - ow/2, obj.y - oh/2
                         if abs(wx - dx) < (25/self.zoom) and abs(wy - dy) < (25/self.zoom):
-                             del self.canvas_objects[self.selected_object]
+                             self.remove_object(self.selected_object)
                              self.selected_object = None
                              self.selected_objects = []
-                             self.needs_blur_update = True
-                             self.update()
+                             self.invalidate_scene()
                              return
 
                     # 1. Comprobamos si quiere seleccionar/mover un objeto existente (incluidos dibujos)
                     wx, wy = self.screen_to_world(pos.x(), pos.y())
-                    clicked_obj_idx = None
-                    for i in range(len(self.canvas_objects)-1, -1, -1):
-                        obj = self.canvas_objects[i]; ox, oy = obj["x"], obj["y"]
-                        ow, oh = self.get_obj_dims(obj)
-                        if abs(wx-ox)<(ow/2) and abs(wy-oy)<(oh/2):
-                            clicked_obj_idx = i
-                            break
+                    clicked_obj_idx = self.object_at(wx, wy)
                     
                     # Si clickamos un objeto dibujo, queremos dibujar DENTRO de él (fusión)
-                    if clicked_obj_idx is not None and self.canvas_objects[clicked_obj_idx]["type"] == "dibujo":
+                    if clicked_obj_idx is not None and self.canvas_objects[clicked_obj_idx].type == "dibujo":
                          self.drawing_target_index = clicked_obj_idx
                          # Continuamos abajo para iniciar el trazo...
                     
@@ -404,6 +863,7 @@ class Canvas(QWidget):
                             "color": QColor(self.active_color), 
                             "points": [(wx, wy)]
                         }
+                        self.ink_layer.invalidate()
                         return
 
         # Reset dragging flags before starting a new action
@@ -419,54 +879,51 @@ class Canvas(QWidget):
             ow, oh = self.get_obj_dims(obj)
             
             # Tirador (Resize)
-            hx, hy = obj["x"] + ow/2, obj["y"] + oh/2
+            hx, hy = obj.x + ow/2, obj.y + oh/2
             if abs(wx - hx) < (25/self.zoom) and abs(wy - hy) < (25/self.zoom):
                 self.resizing_object = True
                 self.drag_start_pos = pos
                 return
             
             # Botón Eliminar (Delete) - Lógica inversa de coordenadas
-            dx, dy = obj["x"] - ow/2, obj["y"] - oh/2
+            dx, dy = obj.x - ow/2, obj.y - oh/2
             if abs(wx - dx) < (25/self.zoom) and abs(wy - dy) < (25/self.zoom):
                 # IMPORTANTE: Los dibujos NO se borran con botón, solo con borrador
-                if obj["type"] != "dibujo":
-                    del self.canvas_objects[self.selected_object]
+                if obj.type != "dibujo":
+                    self.remove_object(self.selected_object)
                     self.selected_object = None
                     self.selected_objects = []
-                    self.needs_blur_update = True
-                    self.update()
+                    self.invalidate_scene()
                     return
 
         # Canvas Objects
         wx, wy = self.screen_to_world(pos.x(), pos.y())
-        for i in range(len(self.canvas_objects)-1, -1, -1):
-            obj = self.canvas_objects[i]; ox, oy = obj["x"], obj["y"]
+        i = self.object_at(wx, wy)
+        if i is not None:
+            obj = self.canvas_objects[i]; ox, oy = obj.x, obj.y
             ow, oh = self.get_obj_dims(obj)
-            
-            if abs(wx-ox)<(ow/2) and abs(wy-oy)<(oh/2):
-                # Si es Markdown o Code, primero ver si es clic de texto o de título
-                if obj["type"] in ["markdown", "codigo"]:
-                    if wy < (oy - oh/2 + 30 + 15): # Área de título
-                        self.selected_object, self.dragging_object, self.drag_start_pos = i, True, pos
-                    else: # Área de contenido -> Selección de texto
-                        lx = wx - (ox - ow/2 + 15)
-                        ly = wy - (oy - oh/2 + 30 + 15) + obj.get("scroll_y", 0)
-                        padding = 15 if obj["type"] == "markdown" else 10 # Pequeño ajuste de padding
-                        lx = wx - (ox - ow/2 + padding)
-                        ly = wy - (oy - oh/2 + 30 + padding) + obj.get("scroll_y", 0)
-                        
-                        hit_idx = obj["doc"].documentLayout().hitTest(QPointF(lx, ly), Qt.FuzzyHit)
-                        obj["sel_start"] = hit_idx
-                        obj["sel_end"] = hit_idx
-                        self.selected_object = i
-                        if i not in self.selected_objects: self.selected_objects = [i] # IMPORTANTE: Actualizar visualmente la selección
-                        self.selecting_text = True
-                else:
+            # Si es Markdown o Code, primero ver si es clic de texto o de título
+            if obj.type in ["markdown", "codigo"]:
+                if wy < (oy - oh/2 + 30 + 15) or canvas_objects.lod_level(obj, self.zoom) != canvas_objects.LOD_FULL: # Área de título (o texto no visible a este zoom)
                     self.selected_object, self.dragging_object, self.drag_start_pos = i, True, pos
-                    if i not in self.selected_objects:
-                        self.selected_objects = [i]
-                
-                self.update(); return
+                else: # Área de contenido -> Selección de texto
+                    padding = 15 if obj.type == "markdown" else 10 # Pequeño ajuste de padding
+                    lx = wx - (ox - ow/2 + padding)
+                    ly = wy - (oy - oh/2 + 30 + padding) + obj.state.scroll_y
+                    
+                    doc_scale = obj.state.doc_scale # Maquetación escalada mientras se redimensiona
+                    hit_idx = obj.state.view.hit_test(lx / doc_scale, ly / doc_scale)
+                    obj.state.sel_start = hit_idx
+                    obj.state.sel_end = hit_idx
+                    self.selected_object = i
+                    if i not in self.selected_objects: self.selected_objects = [i] # IMPORTANTE: Actualizar visualmente la selección
+                    self.selecting_text = True
+            else:
+                self.selected_object, self.dragging_object, self.drag_start_pos = i, True, pos
+                if i not in self.selected_objects:
+                    self.selected_objects = [i]
+            
+            self.invalidate_scene(); return
         
         # Nueva Selección o Paneo
         if event.modifiers() & Qt.ShiftModifier:
@@ -507,10 +964,13 @@ class Canvas(QWidget):
         
         # Cambio de cursor según hover
         self.setCursor(Qt.ArrowCursor)
-        for i, obj in enumerate(reversed(self.canvas_objects)):
-            # Usar índice Real ya que enumerate(reversed) da índices invertidos
-            real_idx = len(self.canvas_objects) - 1 - i
-            ox, oy = obj["x"], obj["y"]
+        # Candidatos: objetos bajo el ratón más el seleccionado (su tirador sobresale de la caja)
+        candidates = dict(self._spatial().query_point(wx, wy))
+        if self.selected_object is not None and self.selected_object < len(self.canvas_objects):
+            candidates[self.selected_object] = self.canvas_objects[self.selected_object]
+        for real_idx in sorted(candidates, reverse=True):
+            obj = candidates[real_idx]
+            ox, oy = obj.x, obj.y
             ow, oh = self.get_obj_dims(obj)
             
             # Tirador (Solo el actual seleccionado)
@@ -521,8 +981,8 @@ class Canvas(QWidget):
 
             # Cuerpo
             if abs(wx-ox)<(ow/2) and abs(wy-oy)<(oh/2):
-                if obj["type"] in ["ventana", "texto", "markdown", "dibujo", "codigo"]:
-                    if obj["type"] in ["markdown", "codigo"] and wy < (oy - oh/2 + 30 + 15):
+                if obj.type in ["ventana", "texto", "markdown", "dibujo", "codigo"]:
+                    if obj.type in ["markdown", "codigo"] and wy < (oy - oh/2 + 30 + 15):
                         self.setCursor(Qt.ArrowCursor)
                     else:
                         self.setCursor(Qt.IBeamCursor)
@@ -539,7 +999,8 @@ class Canvas(QWidget):
         if self.is_drawing:
             wx, wy = self.screen_to_world(pos.x(), pos.y())
             self.current_stroke["points"].append((wx, wy))
-            self.update(); return
+            # Solo el segmento nuevo: la escena cacheada no cambia hasta soltar
+            self.update(self._update_live_ink()); return
 
         if self.is_erasing:
             self.perform_eraser_at(pos)
@@ -553,8 +1014,10 @@ class Canvas(QWidget):
             self.selection_rect = QRectF(self.selection_origin, pos).normalized()
             # Detectar objetos dentro del rectángulo
             new_selection = []
-            for i, obj in enumerate(self.canvas_objects):
-                ox, oy = obj["x"], obj["y"]
+            x0, y0 = self.screen_to_world(self.selection_rect.left(), self.selection_rect.top())
+            x1, y1 = self.screen_to_world(self.selection_rect.right(), self.selection_rect.bottom())
+            for i, obj in self._spatial().query_rect(x0, y0, x1, y1):
+                ox, oy = obj.x, obj.y
                 screen_pos = QPointF(*self.world_to_screen(ox, oy))
                 if self.selection_rect.contains(screen_pos):
                     new_selection.append(i)
@@ -566,61 +1029,65 @@ class Canvas(QWidget):
             cw_x, cw_y = self.screen_to_world(pos.x(), pos.y())
             obj = self.canvas_objects[self.selected_object]
             
-            # Inicializar dimensiones si no existen
-            if "w" not in obj:
-                if obj["type"] in ["cuadrado", "triangulo"]: obj["w"], obj["h"] = 100, 100
-                elif obj["type"] == "ventana": obj["w"], obj["h"] = 200, 150
-                elif obj["type"] == "markdown": obj["w"], obj["h"] = 300, 400
-                elif obj["type"] == "texto": obj["w"], obj["h"] = 200, 40
+            # Fijar las dimensiones por defecto si aún no se han guardado
+            obj.w, obj.h = obj.size()
 
             dx = (cw_x - pw_x) * 2
             dy = (cw_y - pw_y) * 2
 
-            if obj["type"] == "triangulo":
+            if obj.type == "triangulo":
                 # Escala uniforme balanceada para el triángulo
                 delta = (dx + dy) / 2
-                obj["w"] = max(40, obj["w"] + delta)
-                obj["h"] = max(40, obj["h"] + delta)
+                obj.w = max(40, obj.w + delta)
+                obj.h = max(40, obj.h + delta)
             else:
-                obj["w"] = max(50, obj["w"] + dx)
-                obj["h"] = max(30, obj["h"] + dy)
+                obj.w = max(50, obj.w + dx)
+                obj.h = max(30, obj.h + dy)
             
-            self.drag_start_pos = pos; self.update()
+            if obj.type in ["markdown", "codigo"]: self._defer_relayout()
+            self.object_geometry_changed(obj)
+            self.drag_start_pos = pos; self.invalidate_scene()
         elif self.dragging_object:
             pw_x, pw_y = self.screen_to_world(self.drag_start_pos.x(), self.drag_start_pos.y())
             cw_x, cw_y = self.screen_to_world(pos.x(), pos.y())
             dx, dy = cw_x - pw_x, cw_y - pw_y
             # Mover TODOS los objetos seleccionados
             for idx in self.selected_objects:
-                self.canvas_objects[idx]["x"] += dx
-                self.canvas_objects[idx]["y"] += dy
-            self.drag_start_pos = pos; self.update()
+                obj = self.canvas_objects[idx]
+                obj.x += dx; obj.y += dy
+                self.object_geometry_changed(obj)
+            self.drag_start_pos = pos; self.invalidate_scene()
         elif getattr(self, "selecting_text", False) and self.selected_object is not None:
             obj = self.canvas_objects[self.selected_object]
-            if obj["type"] in ["markdown", "codigo"]:
+            if obj.type in ["markdown", "codigo"]:
                 ow, oh = self.get_obj_dims(obj)
-                padding = 15 if obj["type"] == "markdown" else 10
-                lx = wx - (obj["x"] - ow/2 + padding)
-                ly = wy - (obj["y"] - oh/2 + 30 + padding) + obj.get("scroll_y", 0)
-                hit_idx = obj["doc"].documentLayout().hitTest(QPointF(lx, ly), Qt.FuzzyHit)
-                obj["sel_end"] = hit_idx
-                self.update()
+                padding = 15 if obj.type == "markdown" else 10
+                lx = wx - (obj.x - ow/2 + padding)
+                ly = wy - (obj.y - oh/2 + 30 + padding) + obj.state.scroll_y
+                doc_scale = obj.state.doc_scale
+                hit_idx = obj.state.view.hit_test(lx / doc_scale, ly / doc_scale)
+                obj.state.sel_end = hit_idx
+                self.invalidate_scene()
 
     def mouseReleaseEvent(self, event): 
         if self.is_drawing and self.current_stroke:
             self.is_drawing = False
             points = self.current_stroke["points"]
             if len(points) > 2:
+                # Quitar los puntos casi redundantes que deja cada evento de ratón
+                points = simplify_points(points, config.STROKE_SIMPLIFY_TOLERANCE / self.zoom)
+                self.current_stroke["points"] = points
                 # CASO A: Añadir a objeto existente y redimensionar
                 if self.drawing_target_index is not None and self.drawing_target_index < len(self.canvas_objects):
                     target_obj = self.canvas_objects[self.drawing_target_index]
+                    self.ensure_asset_loaded(target_obj)
                     
                     # 1. Recuperar todos los trazos en coordenadas MUNDIALES
                     all_strokes_world = []
                     
                     # Trazos existentes
-                    tox, toy = target_obj["x"], target_obj["y"]
-                    for s in target_obj.get("strokes", []):
+                    tox, toy = target_obj.x, target_obj.y
+                    for s in target_obj.state.strokes:
                         world_pts = [(p[0] + tox, p[1] + toy) for p in s["points"]]
                         all_strokes_world.append({"style": s["style"], "width": s["width"], "color": s.get("color"), "points": world_pts})
                     
@@ -649,9 +1116,11 @@ class Canvas(QWidget):
                         final_strokes.append(s)
                     
                     # 4. Actualizar objeto
-                    target_obj["x"], target_obj["y"] = new_cx, new_cy
-                    target_obj["w"], target_obj["h"] = new_w, new_h
-                    target_obj["strokes"] = final_strokes
+                    target_obj.x, target_obj.y = new_cx, new_cy
+                    target_obj.w, target_obj.h = new_w, new_h
+                    target_obj.state.strokes = final_strokes
+                    canvas_objects.mark_strokes_changed(target_obj)
+                    self.object_geometry_changed(target_obj)
                     
                 # CASO B: Crear nuevo objeto independiente
                 else: 
@@ -666,20 +1135,17 @@ class Canvas(QWidget):
                     local_points = [(p[0] - cx, p[1] - cy) for p in points]
                     self.current_stroke["points"] = local_points
                     
-                    new_obj = {
-                        "type": "dibujo",
-                        "x": cx, "y": cy,
-                        "w": max(100, max_x - min_x + 40), "h": max(100, max_y - min_y + 40),
-                        "strokes": [self.current_stroke]
-                    }
-                    self.canvas_objects.append(new_obj)
-                
-                self.needs_blur_update = True
-            
+                    new_obj = BoardObject("dibujo", cx, cy,
+                                          w=max(100, max_x - min_x + 40), h=max(100, max_y - min_y + 40),
+                                          strokes=[self.current_stroke])
+                    self.add_object(new_obj)
+
             self.current_stroke = None
             self.drawing_target_index = None # Reset
-            self.update()
+            self.ink_layer.invalidate()
+            self.invalidate_scene()
 
+        if self.resizing_object and self.relayout_timer.isActive(): self._settle_relayout()
         self.is_erasing = False
         self.dragging = self.dragging_object = self.resizing_object = False
         self.selecting_text = False
@@ -694,49 +1160,37 @@ class Canvas(QWidget):
         indices_to_delete = []
         something_changed = False
         
-        for i, obj in enumerate(self.canvas_objects):
-            if obj["type"] != "dibujo": continue
-            
-            # 1. Caja rápida (si no estamos ni cerca, saltar)
-            ox, oy = obj["x"], obj["y"]
-            ow, oh = self.get_obj_dims(obj)
-            if not (ox - ow/2 - eraser_radius < wx < ox + ow/2 + eraser_radius and 
-                    oy - oh/2 - eraser_radius < wy < oy + oh/2 + eraser_radius):
-                continue
+        # 1. Caja rápida: solo los dibujos a menos de un radio del borrador
+        for i, obj in self._spatial().query_radius(wx, wy, eraser_radius):
+            if obj.type != "dibujo": continue
+            self.ensure_asset_loaded(obj)
+            ox, oy = obj.x, obj.y
             
             # 2. Filtrar trazos que NO colisionan con el borrador
             new_strokes = []
             strokes_changed_here = False
             
-            for stroke in obj.get("strokes", []):
-                stroke_hit = False
-                for px, py in stroke.get("points", []):
-                    # px, py son locales
-                    gpx = ox + px
-                    gpy = oy + py
-                    if (gpx - wx)**2 + (gpy - wy)**2 < eraser_radius**2:
-                        stroke_hit = True
-                        break
-                
-                if not stroke_hit:
+            for stroke in obj.state.strokes:
+                # Contra los segmentos y no solo los vértices: los trazos simplificados
+                # tienen tramos rectos largos sin puntos intermedios (puntos locales)
+                if not stroke_hit(stroke.get("points", []), wx - ox, wy - oy, eraser_radius):
                     new_strokes.append(stroke)
                 else:
                     strokes_changed_here = True
             
             if strokes_changed_here:
-                obj["strokes"] = new_strokes
+                obj.state.strokes = new_strokes
+                canvas_objects.mark_strokes_changed(obj)
                 something_changed = True
                 if not new_strokes:
                     indices_to_delete.append(i)
         
         if indices_to_delete:
-            for i in sorted(indices_to_delete, reverse=True):
-                del self.canvas_objects[i]
+            self.remove_objects(indices_to_delete)
             something_changed = True
             
         if something_changed:
-            self.needs_blur_update = True
-            self.update()
+            self.invalidate_scene()
 
     # --- DRAG & DROP ---
     def dragEnterEvent(self, event):
@@ -753,23 +1207,15 @@ class Canvas(QWidget):
             ext = path.lower()
             if ext.endswith('.tree'):
                  ProjectManager.load_project(self, path)
-                 self.needs_blur_update = True
-                 self.update()
+                 self.invalidate_scene()
                  return # Carga completa, ignoramos otros archivos
             elif ext.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')):
                 wx, wy = self.screen_to_world(pos.x() + count*20, pos.y() + count*20)
-                pixmap = QPixmap(path)
-                if not pixmap.isNull():
-                    new_obj = {
-                        "type": "imagen",
-                        "x": wx,
-                        "y": wy,
-                        "path": path,
-                        "pixmap": pixmap,
-                        "w": pixmap.width(),
-                        "h": pixmap.height()
-                    }
-                    self.canvas_objects.append(new_obj)
+                size = read_image_size(path) # Solo la cabecera: la imagen se decodifica aparte
+                if size.isValid():
+                    new_obj = BoardObject("imagen", wx, wy, path=path, w=size.width(), h=size.height())
+                    self.add_object(new_obj)
+                    self.load_image_async(new_obj, path)
                     count += 1
             elif ext.endswith('.md'):
                 wx, wy = self.screen_to_world(pos.x() + count*20, pos.y() + count*20)
@@ -777,15 +1223,8 @@ class Canvas(QWidget):
                     with open(path, 'r', encoding='utf-8') as f:
                         content = f.read()
                     
-                    new_obj = {
-                        "type": "markdown",
-                        "x": wx,
-                        "y": wy,
-                        "path": path,
-                        "content": content,
-                        "title": path.split('/')[-1]
-                    }
-                    self.canvas_objects.append(new_obj)
+                    new_obj = BoardObject("markdown", wx, wy, content=content, title=path.split('/')[-1])
+                    self.add_object(new_obj)
                     count += 1
                 except Exception as e:
                     print(f"Error reading md file: {e}")
@@ -795,21 +1234,14 @@ class Canvas(QWidget):
                     with open(path, 'r', encoding='utf-8') as f:
                         content = f.read()
                     
-                    new_obj = {
-                        "type": "codigo",
-                        "x": wx,
-                        "y": wy,
-                        "path": path,
-                        "content": content,
-                        "title": path.split('/')[-1],
-                        "ext": "." + path.split('.')[-1] if '.' in path else ""
-                    }
-                    self.canvas_objects.append(new_obj)
+                    new_obj = BoardObject("codigo", wx, wy, content=content, title=path.split('/')[-1],
+                                          ext="." + path.split('.')[-1] if '.' in path else "")
+                    self.add_object(new_obj)
                     count += 1
                 except Exception as e:
                     print(f"Error reading code file: {e}")
         
-        if count > 0: self.update()
+        if count > 0: self.invalidate_scene()
 
     def _start_anim(self): 
         if not self.is_animating: self.animation_timer.start(); self.is_animating = True
@@ -825,8 +1257,7 @@ class Canvas(QWidget):
         filename, _ = QFileDialog.getOpenFileName(self, "Abrir Proyecto", "", "Tree Project (*.tree)")
         if filename:
             ProjectManager.load_project(self, filename)
-            self.needs_blur_update = True
-            self.update()
+            self.invalidate_scene()
 
     def create_obj(self):
         wx, wy = self.screen_to_world(self.width()/2, self.height()/2)
@@ -834,51 +1265,67 @@ class Canvas(QWidget):
         t = tool.lower().replace(" ", "_")
         if t == "texto_en_pantalla": t = "texto"
         elif t == "cuadrado": t = "cuadrado"
-        new_obj = {"type": t, "x": wx, "y": wy}
-        if t != "texto": new_obj["personal_color"] = QColor(self.active_color)
-        if t == "ventana": new_obj["title"] = "Ventana"
-        if t == "texto": new_obj["text"] = "" # Iniciamos vacío para que salga el placeholder
-        self.canvas_objects.append(new_obj); self.update()
+        new_obj = BoardObject(t, wx, wy) # Los textos empiezan vacíos para que salga el placeholder
+        if t != "texto": new_obj.personal_color = QColor(self.active_color)
+        if t == "ventana": new_obj.title = "Ventana"
+        self.add_object(new_obj); self.invalidate_scene()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape: self.window().close()
+        if event.key() == Qt.Key_F3:
+            if event.modifiers() & Qt.ShiftModifier:
+                self.frame_stats_path = self.dump_frame_stats()
+                self.show_perf_hud = True # Para que se vea dónde quedó
+            else: self.show_perf_hud = not self.show_perf_hud
+            self.update()
+            return
         
         # Lógica de escritura en objetos seleccionados
         if self.selected_object is not None:
             obj = self.canvas_objects[self.selected_object]
+            self.caret_visible = True # Mientras se escribe el cursor se ve fijo
+            if self.cursor_timer.isActive(): self.cursor_timer.start()
+            
+            buffer = text_buffer.buffer_for(obj) if isinstance(obj.state, EditableState) else None
             
             # Lógica de Borrado (Backspace / Delete)
             is_delete = event.key() in [Qt.Key_Delete, Qt.Key_Backspace]
             
             if is_delete:
-                # 1. Si hay texto, borramos el último caracter
-                if obj["type"] == "ventana" and obj.get("content"):
-                    obj["content"] = obj["content"][:-1]
-                elif obj["type"] == "texto" and obj.get("text"):
-                    obj["text"] = obj["text"][:-1]
+                # 1. Si hay texto, borramos el caracter junto al cursor
+                if buffer is not None and len(buffer) > 0:
+                    if event.key() == Qt.Key_Backspace: buffer.backspace()
+                    else: buffer.delete_forward()
                 else:
                     # 2. Si NO hay texto (o es otro tipo de objeto), eliminamos el objeto entero
-                    if self.selected_object < len(self.canvas_objects):
-                        del self.canvas_objects[self.selected_object]
-                        self.selected_object = None
+                    # junto con el resto de la selección
+                    n = len(self.canvas_objects)
+                    self.remove_objects([i for i in set(self.selected_objects) | {self.selected_object} if i < n])
+                    self.selected_object = None
+                    self.selected_objects = []
                 
-                self.update()
+                self.invalidate_scene()
+                return
+            
+            if buffer is None: return
+            
+            # Movimiento del cursor
+            moves = {Qt.Key_Left: lambda: buffer.move_caret(-1), Qt.Key_Right: lambda: buffer.move_caret(1),
+                     Qt.Key_Up: lambda: buffer.move_caret_lines(-1), Qt.Key_Down: lambda: buffer.move_caret_lines(1),
+                     Qt.Key_Home: buffer.caret_home, Qt.Key_End: buffer.caret_end}
+            if event.key() in moves:
+                moves[event.key()]()
+                self.update() # El cursor va en la capa de presentación: la escena no cambia
                 return
 
             # Lógica de Salto de Línea (Enter)
             if event.key() in [Qt.Key_Return, Qt.Key_Enter]:
-                if obj["type"] in ["ventana", "texto"]:
-                    key = "content" if obj["type"] == "ventana" else "text"
-                    obj[key] = obj.get(key, "") + "\n"
-                    self.update()
+                buffer.insert("\n")
+                self.invalidate_scene()
                 return
 
             # Capturar texto normal
             text = event.text()
             if text and text.isprintable():
-                if obj["type"] == "ventana":
-                    obj["content"] = obj.get("content", "") + text
-                    self.update()
-                elif obj["type"] == "texto":
-                    obj["text"] = obj.get("text", "") + text
-                    self.update()
+                buffer.insert(text)
+                self.invalidate_scene()
@@ -9,7 +9,8 @@ TOOLBAR_BORDER_COLOR = QColor(255, 255, 255, 100)
 GLASS_HIGHLIGHT = QColor(255, 255, 255, 60)
 GLASS_BLUR_RADIUS = 80 # Desenfoque mucho más profundo
 GLASS_REFRACTION = 1.1 # Factor de refracción (10% de aumento)
-GLASS_ABERRATION = 3   # Separación RGB en píxeles (iPhone style)
+GLASS_TEXTURES = 2 # Texturas refractadas que se reciclan (una por mapa desenfocado: mundo y UI)
+GLASS_PATH_CACHE = 256 # Trazados de recorte por forma y tamaño
 
 # Configuración del Toolbar
 TOOLBAR_MARGIN = 20
@@ -45,3 +46,51 @@ VERTICAL_TOOLS = [
 
 BUTTON_HEIGHT = 50
 BUTTON_MARGIN = 15
+
+# Caché de rásters de los dibujos a mano (se rasterizan por tramos de zoom)
+DRAWING_CACHE_MB = 64
+ZOOM_BUCKETS_PER_OCTAVE = 4 # Tramos de zoom por cada duplicación; el ráster se escala como mucho un 19%
+DRAWING_CACHE_MAX_SIDE = 4096 # Por encima se pintan los trazos directamente (zoom muy cercano)
+
+# Simplificación de trazos a mano
+STROKE_SIMPLIFY_TOLERANCE = 0.75 # Píxeles de pantalla (al zoom con el que se dibujó)
+STROKE_LOD_PIXEL_ERROR = 0.5 # Error máximo en píxeles de los niveles de detalle al alejarse
+STROKE_LOD_LEVELS = 6 # Niveles: 1/2, 1/4 ... 1/64 de zoom
+
+# Nivel de detalle de los objetos al alejarse (tamaños en píxeles de pantalla)
+LOD_TEXT_MIN_PX = 5 # Con la letra más pequeña no se maqueta texto: solo marco y barra de título
+LOD_PROXY_PX = 24 # Con el lado mayor más pequeño el objeto es un rectángulo teñido, sin vidrio
+
+# Imágenes: presupuesto para los niveles a resolución completa (los reducidos son mucho menores)
+IMAGE_BASE_CACHE_MB = 256
+
+# Teselas del mundo (fondo, cuadrícula e imágenes), por nivel de zoom
+TILE_SIZE = 256
+TILE_CACHE_MB = 96
+SCROLL_BLIT_MAX = 0.5 # Desplazamiento máximo (fracción de la ventana) que se resuelve desplazando los buffers
+
+# Instrumentación del repintado (HUD con F3)
+FRAME_STATS_HISTORY = 240 # Frames de los que se calculan los percentiles
+
+# Perfilador de frames lentos (main.py --profile o TREE_PROFILE)
+PROFILE_DIR = "profiles" # Directorio de capturas por defecto
+PROFILE_THRESHOLD_MS = 50 # Solo se guardan frames y eventos que tarden al menos esto
+PROFILE_INTERVAL_MS = 1 # Periodo de muestreo de la pila
+PROFILE_KEEP = 50 # Capturas que se conservan; las más antiguas se borran
+
+# Carga diferida de recursos al abrir proyectos
+ASSET_PREFETCH_MARGIN = 0.5 # Fracción del viewport que se precarga alrededor de lo visible
+ASSET_PREFETCH_AHEAD = 1.0  # Viewports extra que se precargan hacia donde se mueve la cámara
+
+# Maquetación de markdown / código
+LAYOUT_WIDTH_STEP = 4 # Tramo de ancho (mundo) con el que se maqueta; el resto se absorbe escalando
+RELAYOUT_DEBOUNCE_MS = 150 # Tras el último cambio de tamaño se maqueta al ancho exacto
+HIGHLIGHT_BUDGET_MS = 4 # Tiempo máximo de tokenización del resaltado de código por evento
+
+# Vistas virtualizadas de texto (solo se maqueta lo visible más el overscan)
+TEXT_OVERSCAN_LINES = 20 # Líneas de código maquetadas por encima y por debajo de lo visible
+TEXT_OVERSCAN_CHUNKS = 1 # Trozos de markdown maquetados por encima y por debajo de lo visible
+CODE_LAYOUT_CACHE_LINES = 400 # Líneas de código con maquetación guardada (LRU)
+CODE_MAX_LINE_CHARS = 1000 # Caracteres que se maquetan de cada línea; el resto no cabe
+MARKDOWN_CHUNK_LINES = 60 # Líneas de markdown por trozo (se corta en líneas en blanco)
+MARKDOWN_CHUNK_DOCS = 16 # Documentos de trozos de markdown vivos por objeto (LRU)
@@ -0,0 +1,80 @@
+import json
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Etapas del paintEvent, en el orden en que se ejecutan
+STAGES = ("assets", "world", "world_blur", "scene", "ui_blur", "present")
+STAGE_LABELS = {"assets": "Petición recursos", "world": "CAPA 1 mundo", "world_blur": "CAPA 2 desenfoque", "scene": "CAPA 3 objetos",
+                "ui_blur": "CAPA 4 desenfoque UI", "present": "CAPA 5 presentación"}
+PERCENTILES = (50, 90, 99)
+
+def percentile(values, p):
+    """Percentil `p` (0-100) de una lista ya ordenada, por rango más cercano"""
+    if not values: return 0.0
+    return values[min(len(values), max(1, math.ceil(p / 100 * len(values)))) - 1]
+
+class FrameStats:
+    """Tiempos de cada etapa del repintado y objetos pintados por tipo en los últimos
+    `history` frames.
+
+    Medir cuesta un par de perf_counter por etapa, así que está siempre activo; el HUD
+    solo lo enseña. Una etapa que no se ejecuta en un frame (capa cacheada) cuenta 0."""
+
+    def __init__(self, history):
+        self.frames = deque(maxlen=history)
+        self._frame = None
+
+    def begin_frame(self):
+        self._frame = {"start": time.perf_counter(), "stages": {}, "draws": {}}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._frame is not None:
+                stages = self._frame["stages"]
+                stages[name] = stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def count(self, obj_type):
+        """Anota un objeto pintado en el frame en curso"""
+        if self._frame is None: return
+        draws = self._frame["draws"]
+        draws[obj_type] = draws.get(obj_type, 0) + 1
+
+    def end_frame(self, **info):
+        """Cierra el frame en curso; `info` se guarda con él (p. ej. si fue parcial)"""
+        frame, self._frame = self._frame, None
+        if frame is None: return
+        frame["total"] = (time.perf_counter() - frame.pop("start")) * 1000
+        frame.update(info)
+        self.frames.append(frame)
+
+    def summary(self):
+        """{"frames", "total": {"p50", "p90", "p99", "max"}, "stages": {etapa: igual},
+        "draws": {tipo: media por frame}} con los tiempos en ms"""
+        def stats(values):
+            values = sorted(values)
+            result = {"p%d" % p: round(percentile(values, p), 3) for p in PERCENTILES}
+            result["max"] = round(values[-1], 3) if values else 0.0
+            return result
+
+        frames = list(self.frames)
+        draws = {}
+        for frame in frames:
+            for obj_type, n in frame["draws"].items(): draws[obj_type] = draws.get(obj_type, 0) + n
+        return {
+            "frames": len(frames),
+            "total": stats([f["total"] for f in frames]),
+            "stages": {s: stats([f["stages"].get(s, 0.0) for f in frames]) for s in STAGES},
+            "draws": {t: round(n / len(frames), 2) for t, n in sorted(draws.items())},
+        }
+
+    def dump(self, path, **meta):
+        """Escribe el resumen y los frames en JSON (para adjuntar a un informe de error)"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "summary": self.summary(), "frames": list(self.frames)}, f, indent=1)
+        return path
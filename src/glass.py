@@ -0,0 +1,92 @@
+import math
+from collections import OrderedDict
+from PySide6.QtCore import Qt, QRect, QRectF, QPointF
+from PySide6.QtGui import QPainter, QPainterPath, QPixmap, QPolygonF, QRegion
+import config
+
+# Vidrio "liquid glass": refracción, el mapa desenfocado ampliado GLASS_REFRACTION veces
+# desde el centro de cada superficie. Ampliar desde el centro c equivale a leer el mapa
+# ampliado desde el origen desplazado c * (GLASS_REFRACTION - 1), así que todas las
+# superficies comparten una textura refractada por mapa desenfocado: cada vidrio es un
+# blit sin escalar de ella recortado por un trazado cacheado.
+
+_paths = OrderedDict() # (forma, ancho, alto, radio) -> QPainterPath con origen en (0, 0)
+_textures = [] # _Refracted de los mapas usados hace menos (el del mundo y el de la UI)
+
+def clip_path(shape, width, height, radius=0):
+    """Trazado de recorte de una forma ("rounded" o "triangle") de ese tamaño en el origen"""
+    key = (shape, round(width, 2), round(height, 2), radius)
+    path = _paths.get(key)
+    if path is not None:
+        _paths.move_to_end(key)
+        return path
+    path = QPainterPath()
+    if shape == "triangle":
+        path.addPolygon(QPolygonF([QPointF(width / 2, 0), QPointF(0, height), QPointF(width, height)]))
+    else:
+        path.addRoundedRect(QRectF(0, 0, width, height), radius, radius)
+    _paths[key] = path
+    while len(_paths) > config.GLASS_PATH_CACHE:
+        _paths.popitem(last=False)
+    return path
+
+class _Refracted:
+    """Un mapa desenfocado ampliado GLASS_REFRACTION veces desde el origen. Se rellena
+    por zonas a medida que las piden los vidrios; `valid` es lo ya rellenado."""
+
+    def __init__(self, size):
+        self.pixmap = QPixmap(size)
+        self.key = None
+        self.valid = QRegion()
+
+    def ensure(self, blurred_map, rect):
+        """Rellena la parte de `rect` (en la textura) que aún no está al día"""
+        missing = QRegion(rect).subtracted(self.valid)
+        if missing.isEmpty(): return
+        refr = config.GLASS_REFRACTION
+        p = QPainter(self.pixmap)
+        p.setRenderHint(QPainter.SmoothPixmapTransform)
+        p.setCompositionMode(QPainter.CompositionMode_Source)
+        for r in missing:
+            p.drawPixmap(QRectF(r), blurred_map, QRectF(r.x() / refr, r.y() / refr, r.width() / refr, r.height() / refr))
+        p.end()
+        self.valid = self.valid.united(missing)
+
+def _texture(blurred_map):
+    """Textura refractada de `blurred_map`; la de un mapa que ha cambiado se recicla"""
+    key = blurred_map.cacheKey()
+    for tex in _textures:
+        if tex.key == key:
+            _textures.remove(tex); _textures.append(tex)
+            return tex
+    refr = config.GLASS_REFRACTION
+    size = blurred_map.size()
+    size.setWidth(math.ceil(size.width() * refr)); size.setHeight(math.ceil(size.height() * refr))
+    tex = _textures.pop(0) if len(_textures) >= config.GLASS_TEXTURES else None
+    if tex is None or tex.pixmap.size() != size: tex = _Refracted(size)
+    tex.key, tex.valid = key, QRegion()
+    _textures.append(tex)
+    return tex
+
+def draw_glass(painter, blurred_map, rect, shape="rounded", radius=0):
+    """Pinta el vidrio de `rect` (QRectF en pantalla) recortado a su forma"""
+    if not blurred_map or blurred_map.isNull(): return
+    s_rect = rect.toRect()
+    if s_rect.isEmpty(): return
+    area = s_rect
+    if painter.hasClipping(): # Solo la parte que se va a ver (repintados parciales)
+        area = area.intersected(painter.clipBoundingRect().toAlignedRect())
+        if area.isEmpty(): return
+    tex = _texture(blurred_map)
+    c = QRectF(s_rect).center() * (config.GLASS_REFRACTION - 1)
+    ox, oy = round(c.x()), round(c.y()) # De pantalla a textura
+    source = area.translated(ox, oy).intersected(tex.pixmap.rect())
+    if source.isEmpty(): return
+    tex.ensure(blurred_map, source)
+    
+    painter.save()
+    painter.translate(rect.topLeft())
+    painter.setClipPath(clip_path(shape, rect.width(), rect.height(), radius), Qt.IntersectClip) # Respeta el recorte de quien pinta
+    painter.translate(-rect.topLeft())
+    painter.drawPixmap(source.left() - ox, source.top() - oy, tex.pixmap, source.x(), source.y(), source.width(), source.height())
+    painter.restore()
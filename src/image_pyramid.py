@@ -0,0 +1,94 @@
+import math
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPixmap
+from raster_cache import RasterCache
+import config
+
+# Niveles base (resolución completa) de todas las imágenes. Al pasarse del presupuesto
+# se descarta el menos usado; si vuelve a hacer falta se recarga desde su archivo, en
+# segundo plano si la pirámide tiene `reload`.
+BASE_CACHE = RasterCache(config.IMAGE_BASE_CACHE_MB * 1024 * 1024)
+MIN_LEVEL_SIDE = 32 # No se reduce más allá de este lado
+
+class ImagePyramid:
+    """Pirámide de mipmaps de una imagen: nivel k = original reducido 2^k veces.
+
+    Los niveles reducidos se generan al primer uso, cada uno a partir del anterior.
+    El nivel base vive en BASE_CACHE; sin ruta de archivo no se puede recargar y se
+    queda fijo en el objeto. Si se descartó, `reload(pyramid)` pide leerlo de nuevo
+    (Canvas.reload_image_base, fuera del hilo de la GUI) y mientras tanto se pinta el
+    nivel más fino que quede; `revision` sube cuando llega, para rehacer lo pintado.
+    """
+
+    def __init__(self, pixmap, path=None, reload=None):
+        self.path = path
+        self.width, self.height = pixmap.width(), pixmap.height()
+        self.revision = 0
+        self._levels = {} # k -> QPixmap (k >= 1)
+        self._pinned = None
+        self._reload = reload
+        self._reloading = False
+        if not path or not BASE_CACHE.put(id(self), pixmap, owner=self):
+            self._pinned = pixmap
+
+    def isNull(self):
+        return self.width <= 0 or self.height <= 0
+
+    def base(self):
+        """Nivel base; None si se descartó y se está recargando en segundo plano"""
+        if self._pinned is not None: return self._pinned
+        pixmap = BASE_CACHE.get(id(self))
+        if pixmap is not None: return pixmap
+        if self._reload is None: # Sin cargador: se lee aquí mismo
+            pixmap = QPixmap(self.path)
+            if pixmap.isNull(): pixmap = self._fallback_base()
+            BASE_CACHE.put(id(self), pixmap, owner=self)
+            return pixmap
+        if not self._reloading:
+            self._reloading = True
+            self._reload(self)
+        return None
+
+    def set_base(self, image):
+        """Recibe el nivel base recargado (QImage, nula o None si ya no se pudo leer)"""
+        self._reloading = False
+        pixmap = QPixmap.fromImage(image) if image is not None and not image.isNull() else self._fallback_base()
+        if not BASE_CACHE.put(id(self), pixmap, owner=self):
+            self._pinned = pixmap # No cabe en el presupuesto: recargarlo no serviría de nada
+        self.revision += 1
+
+    def _fallback_base(self):
+        # El archivo ya no está: se amplía el nivel más fino que quede
+        if not self._levels: return QPixmap()
+        k = min(self._levels)
+        return self._levels[k].scaled(self.width, self.height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def max_level(self):
+        side = min(self.width, self.height)
+        return max(0, int(math.floor(math.log2(max(1, side / MIN_LEVEL_SIDE)))))
+
+    def level_for(self, target_w, target_h):
+        """Nivel más pequeño que sigue siendo al menos tan grande como el tamaño en pantalla"""
+        if target_w <= 0 or target_h <= 0 or self.isNull(): return 0
+        ratio = min(self.width / target_w, self.height / target_h)
+        if ratio < 2: return 0
+        return min(self.max_level(), int(math.floor(math.log2(ratio))))
+
+    def level(self, k):
+        """Nivel k; None si hace falta el nivel base para generarlo y se está recargando"""
+        if k <= 0: return self.base()
+        pixmap = self._levels.get(k)
+        if pixmap is None:
+            finer = self.level(k - 1)
+            if finer is None: return None
+            w = max(1, self.width >> k); h = max(1, self.height >> k)
+            pixmap = finer.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self._levels[k] = pixmap
+        return pixmap
+
+    def pixmap_for(self, target_w, target_h):
+        """Nivel para ese tamaño en pantalla; mientras se recarga el base, el más fino que
+        ya esté generado (None si no hay ninguno)"""
+        pixmap = self.level(self.level_for(target_w, target_h))
+        if pixmap is None and self._levels: pixmap = self._levels[min(self._levels)]
+        return pixmap
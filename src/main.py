@@ -1,6 +1,7 @@
 import sys
 from PySide6.QtWidgets import QApplication, QMainWindow
 from canvas_widget import Canvas
+import profiler
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -12,6 +13,8 @@ class MainWindow(QMainWindow):
 
 def main():
     app = QApplication(sys.argv)
+    profile_dir = profiler.requested_directory(sys.argv)
+    if profile_dir: profiler.install(profile_dir)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
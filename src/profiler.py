@@ -0,0 +1,135 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import config
+
+ENV_VAR = "TREE_PROFILE" # Directorio de capturas ("1" para el de config)
+FLAG = "--profile"
+
+def requested_directory(argv):
+    """Directorio de capturas si se pidió perfilar (`--profile [dir]` o TREE_PROFILE), si no None"""
+    if FLAG in argv:
+        i = argv.index(FLAG)
+        if i + 1 < len(argv) and not argv[i + 1].startswith("-"): return argv[i + 1]
+        return config.PROFILE_DIR
+    value = os.environ.get(ENV_VAR, "")
+    if not value or value == "0": return None
+    return config.PROFILE_DIR if value == "1" else value
+
+def _frame_label(frame):
+    code = frame.f_code
+    return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+class SlowCallProfiler:
+    """Perfilador por muestreo que solo guarda las secciones lentas.
+
+    Un hilo toma la pila del hilo principal cada `interval_ms` mientras hay una sección
+    abierta (y duerme si no). Al cerrarse la sección más externa, si ha tardado al menos
+    `threshold_ms`, sus muestras se escriben como pilas plegadas ("a;b;c N", lo que leen
+    flamegraph.pl, speedscope o inferno) y en el directorio solo quedan las `keep` últimas."""
+
+    def __init__(self, directory, threshold_ms, interval_ms, keep):
+        self.directory = directory
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000
+        self.keep = keep
+        self._thread_id = threading.get_ident()
+        self._depth = 0
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._written = 0
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._sample_loop, name="profiler", daemon=True).start()
+
+    def _sample_loop(self):
+        while True:
+            self._active.wait()
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            with self._lock:
+                if self._active.is_set() and stack:
+                    self._samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    @contextmanager
+    def section(self, name):
+        """Mide el bloque; las secciones anidadas cuentan dentro de la más externa"""
+        if threading.get_ident() != self._thread_id: # Solo se muestrea el hilo principal
+            yield
+            return
+        self._depth += 1
+        if self._depth > 1:
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        t0 = time.perf_counter()
+        self._active.set()
+        try:
+            yield
+        finally:
+            self._active.clear()
+            self._depth = 0
+            elapsed = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                samples, self._samples = self._samples, Counter()
+            if elapsed >= self.threshold_ms:
+                self._write(name, elapsed, samples)
+
+    def _write(self, name, elapsed, samples):
+        if not samples: samples = Counter({"(sin muestras)": 1}) # Todo el tiempo fuera de Python
+        self._written += 1
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, "%s_%04d_%s_%dms.folded" % (stamp, self._written % 10000, name, elapsed))
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, n in samples.most_common():
+                    f.write("%s;%s %d\n" % (name, stack, n))
+            self._rotate()
+        except OSError as e:
+            print(f"Profiler: no se pudo guardar {path}: {e}")
+
+    def _rotate(self):
+        captures = sorted(f for f in os.listdir(self.directory) if f.endswith(".folded"))
+        for f in captures[:-self.keep]:
+            try: os.remove(os.path.join(self.directory, f))
+            except OSError: pass
+
+    def wrap(self, owner, attr, static=False):
+        """Sustituye `owner.attr` por una versión medida con el nombre "Clase.metodo" """
+        original = getattr(owner, attr)
+        name = "%s.%s" % (owner.__name__, attr)
+
+        @functools.wraps(original)
+        def profiled(*args, **kwargs):
+            with self.section(name):
+                return original(*args, **kwargs)
+        setattr(owner, attr, staticmethod(profiled) if static else profiled)
+
+def install(directory):
+    """Activa el perfilado de frames, eventos de entrada y carga/guardado de proyectos.
+    Solo se llama si se pidió: sin él no hay ningún coste."""
+    from canvas_widget import Canvas
+    from project_manager import ProjectManager
+
+    profiler = SlowCallProfiler(directory, config.PROFILE_THRESHOLD_MS, config.PROFILE_INTERVAL_MS,
+                                config.PROFILE_KEEP)
+    # El hilo de muestreo necesita el GIL a menudo para caer dentro del código Python
+    sys.setswitchinterval(min(sys.getswitchinterval(), profiler.interval))
+    for attr in ("paintEvent", "mousePressEvent", "mouseMoveEvent", "mouseReleaseEvent",
+                 "wheelEvent", "keyPressEvent", "dropEvent"):
+        profiler.wrap(Canvas, attr)
+    for attr in ("save_project", "load_project"):
+        profiler.wrap(ProjectManager, attr, static=True)
+    print(f"Profiler: secciones de más de {config.PROFILE_THRESHOLD_MS} ms en {os.path.abspath(directory)}")
+    return profiler
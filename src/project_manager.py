@@ -10,6 +10,29 @@ import shutil
 import json
 from PySide6.QtGui import QColor, QPixmap
 from PySide6.QtCore import QPointF
+from asset_loader import read_image_size
+from text_buffer import object_text
+from board_objects import BoardObject, EditableState
+
+def load_strokes_file(path):
+    """Lee los trazos de un archivo drawings/*.json (None si no se puede leer).
+    Se puede llamar desde un hilo del pool de carga: solo crea QColor."""
+    try:
+        with open(path, 'r') as df:
+            strokes_data = json.load(df)
+        strokes = []
+        for s in strokes_data:
+            c = s.get("color", [255,255,255,255])
+            col = QColor(c[0], c[1], c[2], c[3])
+            strokes.append({
+                "style": s["style"],
+                "width": s["width"],
+                "color": col,
+                "points": [tuple(p) for p in s["points"]]
+            })
+        return strokes
+    except:
+        return None
 
 class TreeParser:
     def __init__(self, canvas, project_dir):
@@ -96,7 +119,7 @@ class TreeParser:
                 self._flush_object()
                 
                 parts = stripped.split("]", 1)
-                obj_type_raw = parts[0][2:].strip().upper()
+                obj_type_raw = parts[0][1:].strip().lstrip("[").strip().upper() # "> [TIPO" o ">[TIPO"
                 title = parts[1].strip() if len(parts) > 1 else "Object"
                 
                 # Caso especial: Instancia de plantilla [USE:NAME]
@@ -104,14 +127,14 @@ class TreeParser:
                     template_name = obj_type_raw.split(":", 1)[1]
                     if template_name in self.templates:
                         # Crear objeto base de la plantilla
-                        self.current_obj = {"type": "cuadrado", "title": title} # Default
+                        self.current_obj = BoardObject("cuadrado", title=title) # Default
                         # Aplicar líneas de la plantilla como si fueran del archivo
                         self._process_properties(self.templates[template_name])
                     else:
                         print(f"Warning: Template {template_name} not found")
-                        self.current_obj = {"type": "placeholder", "title": f"ERR: {template_name}"}
+                        self.current_obj = BoardObject("placeholder", title=f"ERR: {template_name}")
                 else:
-                    self.current_obj = {"type": obj_type_raw.lower(), "title": title}
+                    self.current_obj = BoardObject(obj_type_raw.lower(), title=title)
                 
                 idx += 1
                 continue
@@ -122,7 +145,8 @@ class TreeParser:
                 if self.current_text_block:
                     indent = len(line) - len(line.lstrip())
                     if indent >= self.current_text_indent:
-                        self.current_obj[self.current_text_block] += line[self.current_text_indent:].rstrip() + "\n"
+                        if self.current_text_block == self.current_obj.content_key(): # Si no, el bloque se salta
+                            self.current_obj.state.content += line[self.current_text_indent:].rstrip() + "\n"
                         idx += 1
                         continue
                     else:
@@ -135,7 +159,7 @@ class TreeParser:
             idx += 1
             
         self._flush_object()
-        self.canvas.update()
+        self.canvas.reindex_objects() # Reconstruye el índice espacial y repinta
 
     def _process_properties(self, lines):
         """Procesa una lista de líneas de propiedades (usado para plantillas)"""
@@ -151,63 +175,51 @@ class TreeParser:
         
         if key in ["x", "y", "w", "h"]:
             res = self.evaluate(value)
-            try: self.current_obj[key] = float(res)
-            except: self.current_obj[key] = 0.0
+            try: setattr(self.current_obj, key, float(res))
+            except: setattr(self.current_obj, key, 0.0)
         
         elif key == "color":
             try:
                 # El valor del color también puede usar variables para componentes
                 processed_val = str(self.evaluate(value))
                 rgba = list(map(int, processed_val.split(",")))
-                self.current_obj["personal_color"] = QColor(*rgba)
+                self.current_obj.personal_color = QColor(*rgba)
             except:
-                self.current_obj["personal_color"] = QColor(200, 200, 200, 255)
+                self.current_obj.personal_color = QColor(200, 200, 200, 255)
         
-        elif key == "ext":
-            self.current_obj["ext"] = value
+        elif key == "ext" and self.current_obj.accepts("ext"):
+            self.current_obj.state.ext = value
         
-        elif key == "path":
+        elif key == "path" and self.current_obj.accepts("path"):
             full_path = os.path.join(self.project_dir, value)
-            self.current_obj["path"] = full_path
+            self.current_obj.state.path = full_path
             
-            if self.current_obj["type"] == "imagen":
-                if os.path.exists(full_path):
-                    pix = QPixmap(full_path)
-                    self.current_obj["pixmap"] = pix
-                    if "w" not in self.current_obj: self.current_obj["w"] = pix.width()
-                    if "h" not in self.current_obj: self.current_obj["h"] = pix.height()
+            # Solo geometría: imágenes y trazos se cargan cuando se acercan al viewport
+            # (Canvas.request_asset); aquí se marcan como pendientes
+            if self.current_obj.type == "imagen":
+                size = None
+                if os.path.exists(full_path) and (self.current_obj.w is None or self.current_obj.h is None):
+                    size = read_image_size(full_path) # Sin tamaño guardado: leer la cabecera
+                    if size.isValid():
+                        if self.current_obj.w is None: self.current_obj.w = size.width()
+                        if self.current_obj.h is None: self.current_obj.h = size.height()
+                if os.path.exists(full_path) and (size is None or size.isValid()):
+                    self.current_obj.state.asset_pending = True
+                    self.current_obj.state.loading = True
                 else:
-                    self.current_obj["missing_asset"] = True
+                    self.current_obj.state.missing_asset = True
             
-            elif self.current_obj["type"] == "dibujo":
+            elif self.current_obj.type == "dibujo":
                 if os.path.exists(full_path):
-                    try:
-                        with open(full_path, 'r') as df:
-                            strokes_data = json.load(df)
-                        strokes = []
-                        for s in strokes_data:
-                            c = s.get("color", [255,255,255,255])
-                            col = QColor(c[0], c[1], c[2], c[3])
-                            strokes.append({
-                                "style": s["style"],
-                                "width": s["width"],
-                                "color": col,
-                                "points": [tuple(p) for p in s["points"]]
-                            })
-                        self.current_obj["strokes"] = strokes
-                    except:
-                        pass
+                    self.current_obj.state.asset_pending = True
 
         elif key in ["content", "text"] and value == "|":
             self.current_text_block = key
-            self.current_obj[key] = ""
+            if key == self.current_obj.content_key(): self.current_obj.state.content = ""
             self.current_text_indent = 4
 
     def _flush_object(self):
-        if self.current_obj:
-            # Validaciones básicas antes de añadir
-            if "x" not in self.current_obj: self.current_obj["x"] = 0.0
-            if "y" not in self.current_obj: self.current_obj["y"] = 0.0
+        if self.current_obj is not None: # Sin x/y en el archivo queda en el origen
             self.canvas.canvas_objects.append(self.current_obj)
             self.current_obj = None
 
@@ -219,6 +231,10 @@ class ProjectManager:
         filename = os.path.basename(filepath)
         project_name = os.path.splitext(filename)[0]
         
+        # Los trazos aún sin leer se leen ya: sus archivos pueden sobrescribirse al guardar
+        for obj in canvas.canvas_objects:
+            canvas.ensure_asset_loaded(obj)
+        
         img_dir = os.path.join(project_dir, "imagenes")
         drawings_dir = os.path.join(project_dir, "drawings")
         os.makedirs(img_dir, exist_ok=True)
@@ -227,30 +243,30 @@ class ProjectManager:
         script_content = f"# Tree Project: {project_name}\n# Generated by Tree Software\n\n"
         
         for i, obj in enumerate(canvas.canvas_objects):
-            obj_type = obj["type"]
-            script_content += f"> [{obj_type.upper()}] {obj.get('title', f'Object {i}')}\n"
+            obj_type = obj.type
+            script_content += f"> [{obj_type.upper()}] {obj.title if obj.title is not None else f'Object {i}'}\n"
             
-            script_content += f"  x: {obj['x']:.2f}\n"
-            script_content += f"  y: {obj['y']:.2f}\n"
-            if "w" in obj: script_content += f"  w: {obj['w']:.2f}\n"
-            if "h" in obj: script_content += f"  h: {obj['h']:.2f}\n"
+            script_content += f"  x: {obj.x:.2f}\n"
+            script_content += f"  y: {obj.y:.2f}\n"
+            if obj.w is not None: script_content += f"  w: {obj.w:.2f}\n"
+            if obj.h is not None: script_content += f"  h: {obj.h:.2f}\n"
             
-            if "personal_color" in obj and isinstance(obj["personal_color"], QColor):
-                c = obj["personal_color"]
+            if isinstance(obj.personal_color, QColor):
+                c = obj.personal_color
                 script_content += f"  color: {c.red()},{c.green()},{c.blue()},{c.alpha()}\n"
 
             if obj_type in ["ventana", "texto", "markdown", "codigo"]:
-                content_key = "text" if obj_type == "texto" else "content"
-                content = obj.get(content_key, "")
-                if obj_type == "codigo" and "ext" in obj:
-                    script_content += f"  ext: {obj['ext']}\n"
+                content_key = obj.content_key()
+                content = object_text(obj) if isinstance(obj.state, EditableState) else obj.state.content
+                if obj_type == "codigo" and obj.state.ext:
+                    script_content += f"  ext: {obj.state.ext}\n"
 
                 script_content += f"  {content_key}: |\n"
                 for line in content.splitlines():
                     script_content += f"    {line}\n"
             
             elif obj_type == "imagen":
-                original_path = obj.get("path")
+                original_path = obj.state.path
                 if original_path and os.path.exists(original_path):
                     img_name = os.path.basename(original_path)
                     dest_path = os.path.join(img_dir, img_name)
@@ -266,7 +282,7 @@ class ProjectManager:
                 strokes_path = os.path.join(drawings_dir, strokes_filename)
                 
                 strokes_data = []
-                for stroke in obj.get("strokes", []):
+                for stroke in obj.state.strokes:
                     s_data = {
                         "style": stroke.get("style", "lapicero"),
                         "width": stroke.get("width", 2),
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+
+class RasterCache:
+    """Caché LRU de rásters (QImage/QPixmap) con presupuesto de memoria en bytes.
+
+    Cada entrada guarda una etiqueta con el estado que la generó (revisión,
+    tamaño, color...): `get` solo la devuelve si la etiqueta coincide. Si se pasa
+    `owner` (normalmente el objeto del lienzo) se mantiene vivo mientras la
+    entrada exista, así una clave basada en id(owner) nunca se confunde con otro.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict() # clave -> (raster, etiqueta, owner, bytes)
+
+    @staticmethod
+    def size_of(raster):
+        return raster.width() * raster.height() * max(1, raster.depth() // 8)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, tag=None):
+        item = self._items.get(key)
+        if item is None or item[1] != tag:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, raster, tag=None, owner=None):
+        """Guarda el ráster; si no cabe en el presupuesto ni se guarda"""
+        self.discard(key)
+        size = self.size_of(raster)
+        if size > self.budget: return False
+        self._items[key] = (raster, tag, owner, size)
+        self.used += size
+        while self.used > self.budget:
+            _, old = self._items.popitem(last=False)
+            self.used -= old[3]
+        return True
+
+    def discard(self, key):
+        item = self._items.pop(key, None)
+        if item is not None: self.used -= item[3]
+
+    def clear(self):
+        self._items.clear()
+        self.used = 0
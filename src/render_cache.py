@@ -0,0 +1,31 @@
+from PySide6.QtGui import QPixmap
+
+
+class RenderLayer:
+    """Buffer de una capa de renderizado junto con la clave de estado que lo generó.
+
+    La clave es una tupla con todo lo que afecta al contenido de la capa (cámara,
+    tamaño del widget, generación de objetos...). Mientras la clave no cambie,
+    el buffer se reutiliza tal cual y el repintado solo recompone capas.
+    """
+
+    def __init__(self):
+        self.pixmap = QPixmap()
+        self.key = None
+
+    def is_valid(self, key):
+        return self.key is not None and self.key == key and not self.pixmap.isNull()
+
+    def ensure_size(self, size):
+        """Reserva el buffer al tamaño pedido; si cambia, la capa queda invalidada."""
+        if self.pixmap.size() != size:
+            self.pixmap = QPixmap(size)
+            self.key = None
+        return self.pixmap
+
+    def store(self, pixmap, key):
+        self.pixmap = pixmap
+        self.key = key
+
+    def invalidate(self):
+        self.key = None
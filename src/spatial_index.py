@@ -0,0 +1,140 @@
+import math
+from bisect import bisect_left
+
+class SpatialIndex:
+    """Índice espacial de los límites de los objetos en coordenadas del mundo.
+
+    Rejilla uniforme (spatial hash): el lienzo es infinito y los objetos tienen
+    tamaños parecidos, así que no hace falta un árbol que reequilibrar. Los
+    objetos se identifican por identidad y el índice refleja el orden de
+    `canvas_objects`: las consultas devuelven (posición, objeto) ordenados de
+    abajo arriba (orden de pintado); para "el de encima" se recorren al revés.
+
+    Cada alta recibe un número de secuencia creciente que nunca se renumera; la
+    posición en la lista se deduce al consultar buscándolo en `_order`.
+    """
+
+    CELL_SIZE = 512
+    MAX_CELLS_PER_OBJECT = 4096 # Objetos enormes van a una lista aparte en vez de a miles de celdas
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}     # (cx, cy) -> set(id)
+        self._large = set()  # ids de objetos demasiado grandes para la rejilla
+        self._entries = {}   # id -> [obj, (x0, y0, x1, y1), celdas, secuencia]
+        self._order = []     # Secuencias vivas, ascendentes (= orden de canvas_objects)
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cell_range(self, x0, y0, x1, y1):
+        cs = self.cell_size
+        return math.floor(x0 / cs), math.floor(y0 / cs), math.floor(x1 / cs), math.floor(y1 / cs)
+
+    def _link(self, key, bounds):
+        cx0, cy0, cx1, cy1 = self._cell_range(*bounds)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.MAX_CELLS_PER_OBJECT:
+            self._large.add(key)
+            return None
+        cells = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(key)
+        return cells
+
+    def _unlink(self, key, cells):
+        if cells is None:
+            self._large.discard(key)
+            return
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket: del self._cells[cell]
+
+    def rebuild(self, objects, bounds_fn):
+        self._cells.clear(); self._large.clear(); self._entries.clear(); self._order.clear()
+        for obj in objects:
+            self.insert(obj, bounds_fn(obj))
+
+    def insert(self, obj, bounds):
+        """Añade un objeto al final del orden (como canvas_objects.append)"""
+        key = id(obj)
+        if key in self._entries: self.remove(obj)
+        seq = self._next_seq
+        self._next_seq += 1
+        self._order.append(seq)
+        self._entries[key] = [obj, bounds, self._link(key, bounds), seq]
+
+    def remove(self, obj):
+        key = id(obj)
+        entry = self._entries.pop(key, None)
+        if entry is None: return
+        self._unlink(key, entry[2])
+        del self._order[bisect_left(self._order, entry[3])]
+
+    def remove_many(self, objs):
+        """Quita varios objetos de una vez (una sola pasada sobre el orden)"""
+        gone = set()
+        for obj in objs:
+            key = id(obj)
+            entry = self._entries.pop(key, None)
+            if entry is None: continue
+            self._unlink(key, entry[2])
+            gone.add(entry[3])
+        if gone: self._order = [seq for seq in self._order if seq not in gone]
+
+    def update(self, obj, bounds):
+        """Actualiza los límites tras mover o redimensionar (mantiene su posición en el orden)"""
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is None: return
+        if entry[1] == bounds: return
+        if self._cell_range(*entry[1]) != self._cell_range(*bounds):
+            self._unlink(key, entry[2])
+            entry[2] = self._link(key, bounds)
+        entry[1] = bounds
+
+    def _candidates(self, x0, y0, x1, y1):
+        cx0, cy0, cx1, cy1 = self._cell_range(x0, y0, x1, y1)
+        keys = set(self._large)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # Consulta más grande que la rejilla ocupada: recorrer las celdas existentes
+            for (cx, cy), bucket in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1: keys |= bucket
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = self._cells.get((cx, cy))
+                    if bucket: keys |= bucket
+        return keys
+
+    def _sorted(self, keys):
+        order, entries = self._order, self._entries
+        return sorted(((bisect_left(order, entries[k][3]), entries[k][0]) for k in keys), key=lambda item: item[0])
+
+    def query_point(self, x, y):
+        """Objetos cuya caja contiene el punto (bordes excluidos, como el hit-test original)"""
+        hits = []
+        for k in self._candidates(x, y, x, y):
+            x0, y0, x1, y1 = self._entries[k][1]
+            if x0 < x < x1 and y0 < y < y1: hits.append(k)
+        return self._sorted(hits)
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Objetos cuya caja se solapa con el rectángulo"""
+        hits = []
+        for k in self._candidates(x0, y0, x1, y1):
+            bx0, by0, bx1, by1 = self._entries[k][1]
+            if bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0: hits.append(k)
+        return self._sorted(hits)
+
+    def query_radius(self, x, y, radius):
+        """Objetos cuya caja queda a menos de `radius` del punto"""
+        hits = []
+        for k in self._candidates(x - radius, y - radius, x + radius, y + radius):
+            bx0, by0, bx1, by1 = self._entries[k][1]
+            dx = max(bx0 - x, 0, x - bx1)
+            dy = max(by0 - y, 0, y - by1)
+            if dx * dx + dy * dy < radius * radius: hits.append(k)
+        return self._sorted(hits)
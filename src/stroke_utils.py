@@ -0,0 +1,83 @@
+import math
+import config
+
+def simplify_points(points, tolerance):
+    """Douglas-Peucker: quita los puntos que se desvían menos de `tolerance` de la polilínea."""
+    if len(points) < 3 or tolerance <= 0: return list(points)
+    n = len(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    # Primero sobre los pocos puntos que deja el filtro radial y luego sobre todos partiendo
+    # de lo conservado (una pasada lineal si ya basta): lo que quitó el filtro también tiene
+    # que quedar a menos de `tolerance`, y solo con la primera podía alejarse casi el doble
+    _douglas_peucker(points, _radial_filter(points, tolerance), keep, tol2)
+    _douglas_peucker(points, range(n), keep, tol2)
+    return [p for p, k in zip(points, keep) if k]
+
+def _douglas_peucker(points, candidates, keep, tol2):
+    """Marca en `keep` los candidatos (índices crecientes de `points`) que hacen falta para
+    que los demás queden a menos de sqrt(tol2) de la polilínea; respeta los ya marcados."""
+    anchors = [i for i, c in enumerate(candidates) if keep[c]]
+    stack = list(zip(anchors, anchors[1:]))
+    while stack:
+        a, b = stack.pop()
+        ax, ay = points[candidates[a]]
+        bx, by = points[candidates[b]]
+        best, best_i = -1.0, -1
+        for i in range(a + 1, b):
+            px, py = points[candidates[i]]
+            d = _segment_dist2(px, py, ax, ay, bx, by)
+            if d > best: best, best_i = d, i
+        if best > tol2:
+            keep[candidates[best_i]] = True
+            stack.append((a, best_i)); stack.append((best_i, b))
+
+def _radial_filter(points, tolerance):
+    """Pasada previa O(n): índices de los puntos que no están pegados al último conservado"""
+    tol2 = tolerance * tolerance
+    out = [0]
+    lx, ly = points[0]
+    for i in range(1, len(points) - 1):
+        px, py = points[i]
+        if (px - lx) ** 2 + (py - ly) ** 2 > tol2:
+            out.append(i); lx, ly = px, py
+    out.append(len(points) - 1)
+    return out
+
+def _segment_dist2(px, py, ax, ay, bx, by):
+    """Distancia al cuadrado del punto al segmento AB"""
+    dx, dy = bx - ax, by - ay
+    l2 = dx * dx + dy * dy
+    if l2 > 0:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / l2))
+        ax += t * dx; ay += t * dy
+    return (px - ax) ** 2 + (py - ay) ** 2
+
+def stroke_lod(stroke, scale):
+    """Puntos del trazo con el detalle justo para pintarlo a `scale` píxeles por unidad del mundo.
+
+    El nivel k simplifica con tolerancia STROKE_LOD_PIXEL_ERROR * 2^k y sirve cuando el
+    zoom es 1/2^k o menor. Los niveles se calculan al primer uso y se guardan en el trazo
+    junto con la lista de puntos de la que salen: si la lista cambia, se rehacen."""
+    points = stroke.get("points", [])
+    if scale >= 0.5 or len(points) < 3: return points
+    level = min(config.STROKE_LOD_LEVELS, int(math.floor(math.log2(1.0 / scale))))
+
+    cache = stroke.get("_lod")
+    if cache is None or cache[0] is not points:
+        cache = (points, {})
+        stroke["_lod"] = cache
+    levels = cache[1]
+    if level not in levels:
+        levels[level] = simplify_points(points, config.STROKE_LOD_PIXEL_ERROR * (2 ** level))
+    return levels[level]
+
+def stroke_hit(points, x, y, radius):
+    """True si algún segmento de la polilínea pasa a menos de `radius` del punto"""
+    r2 = radius * radius
+    if len(points) == 1:
+        return (points[0][0] - x) ** 2 + (points[0][1] - y) ** 2 < r2
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        if _segment_dist2(x, y, ax, ay, bx, by) < r2: return True
+    return False
@@ -0,0 +1,183 @@
+import re
+import time
+from PySide6.QtCore import QObject, QTimer, Signal
+import config
+
+# Tipos de token (mismos nombres que las clases del estilo del editor de código)
+KEYWORD, STRING, COMMENT, FUNCTION = "keyword", "string", "comment", "function"
+NORMAL = 0 # Estado fuera de comentarios de bloque y cadenas multilínea
+
+_CALL = re.compile(r"\s*\(")
+_STRINGS = r'"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?'
+
+def _language(keywords, line_comment=None, blocks=(), strings=_STRINGS, directives=False):
+    """blocks: [(apertura, cierre, tipo)] que pueden abarcar varias líneas;
+    directives: `#palabra` al principio de la línea (preprocesador) como palabra clave"""
+    parts = []
+    if directives: parts.append(r"^[ \t]*(?P<directive>#\w+)")
+    if blocks: parts.append("(?P<open>" + "|".join(re.escape(o) for o, _, _ in blocks) + ")")
+    if line_comment: parts.append("(?P<comment>" + re.escape(line_comment) + ".*)")
+    if strings: parts.append("(?P<string>" + strings + ")")
+    parts.append(r"(?P<word>[A-Za-z_$][\w$]*)")
+    return {
+        "pattern": re.compile("|".join(parts)),
+        "keywords": frozenset(keywords.split()),
+        "blocks": {o: (i + 1, c, kind) for i, (o, c, kind) in enumerate(blocks)},
+        "states": {i + 1: (c, kind) for i, (_, c, kind) in enumerate(blocks)},
+    }
+
+_C_BLOCK = [("/*", "*/", COMMENT)]
+LANGUAGES = {
+    "python": _language("False None True and as assert async await break class continue def del elif else except finally for from global if import in is lambda nonlocal not or pass raise return try while with yield self",
+                        "#", [('"""', '"""', STRING), ("'''", "'''", STRING)]),
+    "c": _language("auto break case char const continue default do double else enum extern float for goto if inline int long register return short signed sizeof static struct switch typedef union unsigned void volatile while "
+                   "bool class delete false namespace new nullptr private protected public template this true try catch throw using virtual",
+                   "//", _C_BLOCK, directives=True),
+    "java": _language("abstract boolean break byte case catch char class continue default do double else enum extends final finally float for if implements import instanceof int interface long new null package private protected public return short static super switch this throw throws true false try void while",
+                      "//", _C_BLOCK),
+    "js": _language("async await break case catch class const continue debugger default delete do else export extends false finally for function if import in instanceof let new null return super switch this throw true try typeof undefined var void while yield interface type enum implements",
+                    "//", _C_BLOCK, _STRINGS + r"|`(?:[^`\\]|\\.)*`?"),
+    "css": _language("important", None, _C_BLOCK),
+    "json": _language("true false null"),
+    "markup": _language("", None, [("<!--", "-->", COMMENT)]),
+    "sh": _language("if then else elif fi for while until do done case esac function return in export local echo exit", "#"),
+}
+EXTENSIONS = {".py": "python", ".c": "c", ".h": "c", ".cpp": "c", ".hpp": "c", ".java": "java", ".js": "js", ".ts": "js",
+              ".css": "css", ".json": "json", ".html": "markup", ".xml": "markup", ".sh": "sh"}
+
+def language_for_ext(ext):
+    return LANGUAGES.get(EXTENSIONS.get((ext or "").lower()))
+
+def tokenize_line(lang, text, state):
+    """Tokens (inicio, longitud, tipo) de una línea y el estado con el que termina"""
+    tokens = []
+    pos, n = 0, len(text)
+    if state != NORMAL:
+        closer, kind = lang["states"][state]
+        end = text.find(closer)
+        if end < 0: return [(0, n, kind)] if n else [], state
+        pos = end + len(closer)
+        tokens.append((0, pos, kind))
+        state = NORMAL
+
+    pattern, keywords, blocks = lang["pattern"], lang["keywords"], lang["blocks"]
+    while pos < n:
+        m = pattern.search(text, pos)
+        if m is None: break
+        start, pos, group = m.start(), m.end(), m.lastgroup
+        if group == "word":
+            word = m.group()
+            if word in keywords: tokens.append((start, pos - start, KEYWORD))
+            elif _CALL.match(text, pos): tokens.append((start, pos - start, FUNCTION))
+        elif group == "directive":
+            start = m.start(group) # Sin la sangría
+            tokens.append((start, pos - start, KEYWORD))
+        elif group == "open":
+            block_state, closer, kind = blocks[m.group()]
+            end = text.find(closer, pos)
+            if end < 0:
+                tokens.append((start, n - start, kind))
+                return tokens, block_state
+            pos = end + len(closer)
+            tokens.append((start, pos - start, kind))
+        else:
+            tokens.append((start, pos - start, STRING if group == "string" else COMMENT))
+    return tokens, state
+
+class CodeHighlighter:
+    """Tokens por línea de un texto, calculados de arriba abajo en pasos acotados.
+
+    Cada línea guarda sus tokens, el estado con el que empezó y con el que acabó.
+    `done` es el número de líneas iniciales ya coherentes. Al cambiar el texto solo
+    se vuelven a tokenizar las líneas nuevas y las que heredan un estado distinto.
+    """
+
+    def __init__(self, text, ext):
+        self.lang = language_for_ext(ext)
+        self.text = None
+        self.lines = []
+        self.tokens, self.start_states, self.end_states, self.gen = [], [], [], []
+        self.done = 0
+        self.wanted = -1 # Última línea visible pedida por el pintado
+        self._gen = 0
+        self.set_text(text)
+
+    def finished(self):
+        return self.done >= len(self.lines)
+
+    def set_text(self, text):
+        self.text = text
+        lines = text.split("\n")
+        old = self.lines
+        prefix = 0
+        limit = min(len(old), len(lines))
+        while prefix < limit and old[prefix] == lines[prefix]: prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == lines[-1 - suffix]: suffix += 1
+
+        # Las líneas cambiadas pierden sus tokens; prefijo y sufijo los conservan
+        added = len(lines) - prefix - suffix
+        removed_end = len(old) - suffix
+        for cache in (self.tokens, self.start_states, self.end_states, self.gen):
+            cache[prefix:removed_end] = [None] * added
+        self.lines = lines
+        self.done = min(self.done, prefix)
+        if self.lang is None: self.done = len(lines) # Texto plano: nada que resaltar
+
+    def step(self, deadline):
+        """Tokeniza hasta `deadline` (perf_counter). True si acaba de completar las líneas visibles."""
+        lang, lines = self.lang, self.lines
+        first = i = self.done
+        n = len(lines)
+        while i < n:
+            state = self.end_states[i - 1] if i else NORMAL
+            # Una línea con tokens que entra con el mismo estado se salta sin tokenizar; las
+            # siguientes se comprueban igual, así que nunca se da por hecha una sin tokens
+            if self.tokens[i] is None or self.start_states[i] != state:
+                tokens, end_state = tokenize_line(lang, lines[i], state)
+                self._gen += 1
+                self.tokens[i], self.start_states[i], self.end_states[i], self.gen[i] = tokens, state, end_state, self._gen
+            i += 1
+            if (i & 63) == 0 and time.perf_counter() >= deadline: break
+        self.done = i
+        return first <= self.wanted < i
+
+class HighlightScheduler(QObject):
+    """Reparte la tokenización en trozos de HIGHLIGHT_BUDGET_MS entre eventos, para no
+    bloquear nunca el pintado. Emite `progress` cuando hay líneas visibles nuevas."""
+
+    progress = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self._queue = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._tick)
+
+    def schedule(self, highlighter, urgent=False):
+        if highlighter.finished(): return
+        if highlighter in self._queue:
+            if not urgent: return
+            self._queue.remove(highlighter)
+        if urgent: self._queue.insert(0, highlighter)
+        else: self._queue.append(highlighter)
+        if not self._timer.isActive(): self._timer.start()
+
+    def _tick(self):
+        deadline = time.perf_counter() + config.HIGHLIGHT_BUDGET_MS / 1000.0
+        visible_progress = False
+        while self._queue and time.perf_counter() < deadline:
+            hl = self._queue[0]
+            visible_progress |= hl.step(deadline)
+            if hl.finished(): self._queue.pop(0)
+        if self._queue: self._timer.start()
+        if visible_progress: self.progress.emit()
+
+_scheduler = None
+
+def scheduler():
+    global _scheduler
+    if _scheduler is None: _scheduler = HighlightScheduler()
+    return _scheduler
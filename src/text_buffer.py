@@ -0,0 +1,227 @@
+import random
+
+LEAF_MAX = 1024 # Caracteres máximos por hoja de la cuerda
+EDIT_LOG = 64 # Cambios de líneas que se recuerdan (ver TextBuffer.edits_since)
+
+class _Leaf:
+    """Nodo del treap implícito: un trozo de texto más los totales de su subárbol"""
+    __slots__ = ("text", "nl", "left", "right", "prio", "size", "lines")
+
+    def __init__(self, text):
+        self.text = text
+        self.nl = text.count("\n")
+        self.left = self.right = None
+        self.prio = random.random()
+        self.size = len(text)
+        self.lines = self.nl
+
+def _size(n): return n.size if n else 0
+def _lines(n): return n.lines if n else 0
+
+def _update(n):
+    n.size = len(n.text) + _size(n.left) + _size(n.right)
+    n.lines = n.nl + _lines(n.left) + _lines(n.right)
+
+def _merge(a, b):
+    if a is None: return b
+    if b is None: return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b); _update(a); return a
+    b.left = _merge(a, b.left); _update(b); return b
+
+def _split(n, pos):
+    """(primeros `pos` caracteres, resto); parte la hoja que cae en medio"""
+    if n is None: return None, None
+    ls = _size(n.left)
+    if pos <= ls:
+        left, n.left = _split(n.left, pos)
+        _update(n); return left, n
+    if pos >= ls + len(n.text):
+        n.right, right = _split(n.right, pos - ls - len(n.text))
+        _update(n); return n, right
+    k = pos - ls
+    tail = _Leaf(n.text[k:])
+    n.text = n.text[:k]; n.nl = n.text.count("\n")
+    right = _merge(tail, n.right)
+    n.right = None; _update(n)
+    return n, right
+
+def _build(text):
+    root = None
+    for i in range(0, len(text), LEAF_MAX // 2): # Hojas a medio llenar: admiten inserciones sin partirse
+        root = _merge(root, _Leaf(text[i:i + LEAF_MAX // 2]))
+    return root
+
+def _edit_in_place(n, pos, remove, insert):
+    """Reemplaza `remove` caracteres en `pos` por `insert` si todo cae en una misma hoja
+    (con el final de la hoja incluido) y sigue cabiendo. Actualiza los totales al volver."""
+    if n is None: return False
+    ls = _size(n.left)
+    if pos < ls or (pos == ls and ls > 0 and not remove):
+        done = _edit_in_place(n.left, pos, remove, insert)
+    elif pos + remove <= ls + len(n.text):
+        k = pos - ls
+        text = n.text[:k] + insert + n.text[k + remove:]
+        if not text or len(text) > LEAF_MAX: return False
+        n.text = text; n.nl = text.count("\n")
+        done = True
+    elif pos >= ls + len(n.text):
+        done = _edit_in_place(n.right, pos - ls - len(n.text), remove, insert)
+    else:
+        return False
+    if done: _update(n)
+    return done
+
+class TextBuffer:
+    """Texto editable guardado como cuerda (treap de hojas): insertar, borrar y localizar
+    una línea cuestan O(log n) sin copiar el texto entero. Lleva la posición del cursor
+    y una revisión que sube con cada cambio, para invalidar lo que dependa del texto, y
+    un registro de las líneas que cambia cada edición, para rehacer solo esas."""
+
+    def __init__(self, text=""):
+        self._root = _build(text)
+        self._text = text # Texto completo cacheado hasta la próxima edición
+        self.caret = len(text)
+        self.revision = 0
+        self._edits = [] # (revisión, primera línea, líneas que había, líneas que hay)
+
+    def __len__(self):
+        return _size(self._root)
+
+    def text(self):
+        if self._text is None:
+            parts, stack, n = [], [], self._root
+            while stack or n:
+                while n: stack.append(n); n = n.left
+                n = stack.pop(); parts.append(n.text); n = n.right
+            self._text = "".join(parts)
+        return self._text
+
+    def slice(self, start, end):
+        parts = []
+        def walk(n, offset):
+            if n is None or start >= offset + n.size or end <= offset: return
+            walk(n.left, offset)
+            base = offset + _size(n.left)
+            a, b = max(start - base, 0), min(end - base, len(n.text))
+            if a < b: parts.append(n.text[a:b])
+            walk(n.right, base + len(n.text))
+        walk(self._root, 0)
+        return "".join(parts)
+
+    def _changed(self, line, removed, added):
+        self._text = None
+        self.revision += 1
+        self._edits.append((self.revision, line, removed, added))
+        if len(self._edits) > EDIT_LOG: del self._edits[0]
+
+    def edits_since(self, revision):
+        """[(primera línea, líneas que había, líneas que hay)] de cada edición posterior a
+        `revision`, en orden; None si el registro ya no llega tan atrás"""
+        if revision == self.revision: return []
+        if not self._edits or self._edits[0][0] > revision + 1: return None
+        return [edit[1:] for edit in self._edits if edit[0] > revision]
+
+    # --- Edición ---
+    def insert_at(self, pos, text):
+        if not text: return
+        line = self.line_of(pos)
+        if not _edit_in_place(self._root, pos, 0, text):
+            left, right = _split(self._root, pos)
+            self._root = _merge(_merge(left, _build(text)), right)
+        if self.caret >= pos: self.caret += len(text)
+        self._changed(line, 1, 1 + text.count("\n"))
+
+    def delete(self, start, end):
+        start, end = max(0, start), min(len(self), end)
+        if end <= start: return
+        line = self.line_of(start)
+        removed = 1 + self.line_of(end) - line
+        if not _edit_in_place(self._root, start, end - start, ""):
+            left, rest = _split(self._root, start)
+            _, right = _split(rest, end - start)
+            self._root = _merge(left, right)
+        if self.caret > end: self.caret -= end - start
+        elif self.caret > start: self.caret = start
+        self._changed(line, removed, 1)
+
+    def insert(self, text):
+        self.insert_at(self.caret, text)
+
+    def backspace(self):
+        self.delete(self.caret - 1, self.caret)
+
+    def delete_forward(self):
+        self.delete(self.caret, self.caret + 1)
+
+    # --- Líneas ---
+    def line_count(self):
+        return _lines(self._root) + 1
+
+    def line_start(self, line):
+        """Posición donde empieza la línea `line` (la que sigue al salto número `line`)"""
+        if line <= 0: return 0
+        if line > _lines(self._root): return len(self)
+        n, k, offset = self._root, line, 0
+        while n:
+            if k <= _lines(n.left): n = n.left; continue
+            k -= _lines(n.left); offset += _size(n.left)
+            if k <= n.nl:
+                i = -1
+                for _ in range(k): i = n.text.index("\n", i + 1)
+                return offset + i + 1
+            k -= n.nl; offset += len(n.text); n = n.right
+        return len(self)
+
+    def line_of(self, pos):
+        """Número de línea de la posición (saltos antes de ella)"""
+        n, count = self._root, 0
+        while n:
+            ls = _size(n.left)
+            if pos < ls: n = n.left; continue
+            count += _lines(n.left)
+            k = pos - ls
+            if k <= len(n.text): return count + n.text.count("\n", 0, k)
+            count += n.nl; pos = k - len(n.text); n = n.right
+        return count
+
+    def line(self, line):
+        """Texto de la línea sin su salto final"""
+        start = self.line_start(line)
+        end = self.line_start(line + 1) - 1 if line < _lines(self._root) else len(self)
+        return self.slice(start, end)
+
+    def caret_line_col(self):
+        line = self.line_of(self.caret)
+        return line, self.caret - self.line_start(line)
+
+    # --- Cursor ---
+    def move_caret(self, delta):
+        self.caret = max(0, min(len(self), self.caret + delta))
+
+    def move_caret_lines(self, delta):
+        line, col = self.caret_line_col()
+        target = max(0, min(self.line_count() - 1, line + delta))
+        if target == line: return
+        self.caret = self.line_start(target) + min(col, len(self.line(target)))
+
+    def caret_home(self):
+        self.caret = self.line_start(self.line_of(self.caret))
+
+    def caret_end(self):
+        line = self.line_of(self.caret)
+        self.caret = self.line_start(line) + len(self.line(line))
+
+def buffer_for(obj):
+    """Buffer de edición de una ventana o texto; se crea al primer uso a partir del texto
+    guardado, que desde entonces solo se lee con object_text"""
+    buffer = obj.state.buffer
+    if buffer is None:
+        buffer = obj.state.buffer = TextBuffer(obj.state.content)
+        obj.state.content = None
+    return buffer
+
+def object_text(obj):
+    """Texto actual de una ventana o texto, tenga buffer o no"""
+    buffer = obj.state.buffer
+    return buffer.text() if buffer is not None else obj.state.content
@@ -0,0 +1,244 @@
+import re
+from collections import OrderedDict
+from itertools import accumulate
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QColor, QFont, QFontMetricsF, QTextCharFormat, QTextDocument, QTextLayout, QTextOption, QAbstractTextDocumentLayout, QTextCursor
+import syntax_highlight
+import config
+
+# Vistas virtualizadas de texto largo (objetos "codigo" y "markdown"): solo se maquetan y
+# pintan las líneas o trozos visibles más un margen (overscan). Las posiciones de texto
+# son tuplas (unidad, desplazamiento) -línea en código, trozo en markdown- y se comparan
+# como tuplas para ordenar el inicio y el fin de una selección.
+
+MARGIN = 4 # Margen interior, igual que el documentMargin por defecto de QTextDocument
+
+def _selection_span(sel_start, sel_end, unit, length):
+    """Parte [a, b) de la unidad `unit` que cubre la selección, o None"""
+    if sel_start is None or sel_end is None or sel_start == sel_end: return None
+    start, end = min(sel_start, sel_end), max(sel_start, sel_end)
+    if unit < start[0] or unit > end[0]: return None
+    a = start[1] if unit == start[0] else 0
+    b = end[1] if unit == end[0] else length
+    return (a, b) if b > a else None
+
+CODE_TEXT_COLOR = QColor("#d4d4d4")
+
+def _code_format(color, bold=False, italic=False):
+    fmt = QTextCharFormat(); fmt.setForeground(QColor(color))
+    if bold: fmt.setFontWeight(QFont.Bold)
+    if italic: fmt.setFontItalic(True)
+    return fmt
+
+# Colores del editor por tipo de token (ver syntax_highlight)
+CODE_TOKEN_FORMATS = {
+    syntax_highlight.KEYWORD: _code_format("#569cd6", bold=True),
+    syntax_highlight.STRING: _code_format("#ce9178"),
+    syntax_highlight.COMMENT: _code_format("#6a9955", italic=True),
+    syntax_highlight.FUNCTION: _code_format("#dcdcaa"),
+}
+
+class CodeView:
+    """Código monoespaciado sin ajuste de línea: cada línea mide lo mismo, así que la
+    posición de cualquier línea es inmediata. Cada línea visible tiene su QTextLayout
+    con los tokens del resaltado; se guardan en una LRU de CODE_LAYOUT_CACHE_LINES."""
+
+    def __init__(self, text, ext):
+        self.highlighter = syntax_highlight.CodeHighlighter(text, ext)
+        self.font = QFont(); self.font.setFamilies(["Consolas", "Monaco", "monospace"])
+        self.font.setStyleHint(QFont.Monospace); self.font.setPixelSize(13)
+        self.line_height = QFontMetricsF(self.font).height()
+        self._option = QTextOption(); self._option.setWrapMode(QTextOption.NoWrap)
+        self._layouts = OrderedDict() # línea -> (texto, generación de tokens, QTextLayout)
+
+    @property
+    def text(self):
+        return self.highlighter.text
+
+    def set_text(self, text):
+        self.highlighter.set_text(text) # Las maquetaciones se validan por texto y generación
+
+    def content_height(self):
+        return len(self.highlighter.lines) * self.line_height + 2 * MARGIN
+
+    def _line_range(self, top, bottom):
+        n = len(self.highlighter.lines)
+        first = max(0, int((top - MARGIN) // self.line_height))
+        last = min(n - 1, int((bottom - MARGIN) // self.line_height))
+        return first, last
+
+    def _layout(self, i):
+        hl = self.highlighter
+        text = hl.lines[i]
+        gen = hl.gen[i] if i < hl.done else None
+        entry = self._layouts.get(i)
+        if entry is not None and entry[0] is text and entry[1] == gen:
+            self._layouts.move_to_end(i)
+            return entry[2]
+
+        # Las líneas enormes (logs) se recortan: no caben en el ancho del objeto
+        layout = QTextLayout(text[:config.CODE_MAX_LINE_CHARS], self.font)
+        layout.setTextOption(self._option)
+        if gen is not None:
+            ranges = []
+            for start, length, kind in hl.tokens[i]:
+                fr = QTextLayout.FormatRange(); fr.start, fr.length, fr.format = start, length, CODE_TOKEN_FORMATS[kind]
+                ranges.append(fr)
+            layout.setFormats(ranges)
+        layout.beginLayout()
+        line = layout.createLine()
+        if line.isValid(): line.setPosition(QPointF(0, 0))
+        layout.endLayout()
+        self._layouts[i] = (text, gen, layout)
+        while len(self._layouts) > config.CODE_LAYOUT_CACHE_LINES:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def paint(self, painter, top, bottom, palette, sel_start=None, sel_end=None):
+        """Pinta las líneas entre `top` y `bottom` (coordenadas del contenido, ya trasladadas)"""
+        hl = self.highlighter
+        if not hl.lines: return
+        first, last = self._line_range(top, bottom)
+        overscan = config.TEXT_OVERSCAN_LINES
+        for i in range(max(0, first - overscan), min(len(hl.lines), last + overscan + 1)):
+            self._layout(i) # Se maquetan también las de alrededor para el siguiente scroll
+
+        sel_format = QTextCharFormat()
+        sel_format.setBackground(palette.highlight()); sel_format.setForeground(palette.highlightedText())
+        painter.setPen(CODE_TEXT_COLOR)
+        for i in range(first, last + 1):
+            layout = self._layout(i)
+            selections = []
+            span = _selection_span(sel_start, sel_end, i, len(hl.lines[i]) + 1)
+            if span:
+                fr = QTextLayout.FormatRange(); fr.start, fr.length, fr.format = span[0], span[1] - span[0], sel_format
+                selections.append(fr)
+            layout.draw(painter, QPointF(MARGIN, MARGIN + i * self.line_height), selections)
+
+        # El resaltado que falte se encarga al planificador, que pide repintar cuando llega
+        hl.wanted = last
+        if not hl.finished(): syntax_highlight.scheduler().schedule(hl, urgent=hl.done <= last)
+
+    def hit_test(self, x, y):
+        n = len(self.highlighter.lines)
+        if n == 0: return (0, 0)
+        i = min(n - 1, max(0, int((y - MARGIN) // self.line_height)))
+        line = self._layout(i).lineAt(0)
+        return (i, line.xToCursor(x - MARGIN) if line.isValid() else 0)
+
+_LIST_ITEM = re.compile(r"\s|[-*+>|]|\d+[.)]")
+
+def split_markdown(text, chunk_lines):
+    """Trozos de unas `chunk_lines` líneas, cortados solo en líneas en blanco fuera de
+    bloques ``` y antes de algo que no continúe una lista, cita o tabla"""
+    lines = text.split("\n")
+    chunks, start, fence = [], 0, False
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("```"): fence = not fence
+        if fence or i - start < chunk_lines or line.strip() or i + 1 >= len(lines): continue
+        following = lines[i + 1]
+        if not following or _LIST_ITEM.match(following): continue
+        chunks.append("\n".join(lines[start:i + 1]))
+        start = i + 1
+    chunks.append("\n".join(lines[start:]))
+    return chunks
+
+class MarkdownView:
+    """Markdown partido en trozos, cada uno con su QTextDocument creado al hacerse visible.
+
+    Solo se guardan MARKDOWN_CHUNK_DOCS documentos (LRU). De los demás trozos se recuerda
+    la altura medida para el ancho actual; si nunca se maquetaron se estima por su número
+    de líneas con la media de lo ya medido."""
+
+    STYLESHEET = "* { color: #ffffff; } h1 { font-size: 18px; font-weight: bold; } p { font-size: 12px; }"
+
+    def __init__(self, text):
+        self.text = text
+        self.chunks = split_markdown(text, config.MARKDOWN_CHUNK_LINES)
+        self.line_counts = [c.count("\n") + 1 for c in self.chunks]
+        self.width = 0
+        self._docs = OrderedDict() # trozo -> QTextDocument
+        self._heights = [None] * len(self.chunks)
+        self._measured = [0.0, 0] # altura y líneas medidas, para estimar el resto
+        self._tops = None
+
+    def set_width(self, width):
+        if width == self.width: return
+        self.width = width
+        self._heights = [None] * len(self.chunks)
+        self._measured = [0.0, 0]
+        self._tops = None
+        for doc in self._docs.values(): doc.setTextWidth(max(1, width - 2 * MARGIN))
+
+    def _doc(self, i):
+        doc = self._docs.get(i)
+        if doc is None:
+            doc = QTextDocument()
+            doc.setDocumentMargin(0)
+            doc.setDefaultStyleSheet(self.STYLESHEET)
+            doc.setMarkdown(self.chunks[i])
+            doc.setTextWidth(max(1, self.width - 2 * MARGIN))
+            self._docs[i] = doc
+            while len(self._docs) > config.MARKDOWN_CHUNK_DOCS:
+                self._docs.popitem(last=False)
+        else:
+            self._docs.move_to_end(i)
+        if self._heights[i] is None:
+            height = doc.size().height()
+            self._heights[i] = height
+            self._measured[0] += height; self._measured[1] += self.line_counts[i]
+            self._tops = None
+        return doc
+
+    def _chunk_tops(self):
+        if self._tops is None:
+            per_line = self._measured[0] / self._measured[1] if self._measured[1] else 16.0
+            heights = [h if h is not None else n * per_line for h, n in zip(self._heights, self.line_counts)]
+            self._tops = list(accumulate(heights, initial=MARGIN)) # tops[n] = final del último
+        return self._tops
+
+    def content_height(self):
+        return self._chunk_tops()[-1] + MARGIN
+
+    def _chunk_at(self, y):
+        tops = self._chunk_tops()
+        lo, hi = 0, len(self.chunks) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if tops[mid] <= y: lo = mid
+            else: hi = mid - 1
+        return lo
+
+    def paint(self, painter, top, bottom, palette, sel_start=None, sel_end=None):
+        """Pinta los trozos entre `top` y `bottom` (coordenadas del contenido, ya trasladadas)"""
+        # Maquetar primero los visibles: al medirlos pueden moverse los de debajo
+        first = self._chunk_at(top)
+        i = first
+        while i < len(self.chunks) and self._chunk_tops()[i] < bottom:
+            self._doc(i); i += 1
+        last = min(len(self.chunks) - 1, i + config.TEXT_OVERSCAN_CHUNKS - 1)
+        for j in range(max(0, first - config.TEXT_OVERSCAN_CHUNKS), last + 1): self._doc(j)
+
+        sel_format = QTextCharFormat() # La maquetación pinta la selección con su formato, no con la paleta
+        sel_format.setBackground(palette.highlight()); sel_format.setForeground(palette.highlightedText())
+        tops = self._chunk_tops()
+        for i in range(first, len(self.chunks)):
+            y = tops[i]
+            if y >= bottom: break
+            doc = self._doc(i)
+            ctx = QAbstractTextDocumentLayout.PaintContext(); ctx.palette = palette
+            ctx.clip = QRectF(0, top - y, self.width, bottom - top)
+            span = _selection_span(sel_start, sel_end, i, doc.characterCount() - 1)
+            if span:
+                selection = QAbstractTextDocumentLayout.Selection(); cursor = QTextCursor(doc)
+                cursor.setPosition(span[0]); cursor.setPosition(span[1], QTextCursor.KeepAnchor)
+                selection.cursor = cursor; selection.format = sel_format; ctx.selections = [selection]
+            painter.save(); painter.translate(MARGIN, y)
+            doc.documentLayout().draw(painter, ctx)
+            painter.restore()
+
+    def hit_test(self, x, y):
+        i = self._chunk_at(y)
+        doc = self._doc(i)
+        pos = doc.documentLayout().hitTest(QPointF(x - MARGIN, y - self._chunk_tops()[i]), Qt.FuzzyHit)
+        return (i, max(0, pos))
@@ -0,0 +1,62 @@
+import math
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QPainter, QPixmap, QRegion
+from raster_cache import RasterCache
+
+class TileCache:
+    """Teselas de TILE_SIZE píxeles del plano del mundo escalado a un nivel de zoom
+    discreto (mundo * nivel), una rejilla fija por nivel.
+
+    Cada tesela se rasteriza una vez y se guarda junto con la firma de lo que la pinta
+    (normalmente los objetos que la solapan): solo se vuelve a pintar si esa firma cambia.
+    Los zooms intermedios reutilizan las teselas de su nivel escaladas, así que al
+    desplazar la cámara o hacer zoom dentro de un nivel no se rasteriza nada."""
+
+    def __init__(self, budget_bytes, tile_size):
+        self.tile_size = tile_size
+        self.cache = RasterCache(budget_bytes)
+        self.rendered = 0 # Teselas pintadas en el último compose (el resto salió de la caché)
+
+    def tile_rect(self, tx, ty):
+        """(x0, y0, x1, y1) de la tesela en píxeles del mundo escalado al nivel"""
+        t = self.tile_size
+        return tx * t, ty * t, (tx + 1) * t, (ty + 1) * t
+
+    def compose(self, painter, zoom, level, origin, size, signature, render, rects=None):
+        """Pinta con `painter` las teselas que cubren un área de `size` píxeles.
+        
+        level: nivel de zoom al que se rasterizan las teselas; se escalan por zoom / level.
+        origin: posición entera en el área del origen del mundo.
+        signature(tx, ty, level): firma del contenido de la tesela (se compara con la guardada).
+        render(pixmap, tx, ty, level): pinta la tesela entera en `pixmap`.
+        rects: si se da, solo se pintan (recortadas) las teselas que tocan esos QRect."""
+        t = self.tile_size
+        ox, oy = origin
+        scale = zoom / level
+        self.rendered = 0
+        if rects is not None:
+            region = QRegion()
+            for r in rects: region = region.united(r)
+            painter.setClipRegion(region)
+        painter.save()
+        painter.translate(ox, oy)
+        if scale != 1:
+            painter.scale(scale, scale)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        step = t * scale # Lado de una tesela en el área
+        for ty in range(math.floor(-oy / step), math.floor((size.height() - 1 - oy) / step) + 1):
+            for tx in range(math.floor(-ox / step), math.floor((size.width() - 1 - ox) / step) + 1):
+                if rects is not None and not region.intersects(QRectF(ox + tx * step, oy + ty * step, step, step).toAlignedRect()): continue
+                key = (level, tx, ty)
+                tag = signature(tx, ty, level)
+                tile = self.cache.get(key, tag)
+                if tile is None:
+                    tile = QPixmap(t, t)
+                    render(tile, tx, ty, level)
+                    self.cache.put(key, tile, tag)
+                    self.rendered += 1
+                painter.drawPixmap(tx * t, ty * t, tile)
+        painter.restore()
+
+    def clear(self):
+        self.cache.clear()
@@ -1,35 +1,14 @@
-from PySide6.QtCore import Qt, QRectF, QPointF, QRect
-from PySide6.QtGui import QBrush, QPen, QColor, QFont, QLinearGradient, QPainterPath
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QBrush, QPen, QColor, QFont, QLinearGradient
 import config
+import glass
 from utils import get_contrast_color
 
 def draw_toolbar_island(painter, canvas, toolbar_rect, blurred_map=None):
     """Dibuja la isla dinámica con Glassmorphism usando el mapa de desenfoque"""
-    s_rect = toolbar_rect.toRect()
     
     # 1. Aplicar desenfoque Liquid Glass (con Refracción y Aberración)
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath()
-        path.addRoundedRect(toolbar_rect, config.TOOLBAR_RADIUS, config.TOOLBAR_RADIUS)
-        painter.setClipPath(path)
-        
-        # Refracción
-        zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / zoom, s_rect.height() / zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        # Aberración Cromática RGB
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0)
-        painter.drawPixmap(s_rect, blurred_map, src_rect)
-        
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, toolbar_rect, radius=config.TOOLBAR_RADIUS)
     
     # 2. Tinte plano (sin brillo) para que el blur sea el protagonista
     tinte = QColor(20, 20, 35, 120) 
@@ -78,28 +57,7 @@ def draw_tool_buttons(painter, canvas, toolbar_rect, opacity):
 
 def draw_color_palette(painter, canvas, circle_rect, opacity, blurred_map=None):
     """Selector de colores con Glassmorphism"""
-    s_rect = circle_rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath()
-        path.addRoundedRect(circle_rect, canvas.current_circle_radius, canvas.current_circle_radius)
-        painter.setClipPath(path)
-        
-        # Refracción y Aberración en el selector de colores
-        zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / zoom, s_rect.height() / zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 1), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, -1), blurred_map, src_rect)
-        painter.setOpacity(1.0)
-        painter.drawPixmap(s_rect, blurred_map, src_rect)
-        
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, circle_rect, radius=canvas.current_circle_radius)
 
         
     r = canvas.active_color.red() + (config.TOOLBAR_BG_COLOR.red() - canvas.active_color.red()) * canvas.circle_animation_progress
@@ -130,28 +88,7 @@ def _draw_palette_buttons(painter, canvas, circle_rect, opacity):
         button["current_rect"] = btn_rect
 def draw_vertical_menu(painter, canvas, menu_rect, opacity, blurred_map=None):
     """Menú vertical con 4 botones"""
-    s_rect = menu_rect.toRect()
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath()
-        # Radio dinámico según animación
-        radius = config.TOOLBAR_RADIUS
-        path.addRoundedRect(menu_rect, radius, radius)
-        painter.setClipPath(path)
-        
-        zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / zoom, s_rect.height() / zoom
-        src_x = s_rect.x() + (s_rect.width() - src_w) / 2
-        src_y = s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        ab = config.GLASS_ABERRATION
-        painter.setOpacity(0.4)
-        painter.drawPixmap(s_rect.translated(-ab, 1), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, -1), blurred_map, src_rect)
-        painter.setOpacity(1.0)
-        painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, menu_rect, radius=config.TOOLBAR_RADIUS)
 
     tinte = QColor(25, 25, 45, 120)
     painter.setBrush(QBrush(tinte))
@@ -214,24 +151,9 @@ def draw_vertical_menu(painter, canvas, menu_rect, opacity, blurred_map=None):
 
 def draw_system_menu(painter, canvas, rect, blurred_map=None):
     """Menú de sistema flotante (Guardar / Abrir)"""
-    s_rect = rect.toRect()
     
     # 1. Glassmorphism
-    if blurred_map and not blurred_map.isNull():
-        painter.save()
-        path = QPainterPath(); path.addRoundedRect(rect, config.TOOLBAR_RADIUS, config.TOOLBAR_RADIUS); painter.setClipPath(path)
-        
-        refr_zoom = config.GLASS_REFRACTION
-        src_w, src_h = s_rect.width() / refr_zoom, s_rect.height() / refr_zoom
-        src_x, src_y = s_rect.x() + (s_rect.width() - src_w) / 2, s_rect.y() + (s_rect.height() - src_h) / 2
-        src_rect = QRect(int(src_x), int(src_y), int(src_w), int(src_h))
-        
-        painter.setOpacity(0.4)
-        ab = config.GLASS_ABERRATION
-        painter.drawPixmap(s_rect.translated(-ab, 0), blurred_map, src_rect)
-        painter.drawPixmap(s_rect.translated(ab, 0), blurred_map, src_rect)
-        painter.setOpacity(1.0); painter.drawPixmap(s_rect, blurred_map, src_rect)
-        painter.restore()
+    glass.draw_glass(painter, blurred_map, rect, radius=config.TOOLBAR_RADIUS)
 
     # Tinte
     tinte = QColor(25, 25, 45, 120)
@@ -1,30 +1,26 @@
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QRectF
 from PySide6.QtGui import QColor, QPixmap, QPainter
 from PySide6.QtWidgets import QGraphicsBlurEffect, QGraphicsScene, QGraphicsPixmapItem
 import config
+import blur_engine
 
-def apply_gaussian_blur(pixmap, radius):
-    """Aplica un desenfoque ultra-profundo manteniendo una resolución nítida (Anti-aliasing HD)."""
-    if pixmap.isNull(): return pixmap
-    
-    w, h = pixmap.width(), pixmap.height()
-    img = pixmap.toImage()
-    
-    # Técnica de 3 capas progresivas para evitar pixelado en dibujos grandes
-    # Paso 1: Suavizado estructural (HD)
-    s1 = img.scaled(w // 2, h // 2, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-    s1 = s1.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-    
-    # Paso 2: Difusión de color (SD)
-    s2 = s1.scaled(w // 4, h // 4, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-    s2 = s2.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+def apply_gaussian_blur(pixmap, radius, regions=None, target=None):
+    """Desenfoque gaussiano aproximado que respeta el radio pedido (ver blur_engine).
     
-    # Paso 3: Profundidad Bokeh (Capa final de mezcla)
-    # Al procesar sobre s2 ya suavizado, eliminamos el banding y el pixelado
-    s3 = s2.scaled(w // 8, h // 8, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-    final_img = s3.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-    
-    return QPixmap.fromImage(final_img)
+    Si se pasan `regions` (QRect en píxeles), solo se desenfocan esas zonas,
+    pintando sobre `target` si se da un buffer reutilizable."""
+    if pixmap.isNull(): return pixmap
+    if regions is not None:
+        return blur_engine.blur_regions(pixmap, regions, radius, target)
+    return blur_engine.blur_pixmap(pixmap, radius)
+
+def glass_sample_rect(rect):
+    """Zona del mapa desenfocado que necesita una superficie de vidrio: su rect más
+    el margen de la refracción y un píxel por el redondeo."""
+    r = QRectF(rect).toAlignedRect()
+    refr_x = int(r.width() * (config.GLASS_REFRACTION - 1) / 2) + 1
+    refr_y = int(r.height() * (config.GLASS_REFRACTION - 1) / 2) + 1
+    return r.adjusted(-refr_x - 1, -refr_y - 1, refr_x + 1, refr_y + 1)
 
 
 def get_contrast_color(color):
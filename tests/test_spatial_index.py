@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from spatial_index import SpatialIndex
+
+class Obj:
+    def __init__(self, x, y, size=100):
+        self.x, self.y, self.size = x, y, size
+
+def bounds(obj):
+    h = obj.size / 2
+    return obj.x - h, obj.y - h, obj.x + h, obj.y + h
+
+def overlaps(obj, x0, y0, x1, y1):
+    bx0, by0, bx1, by1 = bounds(obj)
+    return bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0
+
+def test_queries_follow_list_order_after_moves_and_removals():
+    rng = random.Random(11)
+    objects = [Obj(rng.uniform(-3000, 3000), rng.uniform(-3000, 3000), rng.uniform(20, 400)) for _ in range(400)]
+    index = SpatialIndex()
+    index.rebuild(objects, bounds)
+    for _ in range(600):
+        r = rng.random()
+        if r < 0.25:
+            index.remove(objects.pop(rng.randrange(len(objects))))
+        elif r < 0.35:
+            gone = set(rng.sample(range(len(objects)), 4))
+            index.remove_many([objects[i] for i in gone])
+            objects = [obj for i, obj in enumerate(objects) if i not in gone]
+        elif r < 0.55:
+            obj = Obj(rng.uniform(-3000, 3000), rng.uniform(-3000, 3000))
+            objects.append(obj); index.insert(obj, bounds(obj))
+        else:
+            obj = rng.choice(objects)
+            obj.x += rng.uniform(-800, 800); obj.y += rng.uniform(-800, 800)
+            index.update(obj, bounds(obj))
+        x, y = rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)
+        assert index.query_rect(x - 700, y - 500, x + 700, y + 500) == \
+            [(i, obj) for i, obj in enumerate(objects) if overlaps(obj, x - 700, y - 500, x + 700, y + 500)]
+    assert len(index) == len(objects)
+
+def test_point_query_excludes_edges_and_top_is_last():
+    below, above = Obj(0, 0), Obj(30, 0)
+    index = SpatialIndex()
+    index.rebuild([below, above], bounds)
+    assert index.query_point(10, 0) == [(0, below), (1, above)]
+    assert index.query_point(-50, 0) == [] # Borde izquierdo exacto
+    assert index.query_point(-40, 0) == [(0, below)]
+    index.remove(below)
+    assert index.query_point(10, 0) == [(0, above)]
+    index.insert(below, bounds(below)) # Vuelve encima de todo
+    assert index.query_point(10, 0)[-1] == (1, below)
+
+def test_radius_query_measures_to_the_box():
+    obj = Obj(0, 0, 100) # Caja de -50 a 50
+    index = SpatialIndex()
+    index.rebuild([obj], bounds)
+    assert index.query_radius(58, 0, 10) == [(0, obj)]
+    assert index.query_radius(60, 0, 10) == [] # Justo a `radius`: fuera
+    assert index.query_radius(57, 57, 10) == [(0, obj)] # Esquina: distancia euclídea ~9.9
+    assert index.query_radius(58, 58, 10) == []
+
+def test_huge_objects_and_sparse_queries():
+    index = SpatialIndex(cell_size=10)
+    huge, small = Obj(0, 0, 10000), Obj(5000, 0, 10)
+    index.rebuild([huge, small], bounds)
+    assert index.query_point(4000, 4000) == [(0, huge)]
+    assert index.query_rect(-1e6, -1e6, 1e6, 1e6) == [(0, huge), (1, small)]
+    index.update(huge, (-5, -5, 5, 5)) # Deja de ser enorme y entra en la rejilla
+    assert index.query_point(4000, 4000) == []
+    assert index.query_point(0, 0) == [(0, huge)]
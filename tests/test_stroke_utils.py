@@ -0,0 +1,59 @@
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stroke_utils import simplify_points, stroke_hit, stroke_lod, _segment_dist2
+
+def random_stroke(rng, n):
+    x = y = angle = 0.0
+    points = []
+    for _ in range(n):
+        angle += rng.gauss(0, 0.2)
+        x += math.cos(angle) * 1.5 + rng.gauss(0, 0.4)
+        y += math.sin(angle) * 1.5 + rng.gauss(0, 0.4)
+        points.append((x, y))
+    return points
+
+def max_deviation(points, simplified):
+    """Mayor distancia de un punto original al tramo simplificado que lo sustituye"""
+    kept = [points.index(p) for p in simplified]
+    return max(math.sqrt(_segment_dist2(*points[i], *points[a], *points[b]))
+               for a, b in zip(kept, kept[1:]) for i in range(a, b + 1))
+
+def test_simplify_keeps_endpoints_and_stays_within_tolerance():
+    rng = random.Random(5)
+    for _ in range(60):
+        points = random_stroke(rng, rng.randint(3, 400))
+        tolerance = rng.choice([0.5, 1.0, 3.0, 8.0])
+        simplified = simplify_points(points, tolerance)
+        assert simplified[0] == points[0] and simplified[-1] == points[-1]
+        assert len(simplified) <= len(points)
+        assert max_deviation(points, simplified) <= tolerance + 1e-9
+
+def test_simplify_straight_line_and_corner():
+    line = [(float(i), 0.0) for i in range(50)]
+    assert simplify_points(line, 0.1) == [(0.0, 0.0), (49.0, 0.0)]
+    corner = line + [(49.0, float(i)) for i in range(1, 50)]
+    assert simplify_points(corner, 0.1) == [(0.0, 0.0), (49.0, 0.0), (49.0, 49.0)]
+    assert simplify_points(line[:2], 5) == line[:2]
+    assert simplify_points(line, 0) == line
+
+def test_stroke_lod_caches_per_level():
+    stroke = {"points": random_stroke(random.Random(1), 300)}
+    assert stroke_lod(stroke, 1.0) is stroke["points"]
+    coarse = stroke_lod(stroke, 0.1)
+    assert stroke_lod(stroke, 0.1) is coarse
+    assert len(coarse) < len(stroke_lod(stroke, 0.4)) <= len(stroke["points"])
+    stroke["points"] = stroke["points"][:100] # Lista nueva: se rehacen los niveles
+    assert stroke_lod(stroke, 0.1)[-1] == stroke["points"][-1]
+
+def test_stroke_hit_uses_segments():
+    points = [(0.0, 0.0), (100.0, 0.0)] # Tramo largo sin vértices intermedios
+    assert stroke_hit(points, 50, 3, 5)
+    assert not stroke_hit(points, 50, 6, 5)
+    assert not stroke_hit(points, 110, 0, 5)
+    assert stroke_hit([(10.0, 10.0)], 12, 10, 5)
+    assert not stroke_hit([(10.0, 10.0)], 20, 10, 5)
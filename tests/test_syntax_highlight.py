@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from syntax_highlight import CodeHighlighter, KEYWORD, STRING, LANGUAGES, tokenize_line
+
+def run_to_end(hl):
+    while not hl.finished(): hl.step(float("inf"))
+
+def test_edit_before_first_pass_completes():
+    lines = [f"x{i} = {i}  # linea" for i in range(1000)]
+    hl = CodeHighlighter("\n".join(lines), ".py")
+    hl.step(0) # Un solo trozo: la primera pasada queda a medias
+    assert 0 < hl.done < len(lines)
+
+    lines[5] = "def f(): return 5"
+    hl.set_text("\n".join(lines))
+    run_to_end(hl)
+    assert all(tokens is not None for tokens in hl.tokens)
+    assert hl.tokens[999]
+
+def test_block_state_propagates_past_cached_lines():
+    lines = ["a = 1"] * 300
+    hl = CodeHighlighter("\n".join(lines), ".py")
+    run_to_end(hl)
+    lines[10] = 'a = """'
+    hl.set_text("\n".join(lines))
+    run_to_end(hl)
+    assert hl.end_states[299] != 0 # Todo lo que sigue queda dentro de la cadena abierta
+
+def test_c_preprocessor_directives():
+    c = LANGUAGES["c"]
+    assert tokenize_line(c, "#include <stdio.h>", 0)[0] == [(0, 8, KEYWORD)]
+    assert tokenize_line(c, '  #define NAME "x"', 0)[0] == [(2, 7, KEYWORD), (15, 3, STRING)]
+    assert tokenize_line(c, "a = b # c;", 0)[0] == [] # Solo al principio de la línea
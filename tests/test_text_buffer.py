@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import text_buffer
+from text_buffer import TextBuffer
+
+@pytest.fixture(autouse=True)
+def small_leaves(monkeypatch):
+    # Hojas pequeñas para que cada prueba parta y una muchos nodos del treap
+    monkeypatch.setattr(text_buffer, "LEAF_MAX", 8)
+
+def check_lines(buffer, text):
+    lines = text.split("\n")
+    assert buffer.text() == text and len(buffer) == len(text)
+    assert buffer.line_count() == len(lines)
+    for i, line in enumerate(lines):
+        assert buffer.line(i) == line
+        assert buffer.line_start(i) == sum(len(l) + 1 for l in lines[:i])
+    for pos in range(len(text) + 1):
+        assert buffer.line_of(pos) == text.count("\n", 0, pos)
+
+def test_insert_and_delete_match_str():
+    rng = random.Random(7)
+    text = "uno\ndos\n\ntres cuatro\ncinco"
+    buffer = TextBuffer(text)
+    for _ in range(400):
+        if rng.random() < 0.6 or not text:
+            pos = rng.randint(0, len(text))
+            piece = "".join(rng.choice("ab \n") for _ in range(rng.randint(1, 20)))
+            buffer.insert_at(pos, piece)
+            text = text[:pos] + piece + text[pos:]
+        else:
+            start = rng.randint(0, len(text))
+            end = min(len(text), start + rng.randint(1, 15))
+            buffer.delete(start, end)
+            text = text[:start] + text[end:]
+        assert buffer.text() == text
+        assert buffer.slice(3, 17) == text[3:17]
+    check_lines(buffer, text)
+
+def test_caret_follows_edits():
+    buffer = TextBuffer("hola mundo")
+    buffer.caret = 4
+    buffer.insert_at(0, ">> ")
+    assert buffer.caret == 7
+    buffer.insert(",")
+    assert buffer.text() == ">> hola, mundo" and buffer.caret == 8
+    buffer.backspace()
+    assert buffer.text() == ">> hola mundo" and buffer.caret == 7
+    buffer.delete(0, 5)
+    assert buffer.text() == "la mundo" and buffer.caret == 2
+    buffer.caret = 0
+    buffer.backspace() # Al principio no hace nada
+    assert buffer.text() == "la mundo" and buffer.revision == 4
+
+def test_move_caret_lines_keeps_column():
+    text = "primera linea\nab\n\nuna linea larga"
+    buffer = TextBuffer(text)
+    buffer.caret = 10
+    buffer.move_caret_lines(1)
+    assert buffer.caret_line_col() == (1, 2) # Línea corta: al final
+    buffer.move_caret_lines(1)
+    assert buffer.caret_line_col() == (2, 0)
+    buffer.move_caret_lines(5)
+    assert buffer.caret_line_col() == (3, 0)
+    buffer.caret = 7
+    buffer.move_caret_lines(3)
+    assert buffer.caret_line_col() == (3, 7)
+    buffer.move_caret_lines(-10)
+    assert buffer.caret_line_col() == (0, 7)
+    buffer.caret_end()
+    assert buffer.caret == len("primera linea")
+    buffer.caret_home()
+    assert buffer.caret == 0
+
+def test_edit_log_replays_line_changes():
+    rng = random.Random(3)
+    buffer = TextBuffer("\n".join(f"linea {i}" for i in range(30)))
+    for _ in range(200):
+        old_lines, revision = buffer.text().split("\n"), buffer.revision
+        for _ in range(rng.randint(1, 4)):
+            pos = rng.randint(0, len(buffer))
+            if rng.random() < 0.5: buffer.insert_at(pos, rng.choice(["x", "\n", "y\nz", "\n\n"]))
+            else: buffer.delete(pos, pos + rng.randint(1, 6))
+        # Sustituir en el texto viejo cada tramo registrado por las líneas nuevas da el texto nuevo
+        lines, new_lines = old_lines, buffer.text().split("\n")
+        for first, removed, added in buffer.edits_since(revision):
+            lines = lines[:first] + [None] * added + lines[first + removed:]
+        assert len(lines) == len(new_lines)
+        assert all(old is None or old == new for old, new in zip(lines, new_lines))
+
+def test_edit_log_forgets_old_revisions():
+    buffer = TextBuffer("abc")
+    assert buffer.edits_since(buffer.revision) == []
+    for _ in range(text_buffer.EDIT_LOG + 1): buffer.insert("x")
+    assert buffer.edits_since(0) is None
+    assert buffer.edits_since(buffer.revision - 1) == [(0, 1, 1)]